@@ -23,8 +23,102 @@ const Target = createIcon('target');
 const Brain = createIcon('brain');
 const TrendingUp = createIcon('trending-up');
 
+// Decode a compact theme shard built by parser/build_bank.py into blockId -> questions
+const decodeShard = (shard) => {
+  const strings = shard.strings;
+  const blocks = {};
+  shard.questions.forEach(([blockIndex, questionNumber, question, answers, correctAnswer, article, id]) => {
+    const block = shard.blocks[blockIndex];
+    const answerMap = {};
+    answers.forEach(([answerId, text]) => {
+      answerMap[answerId] = strings[text];
+    });
+    if (!blocks[block.id]) blocks[block.id] = [];
+    blocks[block.id].push({
+      id,
+      theme_id: shard.theme_id,
+      theme_name: shard.theme_name,
+      block_id: block.id,
+      block_name: block.name,
+      question_number: questionNumber,
+      question: strings[question],
+      answers: answerMap,
+      correct_answer: correctAnswer,
+      correct_answer_text: answerMap[correctAnswer],
+      article: strings[article]
+    });
+  });
+  return blocks;
+};
+
+// Same normalization as parser/dedup.py normalize_text: lowercase, no markup or punctuation, ё -> е
+const tokenize = (text) => text
+  .replace(/<[^>]*>/g, ' ')
+  .toLowerCase()
+  .replace(/ё/g, 'е')
+  .split(/[^\p{L}\p{N}]+/u)
+  .filter(token => token.length >= 2);
+
+// Postings of the search index are comma-separated base-36 gaps between document positions
+const decodePostings = (encoded) => {
+  let position = 0;
+  return encoded.split(',').map(gap => (position += parseInt(gap, 36)));
+};
+
+// Search the index built by parser/search_index.py: every query word must start a token of
+// the question; returns document positions in bank order
+const searchIndex = (index, query) => {
+  const words = [...new Set(tokenize(query))].sort((a, b) => b.length - a.length);
+  if (words.length === 0) return [];
+  let result = null;
+  for (const word of words) {
+    let lo = 0;
+    let hi = index.tokens.length;
+    while (lo < hi) {
+      const mid = (lo + hi) >> 1;
+      if (index.tokens[mid] < word) lo = mid + 1; else hi = mid;
+    }
+    const matches = new Set();
+    for (let i = lo; i < index.tokens.length && index.tokens[i].startsWith(word); i++) {
+      decodePostings(index.postings[i]).forEach(position => matches.add(position));
+    }
+    result = result === null ? matches : new Set([...result].filter(position => matches.has(position)));
+    if (result.size === 0) return [];
+  }
+  return [...result].sort((a, b) => a - b);
+};
+
+// Rewritten by parser/build_assets.py to content-hashed file names
+const BANK_MANIFEST = './data/manifest.0734f81984.json';
+const BANK_FALLBACK = './data/bank_tree.a7943d3c66.json';
+
+// Progress API of parser/quiz_server.py started with --progress, e.g.
+// 'http://127.0.0.1:8080/api/progress'; null keeps progress in this browser only
+const PROGRESS_API = null;
+// Answers are sent in batches of this size, and whenever a round ends
+const SYNC_BATCH = 10;
+
+const getUserId = () => {
+  let userId = localStorage.getItem('quizUserId');
+  if (!userId) {
+    userId = `u${Date.now().toString(36)}${Math.random().toString(36).slice(2, 10)}`;
+    localStorage.setItem('quizUserId', userId);
+  }
+  return userId;
+};
+
+const loadPendingEvents = () => {
+  try {
+    return JSON.parse(localStorage.getItem('quizPendingEvents')) || [];
+  } catch (err) {
+    return [];
+  }
+};
+
 const QuizApp = () => {
-  const [questions, setQuestions] = useState([]);
+  const [manifest, setManifest] = useState(null);
+  const [themeBlocks, setThemeBlocks] = useState({});
+  const [themeLoading, setThemeLoading] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [selectedProgram, setSelectedProgram] = useState(null);
@@ -37,10 +131,14 @@ const QuizApp = () => {
   const [userAnswers, setUserAnswers] = useState([]);
   const [showResults, setShowResults] = useState(false);
   const [stats, setStats] = useState({});
+  const [searchData, setSearchData] = useState(null);
+  const [searchQuery, setSearchQuery] = useState('');
+  const [mistakeIds, setMistakeIds] = useState([]);
 
   useEffect(() => {
     loadQuestions();
-    loadStats();
+    const localStats = loadStats();
+    syncProgress(localStats);
   }, []);
 
   useEffect(() => {
@@ -53,19 +151,42 @@ const QuizApp = () => {
   const loadQuestions = async () => {
     try {
       setLoading(true);
-      const response = await fetch('./all_questions.json');
+
+      // Prefer the per-theme shards; fall back to the single JSON file
+      const manifestResponse = await fetch(BANK_MANIFEST).catch(() => null);
+      if (manifestResponse && manifestResponse.ok) {
+        setManifest(await manifestResponse.json());
+        setLoading(false);
+        return;
+      }
+
+      // The fallback is the whole bank, already grouped by theme and block
+      const response = await fetch(BANK_FALLBACK);
       if (!response.ok) {
         throw new Error('Failed to load questions');
       }
-      const data = await response.json();
-
-      const processedData = data.map(q => ({
-        ...q,
-        block_id: q.block_id || '0',
-        block_name: q.block_name || 'Основной блок'
-      }));
-
-      setQuestions(processedData);
+      const tree = await response.json();
+      const loaded = {};
+      tree.themes.forEach(theme => {
+        loaded[theme.id] = {};
+        theme.blocks.forEach(block => {
+          loaded[theme.id][block.id] = block.questions.map(q => ({
+            ...q,
+            theme_id: theme.id,
+            theme_name: theme.name,
+            block_id: block.id,
+            block_name: block.name
+          }));
+        });
+      });
+      setThemeBlocks(loaded);
+      migrateMistakes(loaded);
+      setManifest({
+        total: tree.total,
+        themes: tree.themes.map(({ id, name, count, blocks }) => ({
+          id, name, count, blocks: blocks.map(({ id, name, count }) => ({ id, name, count }))
+        }))
+      });
       setLoading(false);
     } catch (err) {
       console.error('Error loading questions:', err);
@@ -74,15 +195,98 @@ const QuizApp = () => {
     }
   };
 
+  const loadTheme = async (themeId) => {
+    if (!manifest || themeBlocks[themeId]) return;
+    const theme = manifest.themes.find(t => t.id === themeId);
+    try {
+      setThemeLoading(true);
+      const response = await fetch(`./data/${theme.file}`);
+      if (!response.ok) {
+        throw new Error('Failed to load theme');
+      }
+      const blocks = decodeShard(await response.json());
+      setThemeBlocks(prev => ({ ...prev, [themeId]: blocks }));
+      migrateMistakes({ [themeId]: blocks });
+    } catch (err) {
+      console.error('Error loading theme:', err);
+      setError('Не удалось загрузить вопросы выбранного закона.');
+    } finally {
+      setThemeLoading(false);
+    }
+  };
+
+  const selectZakon = (zakonId) => {
+    setSelectedZakon(zakonId);
+    loadTheme(zakonId);
+  };
+
+  const loadSearchIndex = async () => {
+    if (searchData || !manifest || !manifest.search) return;
+    try {
+      const response = await fetch(`./data/${manifest.search}`);
+      if (response.ok) {
+        setSearchData(await response.json());
+      }
+    } catch (err) {
+      console.error('Error loading search index:', err);
+    }
+  };
+
+  const openBlock = (zakonId, blockId) => {
+    setSelectedProgram('prog2');
+    selectZakon(zakonId);
+    setSelectedBlock(blockId);
+    setQuizMode(null);
+  };
+
   const loadStats = () => {
     try {
       const savedStats = localStorage.getItem('quizStats');
       if (savedStats) {
-        setStats(JSON.parse(savedStats));
+        // Old mistakes (incorrectQuestions) are kept until migrateMistakes turns them into ids
+        const parsed = JSON.parse(savedStats);
+        Object.values(parsed).forEach(blockStats => {
+          if (!blockStats.incorrectIds) blockStats.incorrectIds = [];
+        });
+        setStats(parsed);
+        return parsed;
       }
     } catch (err) {
       console.error('Error loading stats:', err);
     }
+    return {};
+  };
+
+  // Mistakes used to be stored as positions in the block's question list, which shift
+  // whenever the bank changes. Shards and the fallback tree keep the bank order, so once
+  // a theme's questions are loaded ({ themeId: { blockId: questions } }) its positions
+  // become ids and the old field is dropped.
+  const migrateMistakes = (loadedThemes) => {
+    setStats(prev => {
+      const next = { ...prev };
+      let changed = false;
+      Object.entries(loadedThemes).forEach(([themeId, blocks]) => {
+        Object.entries(blocks).forEach(([blockId, questions]) => {
+          const key = `prog2_${themeId}_${blockId}`;
+          const blockStats = prev[key];
+          if (!blockStats || !Array.isArray(blockStats.incorrectQuestions)) return;
+          const ids = new Set(blockStats.incorrectIds || []);
+          blockStats.incorrectQuestions.forEach(position => {
+            if (questions[position]) ids.add(questions[position].id);
+          });
+          const { incorrectQuestions, ...rest } = blockStats;
+          next[key] = { ...rest, incorrectIds: [...ids] };
+          changed = true;
+        });
+      });
+      if (!changed) return prev;
+      try {
+        localStorage.setItem('quizStats', JSON.stringify(next));
+      } catch (err) {
+        console.error('Error saving stats:', err);
+      }
+      return next;
+    });
   };
 
   const saveStats = (newStats) => {
@@ -94,50 +298,133 @@ const QuizApp = () => {
     }
   };
 
+  // Send queued answers and take the server's totals, which include other devices
+  const syncProgress = async (baseStats) => {
+    if (!PROGRESS_API) return;
+    const events = loadPendingEvents();
+    try {
+      const response = await fetch(`${PROGRESS_API}/${getUserId()}/sync`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ events })
+      });
+      if (!response.ok) return;
+      const progress = await response.json();
+      const sent = new Set(events.map(event => event.id));
+      localStorage.setItem('quizPendingEvents', JSON.stringify(loadPendingEvents().filter(event => !sent.has(event.id))));
+
+      // Server blocks are keyed theme_block, the app prefixes the program
+      const merged = { ...baseStats };
+      Object.entries(progress.blocks).forEach(([blockKey, blockStats]) => {
+        merged[`prog2_${blockKey}`] = {
+          ...merged[`prog2_${blockKey}`],
+          correct: blockStats.correct,
+          total: blockStats.total,
+          incorrectIds: blockStats.incorrectIds
+        };
+      });
+      saveStats(merged);
+    } catch (err) {
+      console.error('Error syncing progress:', err);
+    }
+  };
+
+  const queueAnswer = (question, answerId, newStats) => {
+    if (!PROGRESS_API) return;
+    const events = loadPendingEvents();
+    events.push({
+      id: `${getUserId()}-${Date.now().toString(36)}-${events.length}`,
+      question_id: question.id,
+      answer: answerId,
+      answered_at: Date.now() / 1000
+    });
+    localStorage.setItem('quizPendingEvents', JSON.stringify(events));
+    if (events.length >= SYNC_BATCH) syncProgress(newStats);
+  };
+
   const getStructuredData = () => {
     const programs = { 'prog2': 'Программа 2' };
     const structure = {};
 
-    questions.forEach(q => {
-      const prog = 'prog2';
-      if (!structure[prog]) structure[prog] = {};
-      if (!structure[prog][q.theme_id]) {
-        structure[prog][q.theme_id] = {
-          name: q.theme_name,
-          blocks: {}
-        };
-      }
-      const blockId = q.block_id || '0';
-      if (!structure[prog][q.theme_id].blocks[blockId]) {
-        structure[prog][q.theme_id].blocks[blockId] = {
-          name: q.block_name || 'Основной блок',
-          questions: []
-        };
-      }
-      structure[prog][q.theme_id].blocks[blockId].questions.push(q);
-    });
+    if (manifest) {
+      structure['prog2'] = {};
+      manifest.themes.forEach(theme => {
+        const loaded = themeBlocks[theme.id] || {};
+        const blocks = {};
+        theme.blocks.forEach(block => {
+          blocks[block.id] = {
+            name: block.name,
+            count: block.count,
+            questions: loaded[block.id] || []
+          };
+        });
+        structure['prog2'][theme.id] = { name: theme.name, blocks };
+      });
+    }
 
     return { programs, structure };
   };
 
   const { programs, structure } = getStructuredData();
+  const totalQuestions = manifest ? manifest.total : 0;
+
+  // Search hits grouped by law and section, in bank order
+  const getSearchResults = () => {
+    if (!searchData || tokenize(searchQuery).length === 0) return null;
+    const groups = new Map();
+    searchIndex(searchData, searchQuery).forEach(position => {
+      const key = `${searchData.themes[position]}_${searchData.blocks[position]}`;
+      if (!groups.has(key)) {
+        const theme = manifest.themes.find(t => t.id === searchData.themes[position]);
+        const block = theme && theme.blocks.find(b => b.id === searchData.blocks[position]);
+        groups.set(key, {
+          themeId: searchData.themes[position],
+          blockId: searchData.blocks[position],
+          themeName: theme ? theme.name : '',
+          blockName: block ? block.name : '',
+          count: 0
+        });
+      }
+      groups.get(key).count += 1;
+    });
+    return [...groups.values()];
+  };
 
   const getFilteredQuestions = () => {
     if (!selectedProgram || !selectedZakon || !selectedBlock) return [];
     const questions = structure[selectedProgram][selectedZakon].blocks[selectedBlock].questions;
 
     if (quizMode === 'mistakes') {
-      const key = `${selectedProgram}_${selectedZakon}_${selectedBlock}`;
-      const blockStats = stats[key];
-      if (blockStats && blockStats.incorrectQuestions) {
-        return questions.filter((_, idx) => blockStats.incorrectQuestions.includes(idx));
-      }
+      // In the order of mistakeIds, which follows the review scheduler when there is one
+      const byId = new Map(questions.map(q => [q.id, q]));
+      return mistakeIds.map(id => byId.get(id)).filter(Boolean);
     }
 
     return questions;
   };
 
-  const startQuiz = (mode) => {
+  // Order mistakes as the server's review scheduler asks them: most overdue first.
+  // Without the progress API (or when it fails) they keep the order they were made in.
+  const orderMistakes = async (ids) => {
+    if (!PROGRESS_API || ids.length === 0) return ids;
+    try {
+      const query = `theme=${encodeURIComponent(selectedZakon)}&block=${encodeURIComponent(selectedBlock)}`;
+      const blockSize = structure[selectedProgram][selectedZakon].blocks[selectedBlock].count;
+      const response = await fetch(`${PROGRESS_API}/${getUserId()}/next?${query}&limit=${blockSize}`);
+      if (!response.ok) return ids;
+      const { order } = await response.json();
+      const rank = new Map(order.map((entry, position) => [entry.id, position]));
+      const rankOf = id => (rank.has(id) ? rank.get(id) : order.length);
+      return [...ids].sort((a, b) => rankOf(a) - rankOf(b));
+    } catch (err) {
+      console.error('Error loading review order:', err);
+      return ids;
+    }
+  };
+
+  const startQuiz = async (mode) => {
+    // Fixed for the whole round, answering a mistake correctly must not shift the list
+    setMistakeIds(mode === 'mistakes' ? await orderMistakes([...getStatsForCurrentSelection().incorrectIds]) : []);
     setQuizMode(mode);
     setCurrentQuestionIndex(0);
     setUserAnswers([]);
@@ -157,7 +444,7 @@ const QuizApp = () => {
     const isCorrect = selectedAnswer === currentQuestion.correct_answer;
 
     setUserAnswers([...userAnswers, {
-      questionId: currentQuestionIndex,
+      questionId: currentQuestion.id,
       selectedAnswer,
       isCorrect
     }]);
@@ -167,20 +454,21 @@ const QuizApp = () => {
     const key = `${selectedProgram}_${selectedZakon}_${selectedBlock}`;
     const newStats = { ...stats };
     if (!newStats[key]) {
-      newStats[key] = { correct: 0, total: 0, incorrectQuestions: [] };
+      newStats[key] = { correct: 0, total: 0, incorrectIds: [] };
     }
     newStats[key].total += 1;
     if (isCorrect) {
       newStats[key].correct += 1;
-      newStats[key].incorrectQuestions = newStats[key].incorrectQuestions.filter(
-        idx => idx !== currentQuestionIndex
+      newStats[key].incorrectIds = newStats[key].incorrectIds.filter(
+        id => id !== currentQuestion.id
       );
     } else {
-      if (!newStats[key].incorrectQuestions.includes(currentQuestionIndex)) {
-        newStats[key].incorrectQuestions.push(currentQuestionIndex);
+      if (!newStats[key].incorrectIds.includes(currentQuestion.id)) {
+        newStats[key].incorrectIds.push(currentQuestion.id);
       }
     }
     saveStats(newStats);
+    queueAnswer(currentQuestion, selectedAnswer, newStats);
   };
 
   const handleNextQuestion = () => {
@@ -191,6 +479,7 @@ const QuizApp = () => {
       setShowExplanation(false);
     } else {
       setShowResults(true);
+      syncProgress(stats);
     }
   };
 
@@ -206,7 +495,7 @@ const QuizApp = () => {
 
   const getStatsForCurrentSelection = () => {
     const key = `${selectedProgram}_${selectedZakon}_${selectedBlock}`;
-    return stats[key] || { correct: 0, total: 0, incorrectQuestions: [] };
+    return stats[key] || { correct: 0, total: 0, incorrectIds: [] };
   };
 
   if (loading) {
@@ -238,7 +527,7 @@ const QuizApp = () => {
     );
   }
 
-  if (questions.length === 0) {
+  if (totalQuestions === 0) {
     return (
       <div className="min-h-screen bg-gradient-to-br from-blue-50 to-indigo-100 flex items-center justify-center p-4">
         <div className="bg-white rounded-2xl shadow-xl p-8 max-w-md text-center">
@@ -251,6 +540,8 @@ const QuizApp = () => {
   }
 
   if (!selectedProgram) {
+    const searchResults = getSearchResults();
+
     return (
       <div className="min-h-screen bg-gradient-to-br from-blue-50 to-indigo-100 p-4">
         <div className="max-w-4xl mx-auto">
@@ -260,7 +551,7 @@ const QuizApp = () => {
               <h1 className="text-3xl font-bold text-gray-800 px-1">Подготовка к экзамену</h1>
             </div>
             <p className="text-gray-600 mb-4">Выберите программу для начала подготовки</p>
-            <p className="text-sm text-gray-500 mb-8">Всего вопросов в базе: {questions.length}</p>
+            <p className="text-sm text-gray-500 mb-8">Всего вопросов в базе: {totalQuestions}</p>
 
             {Object.entries(programs).map(([progId, progName]) => (
               <button
@@ -273,6 +564,40 @@ const QuizApp = () => {
               </button>
             ))}
           </div>
+
+          {manifest && manifest.search && (
+            <div className="bg-white rounded-2xl shadow-xl p-8 mb-6">
+              <h2 className="text-xl font-bold text-gray-800 mb-4">Поиск по вопросам</h2>
+              <input
+                type="search"
+                value={searchQuery}
+                onFocus={loadSearchIndex}
+                onChange={(e) => setSearchQuery(e.target.value)}
+                placeholder="Слова из вопроса, ответа или статьи"
+                className="w-full px-4 py-3 border-2 border-gray-200 rounded-xl focus:border-indigo-500 outline-none mb-4"
+              />
+              {searchResults && searchResults.length === 0 && (
+                <p className="text-gray-500">Ничего не найдено</p>
+              )}
+              {searchResults && searchResults.length > 0 && (
+                <div className="space-y-2">
+                  {searchResults.slice(0, 20).map(group => (
+                    <button
+                      key={`${group.themeId}_${group.blockId}`}
+                      onClick={() => openBlock(group.themeId, group.blockId)}
+                      className="w-full border-2 border-gray-200 rounded-xl px-4 py-3 hover:border-indigo-500 transition-all text-left flex items-center justify-between"
+                    >
+                      <div>
+                        <div className="font-semibold text-gray-800">{group.themeName}</div>
+                        <div className="text-sm text-gray-500">{group.blockName} • {group.count} вопросов</div>
+                      </div>
+                      <ChevronRight className="w-5 h-5 text-gray-400" />
+                    </button>
+                  ))}
+                </div>
+              )}
+            </div>
+          )}
         </div>
       </div>
     );
@@ -292,21 +617,21 @@ const QuizApp = () => {
 
             <div className="space-y-4">
               {Object.entries(structure[selectedProgram]).map(([zakonId, zakonData]) => {
-                const totalQuestions = Object.values(zakonData.blocks).reduce(
-                  (sum, block) => sum + block.questions.length, 0
+                const zakonQuestions = Object.values(zakonData.blocks).reduce(
+                  (sum, block) => sum + block.count, 0
                 );
 
                 return (
                   <button
                     key={zakonId}
-                    onClick={() => setSelectedZakon(zakonId)}
+                    onClick={() => selectZakon(zakonId)}
                     className="w-full bg-white border-2 border-gray-200 rounded-xl px-5 py-4 hover:border-indigo-500 hover:shadow-lg transition-all text-left"
                   >
                     <div className="flex items-start justify-between">
                       <div>
                         <h3 className="text-lg font-semibold text-gray-800 mb-2">{zakonData.name}</h3>
                         <p className="text-sm text-gray-500">
-                          {Object.keys(zakonData.blocks).length} разделов • {totalQuestions} вопросов
+                          {Object.keys(zakonData.blocks).length} разделов • {zakonQuestions} вопросов
                         </p>
                       </div>
                       <ChevronRight className="w-6 h-6 text-gray-400 mt-1" />
@@ -349,7 +674,7 @@ const QuizApp = () => {
                     <div className="flex items-start justify-between mb-3">
                       <div className="flex-1">
                         <h3 className="text-lg font-semibold text-gray-800 mb-2">{blockData.name}</h3>
-                        <p className="text-sm text-gray-500">{blockData.questions.length} вопросов</p>
+                        <p className="text-sm text-gray-500">{blockData.count} вопросов</p>
                       </div>
                       <ChevronRight className="w-6 h-6 text-gray-400 mt-1" />
                     </div>
@@ -376,6 +701,17 @@ const QuizApp = () => {
   }
 
   if (!quizMode) {
+    if (themeLoading) {
+      return (
+        <div className="min-h-screen bg-gradient-to-br from-blue-50 to-indigo-100 flex items-center justify-center">
+          <div className="text-center">
+            <div className="animate-spin rounded-full h-16 w-16 border-b-4 border-indigo-600 mx-auto mb-4"></div>
+            <p className="text-gray-600 text-lg">Загрузка вопросов...</p>
+          </div>
+        </div>
+      );
+    }
+
     const currentStats = getStatsForCurrentSelection();
     const accuracy = currentStats.total > 0 ? Math.round((currentStats.correct / currentStats.total) * 100) : 0;
 
@@ -392,7 +728,7 @@ const QuizApp = () => {
               {structure[selectedProgram][selectedZakon].blocks[selectedBlock].name}
             </h2>
             <p className="text-gray-600 mb-6">
-              {structure[selectedProgram][selectedZakon].blocks[selectedBlock].questions.length} вопросов
+              {structure[selectedProgram][selectedZakon].blocks[selectedBlock].count} вопросов
             </p>
 
             {currentStats.total > 0 && (
@@ -431,7 +767,7 @@ const QuizApp = () => {
                 </div>
               </button>
 
-              {currentStats.incorrectQuestions && currentStats.incorrectQuestions.length > 0 && (
+              {currentStats.incorrectIds && currentStats.incorrectIds.length > 0 && (
                 <button
                   onClick={() => startQuiz('mistakes')}
                   className="w-full bg-gradient-to-r from-red-500 to-orange-600 text-white rounded-xl px-5 py-4 hover:from-red-600 hover:to-orange-700 transition-all"
@@ -441,7 +777,7 @@ const QuizApp = () => {
                     <div className="text-left">
                       <div className="text-xl font-semibold">Работа над ошибками</div>
                       <div className="text-sm opacity-90">
-                        {currentStats.incorrectQuestions.length} вопросов, в которых были ошибки
+                        {currentStats.incorrectIds.length} вопросов, в которых были ошибки
                       </div>
                     </div>
                   </div>
@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from exporters import JsonSink, export, iter_questions
+from question_bank import load_bank
+
+METHODS = {
+    'json.load': 'list of dicts from json.load',
+    'bank': 'QuestionBank built from the JSON',
+    'snapshot': 'QuestionBank mapped from a snapshot',
+}
+
+
+def memory_kib():
+    """Current and peak resident set size of this process, in KiB"""
+    values = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if name in ('VmRSS', 'VmHWM'):
+                values[name] = int(value.split()[0])
+    return values['VmRSS'], values['VmHWM']
+
+
+def scan(questions):
+    """Read the fields a quiz reads from every question; returns a checksum"""
+    total = 0
+    for q in questions:
+        total += len(q['question']) + len(q['answers']) + len(q.get('article') or '')
+    return total
+
+
+def measure(method, path):
+    """Load the bank one way in this (fresh) process and report time and memory"""
+    rss_before, _ = memory_kib()
+    started = time.perf_counter()
+    if method == 'json.load':
+        with open(path, 'r', encoding='utf-8') as f:
+            questions = json.load(f)
+    else:
+        questions = load_bank(path)
+    loaded = time.perf_counter()
+    rss_loaded, _ = memory_kib()
+    checksum = scan(questions)
+    scanned = time.perf_counter()
+    rss_scanned, peak = memory_kib()
+    return {
+        'count': len(questions),
+        'load_s': loaded - started,
+        'scan_s': scanned - loaded,
+        'rss_loaded_mib': (rss_loaded - rss_before) / 1024,
+        'rss_scanned_mib': (rss_scanned - rss_before) / 1024,
+        'peak_mib': peak / 1024,
+        'checksum': checksum,
+    }
+
+
+def run_measure(method, path):
+    """measure() in a subprocess, so every method starts from an empty heap"""
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--measure', method, path],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def scaled_questions(json_file, factor):
+    """The bank repeated factor times; copies get their own question texts and ids.
+
+    Answer options and article references repeat across copies like they
+    repeat across laws in the real bank.
+    """
+    for copy in range(factor):
+        for q in iter_questions(json_file):
+            if copy:
+                q = {key: value for key, value in q.items() if key != 'id'}
+                q['question'] = f"{q['question']} ({copy})"
+            yield q
+
+
+def report(label, path, snapshot):
+    print(f"\n{label}: {os.path.getsize(path) / 2**20:,.1f} MiB JSON, "
+          f"{os.path.getsize(snapshot) / 2**20:,.1f} MiB snapshot")
+    print(f"{'method':<12}{'records':>10}{'load s':>9}{'scan s':>9}{'RSS MiB':>10}"
+          f"{'+scan MiB':>11}{'peak MiB':>10}")
+    results = {}
+    for method in METHODS:
+        result = run_measure(method, snapshot if method == 'snapshot' else path)
+        results[method] = result
+        print(f"{method:<12}{result['count']:>10,}{result['load_s']:>9.3f}{result['scan_s']:>9.3f}"
+              f"{result['rss_loaded_mib']:>10.1f}{result['rss_scanned_mib']:>11.1f}{result['peak_mib']:>10.1f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare load time and memory of the bank loaders')
+    parser.add_argument('json_file', nargs='?', default='all_questions.json')
+    parser.add_argument('--scale', type=int, default=100, help='size of the synthetic bank, in banks')
+    parser.add_argument('--measure', metavar='METHOD', choices=sorted(METHODS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.json_file)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, 'bank.qbank')
+        load_bank(args.json_file).write_snapshot(snapshot)
+        report('Current bank', args.json_file, snapshot)
+
+        if args.scale > 1:
+            scaled = os.path.join(tmp, 'scaled')
+            export(scaled_questions(args.json_file, args.scale), [JsonSink(f"{scaled}.json")])
+            scaled_snapshot = f"{scaled}.qbank"
+            load_bank(f"{scaled}.json").write_snapshot(scaled_snapshot)
+            report(f"Synthetic {args.scale}x bank", f"{scaled}.json", scaled_snapshot)
+
+
+if __name__ == "__main__":
+    main()
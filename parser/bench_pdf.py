@@ -0,0 +1,110 @@
+import argparse
+import gc
+import importlib
+import io
+import time
+import tracemalloc
+
+from reportlab.platypus import PageBreak
+
+import pdf_styles
+from pdf_cache import ParagraphFactory
+from pdf_cli import LAYOUTS, group_themes, load_questions, ordered_themes
+from pdf_fonts import register_fonts
+from pdf_render import build_document
+from pdf_text import sanitize_text
+
+
+def build_story(module, themes, cached):
+    """Story of the whole document, the way the scripts build it in one process"""
+    if cached:
+        module.paragraphs = ParagraphFactory(sanitize_text)
+    else:
+        module.paragraphs = ParagraphFactory(sanitize_text, text_cache_size=0,
+                                             paragraph_cache_size=0, layout_cache_size=0)
+    pdf_styles.get_styles.cache_clear()
+
+    story = []
+    for i, (theme_id, theme_data) in enumerate(themes):
+        if not cached:
+            # What the scripts did before: fresh styles for every theme
+            pdf_styles.get_styles.cache_clear()
+        if i:
+            story.append(PageBreak())
+        story.extend(module.build_theme_story(theme_id, theme_data, first=(i == 0)))
+    return story
+
+
+def time_render(module, themes, cached):
+    gc.collect()
+    started = time.perf_counter()
+    story = build_story(module, themes, cached)
+    story_time = time.perf_counter() - started
+    started = time.perf_counter()
+    build_document(story, io.BytesIO(), register_fonts()[0])
+    return story_time * 1000, (time.perf_counter() - started) * 1000
+
+
+def measure_memory(module, themes, cached):
+    """Memory held by the story (and the caches) and the peak during the build"""
+    gc.collect()
+    tracemalloc.start()
+    story = build_story(module, themes, cached)
+    snapshot = tracemalloc.take_snapshot()
+    story_size, _ = tracemalloc.get_traced_memory()
+    build_document(story, io.BytesIO(), register_fonts()[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'story_kb': story_size / 1024,
+        'story_blocks': sum(stat.count for stat in snapshot.statistics('filename')),
+        'peak_kb': peak / 1024,
+        'stats': module.paragraphs.stats(),
+    }
+
+
+def measure(module, themes, repeat):
+    """Best-of-N timings for both modes, interleaved so machine noise hits both alike"""
+    modes = {'uncached': False, 'cached': True}
+    results = {mode: {'story_ms': float('inf'), 'build_ms': float('inf')} for mode in modes}
+    for _ in range(repeat):
+        for mode, cached in modes.items():
+            story_ms, build_ms = time_render(module, themes, cached)
+            results[mode]['story_ms'] = min(results[mode]['story_ms'], story_ms)
+            results[mode]['build_ms'] = min(results[mode]['build_ms'], build_ms)
+    for mode, cached in modes.items():
+        results[mode].update(measure_memory(module, themes, cached))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure PDF render time with and without the paragraph caches')
+    parser.add_argument('json_file', nargs='?', default='all_questions.json')
+    parser.add_argument('--layout', choices=sorted(LAYOUTS), action='append',
+                        help='layout to measure (default: both)')
+    parser.add_argument('--repeat', type=int, default=3, help='timing runs per mode, best is reported')
+    args = parser.parse_args()
+
+    questions = load_questions(args.json_file).questions
+    for layout in args.layout or sorted(LAYOUTS):
+        module = importlib.import_module(LAYOUTS[layout]['module'])
+        themes = ordered_themes(group_themes(layout, questions))
+        print(f"\n{module.__name__}.py ({sum(len(t['questions']) for _, t in themes)} questions)")
+        print(f"{'mode':<10}{'story ms':>10}{'build ms':>10}{'total ms':>10}"
+              f"{'story KiB':>11}{'allocations':>13}{'peak KiB':>10}")
+        results = measure(module, themes, args.repeat)
+        for mode, result in results.items():
+            total = result['story_ms'] + result['build_ms']
+            print(f"{mode:<10}{result['story_ms']:>10.1f}{result['build_ms']:>10.1f}{total:>10.1f}"
+                  f"{result['story_kb']:>11.0f}{result['story_blocks']:>13,}{result['peak_kb']:>10.0f}")
+
+        before = results['uncached']['story_ms'] + results['uncached']['build_ms']
+        after = results['cached']['story_ms'] + results['cached']['build_ms']
+        print(f"Render time: {100 * (before - after) / before:+.1f}% saved")
+        for name, stats in results['cached']['stats'].items():
+            print(f"  {name} cache: {stats['hits']} hits, {stats['misses']} misses, "
+                  f"hit rate {stats['hit_rate']:.0%}, {stats['size']}/{stats['maxsize']} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from bench_server import Client, free_port, wait_for_port
+from crawler import percentile
+from progress_store import BatchWriter, ProgressStore, make_event
+from quiz_server import QuestionStore, make_server, serve
+
+
+class EventSource:
+    """Answers of simulated users to random questions of the bank"""
+    def __init__(self, store, users, seed=1):
+        self.rng = random.Random(seed)
+        self.ids = list(store.questions)
+        self.block_keys = store.block_keys
+        self.users = [f"user{i}" for i in range(users)]
+        self.counter = 0
+        self.clock = 1_700_000_000.0
+
+    def event(self, user_id=None):
+        self.counter += 1
+        self.clock += 0.01
+        qid = self.rng.choice(self.ids)
+        return make_event(user_id or self.rng.choice(self.users), qid, self.block_keys[qid],
+                          self.rng.random() < 0.7, self.clock, f"e{self.counter}")
+
+    def events(self, count, user_id=None):
+        return [self.event(user_id) for _ in range(count)]
+
+
+def time_writes(path, source, total, batch_size):
+    """Events/s writing total events in transactions of batch_size"""
+    store = ProgressStore(path)
+    batches = [source.events(batch_size) for _ in range(total // batch_size)]
+    started = time.perf_counter()
+    for batch in batches:
+        store.write(batch)
+    elapsed = time.perf_counter() - started
+    check(store)
+    store.close()
+    return total / elapsed
+
+
+async def group_commit(path, source, clients, syncs, per_sync):
+    """Concurrent clients syncing a few events each through one BatchWriter"""
+    store = ProgressStore(path)
+    writer = BatchWriter(store)
+    latencies = []
+
+    async def client(user_id):
+        for _ in range(syncs):
+            events = source.events(per_sync, user_id)
+            started = time.perf_counter()
+            await writer.submit(events)
+            store.progress(user_id)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(user_id) for user_id in source.users[:clients]))
+    elapsed = time.perf_counter() - started
+    await writer.close()
+    check(store)
+    store.close()
+    return clients * syncs * per_sync / elapsed, writer.commits, latencies
+
+
+def run_server(json_file, port, progress_db):
+    asyncio.run(serve(make_server(json_file, progress_db=progress_db), '127.0.0.1', port))
+
+
+async def http_sync(port, source, clients, duration, per_sync):
+    """Clients POSTing syncs to a server in a subprocess"""
+    await wait_for_port('127.0.0.1', port)
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def client(user_id):
+        connection = Client('127.0.0.1', port)
+        try:
+            while time.perf_counter() < deadline:
+                events = [{'id': event_id, 'question_id': qid, 'answer': '1', 'answered_at': answered_at}
+                          for _, event_id, qid, _, _, answered_at in source.events(per_sync, user_id)]
+                body = json.dumps({'events': events}).encode('utf-8')
+                started = time.perf_counter()
+                status, _ = await connection.request('POST', f"/api/progress/{user_id}/sync", body)
+                latencies.append(time.perf_counter() - started)
+                assert status == 200, status
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(user_id) for user_id in source.users[:clients]))
+    return len(latencies) * per_sync / (time.perf_counter() - started), latencies
+
+
+def check(store):
+    if store.stored() != store.recompute():
+        raise SystemExit("Incremental block aggregates differ from a recomputation of the event log")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the SQLite progress store')
+    parser.add_argument('json_file', nargs='?', default='all_questions.json')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--clients', type=int, default=200, help='concurrent syncing clients')
+    parser.add_argument('--per-sync', type=int, default=5, help='events per sync request')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds of the HTTP run')
+    args = parser.parse_args()
+
+    store = QuestionStore.load(args.json_file)
+    source = EventSource(store, max(args.users, args.clients))
+    with tempfile.TemporaryDirectory() as tmp:
+        single = time_writes(os.path.join(tmp, 'single.sqlite'), source, min(args.events, 3000), 1)
+        print(f"one transaction per event:   {single:>10,.0f} events/s")
+        for batch_size in (100, 1000):
+            rate = time_writes(os.path.join(tmp, f"batch{batch_size}.sqlite"), source, args.events, batch_size)
+            print(f"batches of {batch_size:<5}             {rate:>10,.0f} events/s")
+
+        syncs = max(1, args.events // (args.clients * args.per_sync))
+        rate, commits, latencies = asyncio.run(group_commit(
+            os.path.join(tmp, 'group.sqlite'), source, args.clients, syncs, args.per_sync))
+        print(f"group commit, {args.clients} clients x {args.per_sync} events: {rate:>10,.0f} events/s "
+              f"in {commits} commits, p99 sync {percentile(latencies, 99) * 1000:.1f} ms")
+
+        port = free_port()
+        process = multiprocessing.Process(target=run_server, daemon=True,
+                                          args=(args.json_file, port, os.path.join(tmp, 'http.sqlite')))
+        process.start()
+        try:
+            rate, latencies = asyncio.run(http_sync(port, source, args.clients, args.duration, args.per_sync))
+        finally:
+            process.terminate()
+            process.join()
+        print(f"HTTP sync, {args.clients} clients x {args.per_sync} events:    {rate:>10,.0f} events/s, "
+              f"{len(latencies) / args.duration:,.0f} req/s, p50 {percentile(latencies, 50) * 1000:.1f} ms, "
+              f"p99 {percentile(latencies, 99) * 1000:.1f} ms")
+    print("Block aggregates match a recomputation from the event log")
+
+
+if __name__ == "__main__":
+    main()
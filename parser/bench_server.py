@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import time
+from collections import Counter
+
+from crawler import percentile
+from quiz_server import DEFAULT_PAGE_SIZE, QuestionStore, make_server, serve
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def run_server(json_file, host, port):
+    asyncio.run(serve(make_server(json_file), host, port))
+
+
+async def wait_for_port(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+class Client:
+    """One simulated user on a keep-alive connection that revalidates with ETags like a browser"""
+    def __init__(self, host, port, gzip=True):
+        self.host = host
+        self.port = port
+        self.gzip = gzip
+        self.etags = {}
+        self.reader = self.writer = None
+
+    async def request(self, method, target, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        headers = [f"{method} {target} HTTP/1.1", f"Host: {self.host}"]
+        if self.gzip:
+            headers.append('Accept-Encoding: gzip')
+        if target in self.etags:
+            headers.append(f"If-None-Match: {self.etags[target]}")
+        if body is not None:
+            headers += ['Content-Type: application/json', f"Content-Length: {len(body)}"]
+        self.writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + (body or b''))
+
+        head = (await self.reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = int(head[0].split(' ')[1])
+        response_headers = {}
+        for line in head[1:]:
+            name, _, value = line.partition(':')
+            if name:
+                response_headers[name.lower()] = value.strip()
+        payload = await self.reader.readexactly(int(response_headers.get('content-length', 0)))
+        if 'etag' in response_headers:
+            self.etags[target] = response_headers['etag']
+        return status, len(payload)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class RequestMix:
+    """What quiz users send: mostly block pages and answer checks"""
+    def __init__(self, store):
+        self.pages = [f"/api/themes/{theme_id}/blocks/{block_id}/questions?page={page}"
+                      for (theme_id, block_id), ids in store.by_block.items()
+                      for page in range(1, (len(ids) + DEFAULT_PAGE_SIZE - 1) // DEFAULT_PAGE_SIZE + 1)]
+        self.ids = list(store.questions)
+        self.themes = list(store.themes)
+
+    def next(self, rng):
+        """(method, target, body) of the next request"""
+        roll = rng.random()
+        if roll < 0.45:
+            return 'GET', rng.choice(self.pages), None
+        if roll < 0.65:
+            body = {'id': rng.choice(self.ids), 'answer': rng.choice('1234')}
+            return 'POST', '/api/check', json.dumps(body).encode('utf-8')
+        if roll < 0.80:
+            return 'GET', f"/api/questions/{rng.choice(self.ids)}", None
+        if roll < 0.90:
+            return 'GET', f"/api/ticket?theme={rng.choice(self.themes)}&size=20", None
+        return 'GET', '/api/themes', None
+
+
+async def user(host, port, mix, seed, deadline, latencies, statuses, sizes):
+    rng = random.Random(seed)
+    client = Client(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            method, target, body = mix.next(rng)
+            started = time.perf_counter()
+            status, size = await client.request(method, target, body)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+            sizes.append(size)
+    finally:
+        client.close()
+
+
+async def load_test(host, port, mix, users, duration):
+    await wait_for_port(host, port)
+    latencies, statuses, sizes = [], Counter(), []
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(user(host, port, mix, seed, deadline, latencies, statuses, sizes)
+                           for seed in range(users)))
+    elapsed = time.perf_counter() - started
+    return latencies, statuses, sizes, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the quiz API server with many concurrent users')
+    parser.add_argument('json_file', nargs='?', default='all_questions.json')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+    parser.add_argument('--server', metavar='HOST:PORT',
+                        help='test a running server instead of starting one in a subprocess')
+    args = parser.parse_args()
+
+    store = QuestionStore.load(args.json_file)
+    process = None
+    if args.server:
+        host, port = args.server.rsplit(':', 1)
+        port = int(port)
+    else:
+        host, port = '127.0.0.1', free_port()
+        process = multiprocessing.Process(target=run_server, args=(args.json_file, host, port), daemon=True)
+        process.start()
+    try:
+        latencies, statuses, sizes, elapsed = asyncio.run(
+            load_test(host, port, RequestMix(store), args.users, args.duration))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join()
+
+    print(f"{len(latencies)} requests from {args.users} users in {elapsed:.1f} s: "
+          f"{len(latencies) / elapsed:,.0f} req/s")
+    print(f"latency p50 {percentile(latencies, 50) * 1000:.2f} ms, p90 {percentile(latencies, 90) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 99) * 1000:.2f} ms, max {max(latencies) * 1000:.2f} ms")
+    print(f"statuses: {', '.join(f'{status}: {count}' for status, count in sorted(statuses.items()))}; "
+          f"mean body {sum(sizes) / len(sizes):,.0f} bytes")
+
+
+if __name__ == "__main__":
+    main()
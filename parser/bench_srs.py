@@ -0,0 +1,101 @@
+import argparse
+import gc
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from spaced_repetition import DAY, ReviewBank, ReviewScheduler, grade_answer, load_bank_ids
+
+START = 1_700_000_000.0
+
+
+def simulate(bank, users, days, per_day, seed):
+    """Every user answers per_day questions a day, right with their own probability"""
+    rng = random.Random(seed)
+    schedulers = [ReviewScheduler(bank) for _ in range(users)]
+    skills = [rng.uniform(0.5, 0.95) for _ in range(users)]
+    next_due_times = []
+    reviews = 0
+
+    gc.collect()
+    started = time.perf_counter()
+    for day in range(days):
+        for scheduler, skill in zip(schedulers, skills):
+            now = START + day * DAY + rng.uniform(0, DAY / 2)
+            remaining = per_day
+            while remaining:
+                t0 = time.perf_counter()
+                batch = scheduler.next_due(now, limit=min(remaining, 10))
+                next_due_times.append(time.perf_counter() - t0)
+                if not batch:
+                    break
+                for qid in batch:
+                    scheduler.review(qid, grade_answer(rng.random() < skill), now)
+                    now += rng.uniform(5, 40)
+                reviews += len(batch)
+                remaining -= len(batch)
+    elapsed = time.perf_counter() - started
+    return schedulers, reviews, elapsed, next_due_times
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def measure_memory(bank, schedulers):
+    """Bytes one learner's scheduler holds, averaged over a sample rebuilt from its saved state"""
+    sample = schedulers[:50]
+    states = [scheduler.to_dict() for scheduler in sample]
+    gc.collect()
+    tracemalloc.start()
+    rebuilt = [ReviewScheduler.from_dict(bank, state) for state in states]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rebuilt
+    state_bytes = [len(json.dumps(state, separators=(',', ':'))) for state in states]
+    return size / len(sample), statistics.mean(state_bytes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the review scheduler with simulated learners')
+    parser.add_argument('json_file', nargs='?', default='all_questions.json')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=14)
+    parser.add_argument('--per-day', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    bank = ReviewBank(load_bank_ids(args.json_file)[0])
+    print(f"Bank: {len(bank)} question ids ({(time.perf_counter() - started) * 1000:.0f} ms to load)")
+
+    schedulers, reviews, elapsed, next_due_times = simulate(bank, args.users, args.days,
+                                                          args.per_day, args.seed)
+    print(f"Simulated {args.users} users x {args.days} days x {args.per_day} answers: "
+          f"{reviews} reviews in {elapsed:.2f} s ({reviews / elapsed:,.0f} reviews/s incl. next_due)")
+    print(f"next_due: {len(next_due_times)} calls, "
+          f"p50 {percentile(next_due_times, 0.5) * 1e6:.1f} us, "
+          f"p99 {percentile(next_due_times, 0.99) * 1e6:.1f} us, "
+          f"max {max(next_due_times) * 1e6:.1f} us")
+
+    end = START + args.days * DAY
+    due = [scheduler.due_count(end) for scheduler in schedulers]
+    cards = [len(scheduler.cards) for scheduler in schedulers]
+    print(f"After {args.days} days: {statistics.mean(cards):.0f} questions seen, "
+          f"{statistics.mean(due):.0f} due per user on average")
+
+    started = time.perf_counter()
+    for scheduler in schedulers[:200]:
+        scheduler.review_order(end)
+    print(f"review_order: {(time.perf_counter() - started) / min(200, len(schedulers)) * 1000:.2f} ms per user")
+
+    per_user, state_size = measure_memory(bank, schedulers)
+    print(f"Memory: {per_user / 1024:.1f} KiB per user (bank shared), "
+          f"saved state {state_size / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import gzip
+import hashlib
+import os
+import re
+from pathlib import Path
+
+from build_bank import ROOT, build_shards, compact_json, print_report, write_bank
+from dedup import question_id
+from exporters import build_tree, iter_questions
+from search_index import build_index
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HASH_LENGTH = 10
+
+# Files owned by this build, old versions of them are pruned
+ASSET_PATTERN = re.compile(r'^(theme_\w+|manifest|all_questions|bank_tree|search_index)(\.[0-9a-f]+)?\.json(\.gz|\.br)?$')
+
+
+def content_hash(data):
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(stem, content):
+    return f"{stem}.{content_hash(content)}.json"
+
+
+def compress(path):
+    """Write pre-compressed .gz (and .br if brotli is installed) next to a file"""
+    data = path.read_bytes()
+    written = [path.with_name(path.name + '.gz')]
+    # mtime=0 keeps the .gz output identical for identical input
+    written[0].write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        written.append(path.with_name(path.name + '.br'))
+        written[1].write_bytes(brotli.compress(data, quality=11))
+    return written
+
+
+def write_minified_bank(source, out_dir):
+    """Write the bank grouped by theme and block as compact JSON with a content-hashed name"""
+    questions = []
+    for question in iter_questions(source):
+        # Banks scraped before ids were stored get them here
+        question.setdefault('id', question_id(question))
+        questions.append(question)
+    content = compact_json(build_tree(questions))
+    path = out_dir / hashed_name('bank_tree', content)
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+def rewrite_app(app_path, manifest_url, fallback_url):
+    """Point the app's fetch constants at the freshly built files"""
+    text = app_path.read_text(encoding='utf-8')
+    text, manifest_count = re.subn(r"const BANK_MANIFEST = '[^']*';",
+                                   f"const BANK_MANIFEST = '{manifest_url}';", text)
+    text, fallback_count = re.subn(r"const BANK_FALLBACK = '[^']*';",
+                                   f"const BANK_FALLBACK = '{fallback_url}';", text)
+    if not (manifest_count and fallback_count):
+        raise SystemExit(f"{app_path} has no BANK_MANIFEST/BANK_FALLBACK constants to rewrite")
+    app_path.write_text(text, encoding='utf-8')
+
+
+def prune(out_dir, keep):
+    """Remove old hashed assets that are no longer referenced"""
+    removed = []
+    for path in out_dir.iterdir():
+        if ASSET_PATTERN.match(path.name) and path.name not in keep:
+            path.unlink()
+            removed.append(path.name)
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build minified, compressed, content-hashed question assets')
+    parser.add_argument('input', nargs='?', default=str(ROOT / 'all_questions.json'))
+    parser.add_argument('--out', default=str(ROOT / 'data'), help='output directory (default: data/)')
+    parser.add_argument('--app', default=str(ROOT / 'app.jsx'), help='app source to rewrite')
+    parser.add_argument('--no-report', action='store_true', help='skip the size/parse-time report')
+    args = parser.parse_args()
+
+    out_dir = Path(args.out)
+    manifest, manifest_name = write_bank(build_shards(iter_questions(args.input)), out_dir,
+                                         file_name=hashed_name, search=build_index(args.input))
+    fallback = write_minified_bank(args.input, out_dir)
+
+    written = [manifest_name, fallback.name, manifest['search']]
+    written += [theme['file'] for theme in manifest['themes']]
+    keep = set(written)
+    for name in written:
+        keep.update(path.name for path in compress(out_dir / name))
+    removed = prune(out_dir, keep)
+
+    app_path = Path(args.app)
+    prefix = './' + os.path.relpath(out_dir, app_path.parent).replace(os.sep, '/')
+    rewrite_app(app_path, f"{prefix}/{manifest_name}", f"{prefix}/{fallback.name}")
+
+    print(f"Wrote {len(written)} assets to {out_dir} (+ .gz{'/.br' if brotli else ''} variants)")
+    if brotli is None:
+        print("Note: install 'brotli' to also write .br files")
+    if removed:
+        print(f"Removed {len(removed)} outdated files")
+    print(f"{app_path.name} now loads {manifest_name}")
+    if not args.no_report:
+        print_report(args.input, out_dir, manifest, manifest_name)
+
+
+if __name__ == "__main__":
+    main()
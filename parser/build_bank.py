@@ -0,0 +1,182 @@
+import argparse
+import gzip
+import json
+import os
+import time
+from pathlib import Path
+
+from dedup import question_id
+from exporters import iter_questions
+from search_index import build_index
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BLOCK_ID = '0'
+DEFAULT_BLOCK_NAME = 'Основной блок'
+
+# Layout of one question row inside a shard
+QUESTION_FIELDS = ['block', 'question_number', 'question', 'answers', 'correct_answer', 'article', 'id']
+
+
+class StringTable:
+    """Interns strings and hands out their index"""
+    def __init__(self):
+        self.strings = []
+        self.index = {}
+
+    def add(self, text):
+        text = text or ''
+        position = self.index.get(text)
+        if position is None:
+            position = len(self.strings)
+            self.index[text] = position
+            self.strings.append(text)
+        return position
+
+
+class ThemeShard:
+    """Compact per-theme shard: a string table plus positional question rows"""
+    def __init__(self, theme_id, theme_name):
+        self.theme_id = theme_id
+        self.theme_name = theme_name
+        self.strings = StringTable()
+        self.blocks = []
+        self.block_index = {}
+        self.rows = []
+
+    def add(self, q):
+        block_id = str(q.get('block_id') or DEFAULT_BLOCK_ID)
+        position = self.block_index.get(block_id)
+        if position is None:
+            position = len(self.blocks)
+            self.block_index[block_id] = position
+            self.blocks.append({'id': block_id, 'name': q.get('block_name') or DEFAULT_BLOCK_NAME, 'count': 0})
+        self.blocks[position]['count'] += 1
+
+        answers = sorted(q.get('answers', {}).items(), key=lambda item: int(item[0]) if item[0].isdigit() else 0)
+        self.rows.append([
+            position,
+            q.get('question_number', 0),
+            self.strings.add(q.get('question')),
+            [[answer_id, self.strings.add(text)] for answer_id, text in answers],
+            q.get('correct_answer'),
+            self.strings.add(q.get('article')),
+            question_id(q),
+        ])
+
+    def to_dict(self):
+        return {
+            'theme_id': self.theme_id,
+            'theme_name': self.theme_name,
+            'fields': QUESTION_FIELDS,
+            'blocks': [{'id': block['id'], 'name': block['name']} for block in self.blocks],
+            'strings': self.strings.strings,
+            'questions': self.rows,
+        }
+
+
+def compact_json(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def build_shards(questions):
+    """Group questions into theme shards, keeping the input order"""
+    shards = {}
+    for q in questions:
+        theme_id = str(q['theme_id'])
+        shard = shards.get(theme_id)
+        if shard is None:
+            shard = shards[theme_id] = ThemeShard(theme_id, q.get('theme_name', ''))
+        shard.add(q)
+    return shards
+
+
+def plain_name(stem, content):
+    return f"{stem}.json"
+
+
+def write_bank(shards, out_dir, file_name=plain_name, search=None):
+    """Write one file per theme plus a manifest; return the manifest and its file name.
+
+    file_name(stem, content) picks the name of each written file. A search
+    index, if given, is written too and listed in the manifest.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    themes = []
+    for theme_id in sorted(shards, key=lambda x: int(x) if x.isdigit() else 0):
+        shard = shards[theme_id]
+        content = compact_json(shard.to_dict())
+        name = file_name(f"theme_{theme_id}", content)
+        (out_dir / name).write_text(content, encoding='utf-8')
+        themes.append({
+            'id': theme_id,
+            'name': shard.theme_name,
+            'count': len(shard.rows),
+            'file': name,
+            'blocks': shard.blocks,
+        })
+
+    manifest = {
+        'version': 1,
+        'total': sum(theme['count'] for theme in themes),
+        'themes': themes,
+    }
+    if search is not None:
+        content = compact_json(search.to_dict())
+        manifest['search'] = file_name('search_index', content)
+        (out_dir / manifest['search']).write_text(content, encoding='utf-8')
+    content = compact_json(manifest)
+    manifest_name = file_name('manifest', content)
+    (out_dir / manifest_name).write_text(content, encoding='utf-8')
+    return manifest, manifest_name
+
+
+def time_parse(path, repeat=5):
+    """Best-of-N json.loads time for a file, in milliseconds"""
+    text = Path(path).read_text(encoding='utf-8')
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        json.loads(text)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def gzip_size(path):
+    return len(gzip.compress(Path(path).read_bytes(), 9))
+
+
+def print_report(source, out_dir, manifest, manifest_name='manifest.json'):
+    """Compare sizes and parse times of the source file and the shards"""
+    shard_paths = [out_dir / theme['file'] for theme in manifest['themes']]
+    largest = max(shard_paths, key=os.path.getsize)
+    manifest_path = out_dir / manifest_name
+
+    print(f"{'file':<28}{'bytes':>12}{'gzip':>12}{'parse ms':>10}")
+    rows = [('source ' + Path(source).name, source), (manifest_name, manifest_path),
+            (f"largest {largest.name}", largest)]
+    for label, path in rows:
+        print(f"{label:<28}{os.path.getsize(path):>12,}{gzip_size(path):>12,}{time_parse(path):>10.2f}")
+    total = sum(os.path.getsize(path) for path in shard_paths)
+    print(f"{'all shards':<28}{total:>12,}{sum(gzip_size(p) for p in shard_paths):>12,}")
+    print(f"First load of one law: manifest + largest shard = "
+          f"{os.path.getsize(manifest_path) + os.path.getsize(largest):,} bytes "
+          f"vs {os.path.getsize(source):,} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile the question bank into per-theme shards for the web app')
+    parser.add_argument('input', nargs='?', default=str(ROOT / 'all_questions.json'))
+    parser.add_argument('--out', default=str(ROOT / 'data'), help='output directory (default: data/)')
+    parser.add_argument('--no-report', action='store_true', help='skip the size/parse-time report')
+    args = parser.parse_args()
+
+    out_dir = Path(args.out)
+    manifest, _ = write_bank(build_shards(iter_questions(args.input)), out_dir,
+                             search=build_index(args.input))
+    print(f"Wrote {manifest['total']} questions in {len(manifest['themes'])} shards to {out_dir}")
+    if not args.no_report:
+        print_report(args.input, out_dir, manifest)
+
+
+if __name__ == "__main__":
+    main()
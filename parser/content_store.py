@@ -0,0 +1,73 @@
+import hashlib
+import json
+import os
+
+from journal import write_json_atomic
+
+
+def payload_hash(testobj):
+    """Stable content hash of a block's raw testobj payload"""
+    canonical = json.dumps(testobj, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ContentStore:
+    """Per-block payload hashes and HTTP validators from the last refresh"""
+    def __init__(self, path='block_hashes.json'):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                print(f"Error loading {path}: {e}")
+
+    def get(self, key):
+        return self.entries.get(key, {})
+
+    def conditional_headers(self, key):
+        """Headers for a conditional GET based on what the server sent last time"""
+        entry = self.get(key)
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def update(self, key, content_hash=None, etag=None, last_modified=None):
+        entry = self.entries.setdefault(key, {})
+        if content_hash:
+            entry['hash'] = content_hash
+        if etag:
+            entry['etag'] = etag
+        if last_modified:
+            entry['last_modified'] = last_modified
+
+    def save(self):
+        write_json_atomic(self.path, self.entries)
+
+
+def question_key(question):
+    return (question.get('theme_id'), question.get('question_number'))
+
+
+def question_fields(question):
+    return (question.get('question'), question.get('answers'),
+            question.get('correct_answer'), question.get('article'))
+
+
+def diff_questions(old_questions, new_questions):
+    """Questions added, removed or changed between two versions of a block"""
+    old = {question_key(q): q for q in old_questions}
+    new = {question_key(q): q for q in new_questions}
+    return {
+        'added': [new[key] for key in new if key not in old],
+        'removed': [old[key] for key in old if key not in new],
+        'changed': [
+            {'before': old[key], 'after': new[key]}
+            for key in new
+            if key in old and question_fields(old[key]) != question_fields(new[key])
+        ],
+    }
@@ -0,0 +1,140 @@
+import asyncio
+import math
+import random
+import time
+
+from testobj import find_testobj
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class TokenBucket:
+    """Token bucket limiting how many requests start per second"""
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CrawlStats:
+    """Request counters and latencies of one crawl"""
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.blocks = 0
+        self.latencies = []
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def summary(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        return {
+            'requests': self.requests,
+            'blocks': self.blocks,
+            'retries': self.retries,
+            'failures': self.failures,
+            'elapsed_seconds': round(elapsed, 3),
+            'requests_per_second': round(self.requests / elapsed, 2) if elapsed else 0.0,
+            'p50_latency': round(percentile(self.latencies, 50), 3),
+            'p95_latency': round(percentile(self.latencies, 95), 3),
+        }
+
+    def print_summary(self):
+        data = self.summary()
+        print(f"Crawl: {data['blocks']} blocks, {data['requests']} requests in {data['elapsed_seconds']}s "
+              f"({data['requests_per_second']} req/s), p50={data['p50_latency']}s "
+              f"p95={data['p95_latency']}s, retries={data['retries']}, failures={data['failures']}")
+
+
+class AsyncCrawler:
+    """Fetch all block pages concurrently with a rate limit and retries"""
+    def __init__(self, extractor, concurrency=8, rate=4.0, retries=3, backoff=0.5):
+        self.extractor = extractor
+        self.concurrency = concurrency
+        self.rate = rate
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = CrawlStats()
+
+    async def fetch_block(self, semaphore, bucket, zakon, block):
+        """Return the questions of one block, or None if it needs a fallback"""
+        url = self.extractor.block_url(zakon['num'], block['num'])
+        for attempt in range(self.retries + 1):
+            async with semaphore:
+                await bucket.acquire()
+                started = time.perf_counter()
+                self.stats.requests += 1
+                try:
+                    response = await asyncio.to_thread(self.extractor.fetch, url)
+                    error = None
+                except Exception as e:
+                    error = e
+                self.stats.latencies.append(time.perf_counter() - started)
+
+            if error is None:
+                testobj = find_testobj(response.text)
+                if testobj is None:
+                    print(f"No testobj found at {url}")
+                    return None
+                return self.extractor.block_questions(testobj, zakon['num'], block['num'], block['name'], url)
+
+            if attempt < self.retries:
+                self.stats.retries += 1
+                delay = self.backoff * 2 ** attempt * (1 + random.random())
+                print(f"Retrying {url} in {delay:.1f}s ({error})")
+                await asyncio.sleep(delay)
+            else:
+                print(f"Giving up on {url}: {error}")
+        self.stats.failures += 1
+        return None
+
+    async def crawl(self, structure, jobs, on_result):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        bucket = TokenBucket(self.rate)
+
+        async def run(job):
+            zakon_index, block_index = job
+            zakon = structure[zakon_index]
+            questions = await self.fetch_block(semaphore, bucket, zakon, zakon['blocks'][block_index])
+            return job, questions
+
+        remaining = []
+        for task in asyncio.as_completed([run(job) for job in jobs]):
+            (zakon_index, block_index), questions = await task
+            if questions:
+                self.stats.blocks += 1
+                # Journaling fsyncs, so it runs off the loop the other fetches share
+                await asyncio.to_thread(on_result, zakon_index, block_index, questions)
+            else:
+                remaining.append((zakon_index, block_index))
+        return sorted(remaining)
+
+    def run(self, structure, jobs, on_result):
+        """Crawl the given jobs and return those that still need a browser"""
+        self.stats = CrawlStats()
+        try:
+            return asyncio.run(self.crawl(structure, jobs, on_result))
+        finally:
+            self.stats.finished = time.perf_counter()
+            self.stats.print_summary()
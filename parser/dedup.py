@@ -0,0 +1,224 @@
+import hashlib
+import random
+import re
+import zlib
+from functools import lru_cache
+
+TAG_RE = re.compile(r'<[^>]*>')
+NON_WORD_RE = re.compile(r'[\W_]+')
+
+SHINGLE_SIZE = 4
+NUM_PERM = 32
+BANDS = 8
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_text(text):
+    """Lowercase, drop markup and punctuation, fold ё into е and collapse spaces"""
+    if not text:
+        return ''
+    text = TAG_RE.sub(' ', text).casefold().replace('ё', 'е')
+    return NON_WORD_RE.sub(' ', text).strip()
+
+
+@lru_cache(maxsize=1 << 15)
+def text_key(text):
+    """Short hash of the normalized text, equal for texts that only differ in noise"""
+    return hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=8).hexdigest()
+
+
+@lru_cache(maxsize=1 << 15)
+def normalize_option(text):
+    """normalize_text for answer options, which repeat across many questions"""
+    return normalize_text(text)
+
+
+def answers_key(answers):
+    """Order-independent key of a question's answer options"""
+    return frozenset(text_key(text) for text in answers.values())
+
+
+def record_key(q):
+    """Key of an exact duplicate: same question, same options, same correct answer"""
+    return (
+        str(q.get('theme_id')),
+        text_key(q.get('question')),
+        answers_key(q.get('answers', {})),
+        text_key(q.get('correct_answer_text') or q.get('answers', {}).get(q.get('correct_answer'), '')),
+    )
+
+
+def question_id(q):
+    """Stable id of a question derived from its theme, text and answer options.
+
+    Records that only differ in markup, case, punctuation or option order get
+    the same id; an id already stored on the record wins.
+    """
+    if q.get('id'):
+        return q['id']
+    parts = [str(q.get('theme_id')), normalize_text(q.get('question'))]
+    parts.extend(sorted(normalize_option(text) for text in q.get('answers', {}).values()))
+    return hashlib.blake2b('\x1f'.join(parts).encode('utf-8'), digest_size=6).hexdigest()
+
+
+def unique_records(questions):
+    """Yield questions, skipping exact duplicates; works on a stream"""
+    seen = set()
+    for q in questions:
+        key = record_key(q)
+        if key not in seen:
+            seen.add(key)
+            yield q
+
+
+def group_by_theme(questions):
+    """Group unique records by theme: {theme_id: {'name': ..., 'questions': [records]}}"""
+    themes = {}
+    for q in unique_records(questions):
+        theme_id = str(q['theme_id'])
+        if theme_id not in themes:
+            themes[theme_id] = {'name': q['theme_name'], 'questions': []}
+        themes[theme_id]['questions'].append(q)
+    return themes
+
+
+class QuestionGroup:
+    """A question text with all distinct correct answers found for it"""
+    __slots__ = ('question', 'article', 'question_number', 'answers', 'answer_keys')
+
+    def __init__(self, q):
+        self.question = q['question']
+        self.article = q.get('article', '')
+        self.question_number = q.get('question_number', 0)
+        self.answers = []
+        self.answer_keys = set()
+
+    def add_answer(self, text):
+        key = text_key(text)
+        if text and key not in self.answer_keys:
+            self.answer_keys.add(key)
+            self.answers.append(text)
+
+    def merge(self, other):
+        for text in other.answers:
+            self.add_answer(text)
+        self.question_number = min(self.question_number, other.question_number)
+        self.article = self.article or other.article
+
+
+def group_by_question(questions, near_duplicates=False, threshold=0.85):
+    """Group questions by theme and normalized text, merging their correct answers.
+
+    Returns {theme_id: {'name': ..., 'questions': [QuestionGroup, ...]}} with
+    groups in first-seen order. With near_duplicates, texts whose estimated
+    Jaccard similarity is at least threshold are merged too.
+    """
+    themes = {}
+    for q in questions:
+        theme_id = str(q['theme_id'])
+        theme = themes.get(theme_id)
+        if theme is None:
+            theme = themes[theme_id] = {'name': q['theme_name'], 'groups': {}}
+        key = text_key(q['question'])
+        group = theme['groups'].get(key)
+        if group is None:
+            group = theme['groups'][key] = QuestionGroup(q)
+        group.add_answer(q.get('correct_answer_text') or q.get('answers', {}).get(q.get('correct_answer'), ''))
+
+    result = {}
+    for theme_id, theme in themes.items():
+        groups = list(theme['groups'].values())
+        if near_duplicates:
+            groups = merge_near_duplicates(groups, threshold)
+        result[theme_id] = {'name': theme['name'], 'questions': groups}
+    return result
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Character shingles of the normalized text as 32-bit hashes"""
+    text = normalize_text(text)
+    if len(text) <= size:
+        return {zlib.crc32(text.encode('utf-8'))}
+    return {zlib.crc32(text[i:i + size].encode('utf-8')) for i in range(len(text) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures over character shingles"""
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = random.Random(seed)
+        self.permutations = [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+                             for _ in range(num_perm)]
+
+    def signature(self, text):
+        values = shingles(text)
+        return tuple(
+            min((a * value + b) % MERSENNE_PRIME for value in values)
+            for a, b in self.permutations
+        )
+
+
+def estimate_similarity(signature_a, signature_b):
+    same = sum(1 for a, b in zip(signature_a, signature_b) if a == b)
+    return same / len(signature_a)
+
+
+class LSHIndex:
+    """Banded locality-sensitive hash index of MinHash signatures"""
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS):
+        self.rows = num_perm // bands
+        self.buckets = [{} for _ in range(bands)]
+
+    def band_keys(self, signature):
+        for band in range(len(self.buckets)):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def query(self, signature):
+        candidates = set()
+        for band, key in self.band_keys(signature):
+            candidates.update(self.buckets[band].get(key, ()))
+        return candidates
+
+    def add(self, item, signature):
+        for band, key in self.band_keys(signature):
+            self.buckets[band].setdefault(key, []).append(item)
+
+
+def find_near_duplicates(texts, threshold=0.85, hasher=None):
+    """Pairs (i, j) of texts whose estimated similarity is at least threshold"""
+    hasher = hasher or MinHasher()
+    index = LSHIndex()
+    signatures = []
+    pairs = []
+    for i, text in enumerate(texts):
+        signature = hasher.signature(text)
+        for j in index.query(signature):
+            if estimate_similarity(signature, signatures[j]) >= threshold:
+                pairs.append((j, i))
+        index.add(i, signature)
+        signatures.append(signature)
+    return pairs
+
+
+def merge_near_duplicates(groups, threshold=0.85):
+    """Merge groups whose question texts are near duplicates (union-find over LSH pairs)"""
+    parent = list(range(len(groups)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in find_near_duplicates([group.question for group in groups], threshold):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    merged = []
+    for i, group in enumerate(groups):
+        root = find(i)
+        if root == i:
+            merged.append(group)
+        else:
+            groups[root].merge(group)
+    return merged
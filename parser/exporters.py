@@ -0,0 +1,354 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+
+from dedup import question_id, unique_records
+from journal import fsync_dir, write_json_atomic
+
+# Fields that live on the theme and block nodes of a tree
+TREE_NODE_FIELDS = ('theme_id', 'theme_name', 'block_id', 'block_name')
+
+
+def iter_json_array(path, chunk_size=1 << 16):
+    """Yield the items of a top-level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"{path} does not contain a JSON array")
+        buffer = buffer[1:]
+        eof = False
+        while True:
+            buffer = buffer.lstrip().lstrip(',').lstrip()
+            if buffer.startswith(']'):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+                # A number is only complete once a delimiter follows it: '12' or
+                # '1.5' at the end of the buffer may go on in the next chunk
+                complete = (eof or not isinstance(item, (int, float))
+                            or buffer[end:end + 1] in (',', ']', ' ', '\t', '\r', '\n'))
+            except ValueError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield item
+            buffer = buffer[end:]
+
+
+def sort_key(item_id):
+    return (0, int(item_id), '') if item_id.isdigit() else (1, 0, item_id)
+
+
+def build_tree(questions, default_block_id='0', default_block_name='Основной блок'):
+    """Group questions into themes and blocks with per-node counts.
+
+    Themes and blocks are in numeric order, questions keep their order. The
+    theme and block fields move from the questions to their nodes.
+    """
+    themes = {}
+    for q in questions:
+        theme_id = str(q['theme_id'])
+        block_id = str(q.get('block_id') or default_block_id)
+        theme = themes.get(theme_id)
+        if theme is None:
+            theme = themes[theme_id] = {'id': theme_id, 'name': q.get('theme_name', ''), 'count': 0, 'blocks': {}}
+        block = theme['blocks'].get(block_id)
+        if block is None:
+            block = theme['blocks'][block_id] = {'id': block_id, 'name': q.get('block_name') or default_block_name,
+                                                 'count': 0, 'questions': []}
+        block['questions'].append({key: value for key, value in q.items() if key not in TREE_NODE_FIELDS})
+        block['count'] += 1
+        theme['count'] += 1
+
+    nodes = []
+    for theme_id in sorted(themes, key=sort_key):
+        theme = themes[theme_id]
+        theme['blocks'] = [theme['blocks'][block_id] for block_id in sorted(theme['blocks'], key=sort_key)]
+        nodes.append(theme)
+    return {'version': 1, 'total': sum(theme['count'] for theme in nodes), 'themes': nodes}
+
+
+def iter_tree(tree):
+    """Flat question records of a tree from build_tree, theme and block fields restored"""
+    for theme in tree['themes']:
+        for block in theme['blocks']:
+            for q in block['questions']:
+                yield {'theme_id': theme['id'], 'theme_name': theme['name'],
+                       'block_id': block['id'], 'block_name': block['name'], **q}
+
+
+def iter_questions(path):
+    """Yield the questions of a bank file, either a flat JSON array or a tree"""
+    with open(path, 'r', encoding='utf-8') as f:
+        start = f.read(64).lstrip()
+    if start.startswith('{'):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from iter_tree(json.load(f))
+    else:
+        yield from iter_json_array(path)
+
+
+class Sink:
+    """Base class for export sinks fed one record at a time.
+
+    A sink writes to <path>.tmp and close() moves that over path, so a failed
+    export leaves the previous file in place and an export may overwrite the
+    bank it is reading.
+    """
+    extension = None
+    format = None
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.count = 0
+        self.file = None
+
+    def open(self):
+        pass
+
+    def open_file(self, **kwargs):
+        self.file = open(self.tmp_path, 'w', encoding='utf-8', **kwargs)
+        return self.file
+
+    def write(self, question):
+        self.count += 1
+
+    def finish(self):
+        """Complete the temporary file; by default flush and close the one from open_file"""
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.file = None
+
+    def close(self):
+        self.finish()
+        os.replace(self.tmp_path, self.path)
+        fsync_dir(self.path)
+
+    def discard(self):
+        """Drop the partial output of a failed export"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class JsonSink(Sink):
+    """Pretty-printed JSON array, same layout as json.dump(..., indent=2)"""
+    extension = 'json'
+
+    def open(self):
+        self.open_file().write('[')
+
+    def write(self, question):
+        text = json.dumps(question, ensure_ascii=False, indent=2)
+        self.file.write(',\n  ' if self.count else '\n  ')
+        self.file.write(text.replace('\n', '\n  '))
+        super().write(question)
+
+    def finish(self):
+        self.file.write('\n]' if self.count else ']')
+        super().finish()
+
+
+class JsonlSink(Sink):
+    """One compact JSON object per line"""
+    extension = 'jsonl'
+
+    def open(self):
+        self.open_file()
+
+    def write(self, question):
+        self.file.write(json.dumps(question, ensure_ascii=False, separators=(',', ':')) + '\n')
+        super().write(question)
+
+
+class TreeSink(Sink):
+    """Themes, then blocks, then questions, with counts on every node.
+
+    Unlike the other sinks it keeps every question until close, because the
+    tree is sorted by theme and block, so it is only written on request.
+    """
+    extension = 'tree.json'
+    format = 'tree'
+
+    def open(self):
+        self.questions = []
+
+    def write(self, question):
+        self.questions.append(question)
+        super().write(question)
+
+    def close(self):
+        write_json_atomic(self.path, build_tree(self.questions))
+
+
+class TextSink(Sink):
+    """Human readable listing"""
+    extension = 'txt'
+
+    def open(self):
+        self.open_file()
+
+    def write(self, q):
+        super().write(q)
+        f = self.file
+        f.write(f"Question {self.count}:\n")
+        f.write(f"Theme: {q['theme_name']}\n")
+        f.write(f"Question: {q['question']}\n")
+        f.write("Answers:\n")
+        for ans_num, ans_text in q['answers'].items():
+            marker = " ✓" if ans_num == q['correct_answer'] else ""
+            f.write(f"  {ans_num}) {ans_text}{marker}\n")
+        f.write(f"Article: {q['article']}\n")
+        f.write("-" * 80 + "\n\n")
+
+
+class CsvSink(Sink):
+    """Spreadsheet friendly CSV"""
+    extension = 'csv'
+
+    def open(self):
+        self.writer = csv.writer(self.open_file(newline=''))
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(['Theme', 'Question', 'Answer1', 'Answer2', 'Answer3', 'Answer4',
+                              'Correct Answer', 'Article', 'ID'])
+
+    def write(self, q):
+        answers = [q['answers'].get(str(i), '') for i in range(1, 5)]
+        self.writer.writerow([
+            q['theme_name'],
+            q['question'],
+            *answers,
+            q['correct_answer'],
+            q['article'],
+            question_id(q)
+        ])
+        super().write(q)
+
+
+class SqliteSink(Sink):
+    """SQLite table with one row per question, inserted in batches"""
+    extension = 'sqlite'
+    batch_size = 500
+
+    connection = None
+
+    def open(self):
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        self.connection = sqlite3.connect(self.tmp_path)
+        self.connection.execute("""
+            CREATE TABLE questions (
+                id TEXT,
+                theme_id TEXT,
+                theme_name TEXT,
+                block_id TEXT,
+                block_name TEXT,
+                question_number INTEGER,
+                question TEXT,
+                answers TEXT,
+                correct_answer TEXT,
+                correct_answer_text TEXT,
+                article TEXT
+            )
+        """)
+        self.batch = []
+
+    def write(self, q):
+        self.batch.append((
+            question_id(q), q.get('theme_id'), q.get('theme_name'), q.get('block_id'), q.get('block_name'),
+            q.get('question_number'), q.get('question'),
+            json.dumps(q.get('answers', {}), ensure_ascii=False),
+            q.get('correct_answer'), q.get('correct_answer_text'), q.get('article'),
+        ))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+        super().write(q)
+
+    def flush(self):
+        self.connection.executemany('INSERT INTO questions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', self.batch)
+        self.batch = []
+
+    def finish(self):
+        self.flush()
+        self.connection.execute('CREATE INDEX idx_questions_theme ON questions (theme_id)')
+        self.connection.execute('CREATE INDEX idx_questions_id ON questions (id)')
+        self.connection.commit()
+        self.connection.close()
+        self.connection = None
+
+    def discard(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        super().discard()
+
+
+SINKS = {sink.format or sink.extension: sink for sink in (JsonSink, JsonlSink, TreeSink, TextSink, CsvSink, SqliteSink)}
+
+
+def make_sinks(formats, basename='all_questions'):
+    """Create sinks for the given format names, e.g. ['json', 'csv']"""
+    unknown = [name for name in formats if name not in SINKS]
+    if unknown:
+        raise ValueError(f"Unknown export format(s): {', '.join(unknown)}")
+    return [SINKS[name](f"{basename}.{SINKS[name].extension}") for name in formats]
+
+
+def export(questions, sinks):
+    """Feed every question to all sinks in a single pass.
+
+    The outputs replace their files only once every question was written; on
+    an error they are discarded.
+    """
+    count = 0
+    try:
+        for sink in sinks:
+            sink.open()
+        for question in questions:
+            for sink in sinks:
+                sink.write(question)
+            count += 1
+    except BaseException:
+        for sink in sinks:
+            sink.discard()
+        raise
+    for sink in sinks:
+        sink.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a question bank to other formats in one pass')
+    parser.add_argument('input', nargs='?', default='all_questions.json')
+    parser.add_argument('--formats', default='jsonl',
+                        help=f"comma separated list of: {', '.join(SINKS)} (default: jsonl)")
+    parser.add_argument('--dedup', action='store_true',
+                        help='skip exact duplicate questions')
+    parser.add_argument('--basename', default=None,
+                        help='output path without extension (default: input name)')
+    args = parser.parse_args()
+
+    basename = args.basename or os.path.splitext(args.input)[0]
+    sinks = make_sinks([name.strip() for name in args.formats.split(',') if name.strip()], basename)
+    questions = iter_questions(args.input)
+    if args.dedup:
+        questions = unique_records(questions)
+    count = export(questions, sinks)
+    print(f"Exported {count} questions to: {', '.join(sink.path for sink in sinks)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import threading
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from content_store import payload_hash
+from testobj import find_testobj, parse_testobj
+
+START_URL = 'https://findh.org/743-onlayn-testirovanie-na-gosudarstvennuyu-sluzhbu-rk.html'
+
+# Where a single block's quiz page lives; override with --block-url
+BLOCK_URL_TEMPLATE = '{start_url}?prog=prog2&zakon={zakon}&block={block}'
+
+USER_AGENT = ('Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/120.0 Safari/537.36')
+
+
+def make_session(pool_size=4, retries=2):
+    """Create a requests session with a keep-alive connection pool"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=retries, backoff_factor=0.5,
+                          status_forcelist=(500, 502, 503, 504)),
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+
+def parse_structure(html):
+    """Read zakons and their blocks from the start page markup.
+
+    Returns a list of zakons, or None when the blocks are not part of the
+    static markup and have to be discovered with a browser.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    zakon_elements = soup.select('div.but-zakons-table[data-zakon-num]')
+    if not zakon_elements:
+        return None
+
+    block_elements = soup.select('div.but-blocks-table[data-block-num]')
+    structure = []
+    for z_idx, zakon_element in enumerate(zakon_elements):
+        zakon_num = zakon_element.get('data-zakon-num')
+        name_element = zakon_element.select_one('.but-zakons-text')
+        blocks = [
+            element for element in block_elements
+            if element.get('data-zakon-num') == zakon_num
+        ]
+        structure.append({
+            'index': z_idx,
+            'num': zakon_num,
+            'name': name_element.get_text(strip=True) if name_element else '',
+            'blocks': [
+                {
+                    'index': b_idx,
+                    'num': element.get('data-block-num'),
+                    'name': (element.select_one('.but-blocks-text') or element).get_text(strip=True),
+                }
+                for b_idx, element in enumerate(blocks)
+            ],
+        })
+
+    if not any(zakon['blocks'] for zakon in structure):
+        return None
+    return structure
+
+
+class HttpExtractor:
+    """Fetch block pages over plain HTTP and parse their testobj"""
+    def __init__(self, start_url=START_URL, block_url_template=BLOCK_URL_TEMPLATE,
+                 pool_size=4, timeout=15, retries=2):
+        self.start_url = start_url
+        self.block_url_template = block_url_template
+        self.timeout = timeout
+        self.session = make_session(pool_size, retries)
+        # Payload hash -> "zakon_block" key of every block page parsed so far
+        self.payload_blocks = {}
+        self.lock = threading.Lock()
+
+    def fetch(self, url, **kwargs):
+        response = self.session.get(url, timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        if 'charset' not in response.headers.get('Content-Type', ''):
+            # requests falls back to ISO-8859-1 for text/html without a charset
+            response.encoding = 'utf-8'
+        return response
+
+    def discover(self):
+        """Return the zakon/block structure, or None if a browser is needed"""
+        try:
+            return parse_structure(self.fetch(self.start_url).text)
+        except Exception as e:
+            print(f"HTTP discovery failed: {e}")
+            return None
+
+    def block_url(self, zakon_num, block_num):
+        return self.block_url_template.format(
+            start_url=self.start_url, zakon=zakon_num, block=block_num
+        )
+
+    def block_questions(self, testobj, zakon_num, block_num, block_name=None, url=None):
+        """Questions of a block page's testobj, or None if another block got the same payload.
+
+        The block URL is a guess at the site's query string. A site that
+        ignores it serves the same quiz for every block, so a payload already
+        parsed for a different block is rejected and that block falls back to
+        the browser.
+        """
+        key = f"{zakon_num}_{block_num}"
+        with self.lock:
+            owner = self.payload_blocks.setdefault(payload_hash(testobj), key)
+        if owner != key:
+            print(f"{url or key} has the same testobj as block {owner}, "
+                  f"the block URL does not select the block")
+            return None
+        return parse_testobj(testobj, block_num, block_name)
+
+    def fetch_block(self, zakon_num, block_num, block_name=None):
+        """Return the questions of one block, or None if the page has no testobj"""
+        url = self.block_url(zakon_num, block_num)
+        try:
+            testobj = find_testobj(self.fetch(url).text)
+        except Exception as e:
+            print(f"HTTP fetch failed for {url}: {e}")
+            return None
+        if testobj is None:
+            print(f"No testobj found at {url}")
+            return None
+        return self.block_questions(testobj, zakon_num, block_num, block_name, url)
+
+    def fetch_block_conditional(self, zakon_num, block_num, headers=None):
+        """Conditional GET of a block page.
+
+        Returns (status, testobj, etag, last_modified); testobj is None when
+        the server answered 304 Not Modified or the page had no testobj.
+        """
+        response = self.fetch(self.block_url(zakon_num, block_num), headers=headers or {})
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code == 304:
+            return 304, None, etag, last_modified
+        return response.status_code, find_testobj(response.text), etag, last_modified
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,292 @@
+import cProfile
+import functools
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where max_rss_bytes is not recorded
+    resource = None
+
+from journal import fsync_dir, write_json_atomic
+
+METRIC_PREFIX = 'quiz'
+# Upper bounds (seconds) of the span histogram buckets: JS extraction takes
+# milliseconds, a PDF build minutes
+SPAN_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TOP_ALLOCATIONS = 20
+TOP_PROFILE_ENTRIES = 20
+
+
+def label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def prometheus_labels(key, **extra):
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Metrics:
+    """Thread-safe timing spans, counters and gauges.
+
+    A span times a block of code into a histogram per name and labels. Spans
+    nest per thread, so every span also records its self time, the part not
+    spent in spans opened inside it. With tracemalloc running, a span records
+    the memory it left allocated as well. The collected values are written as
+    JSON or in the Prometheus text format.
+    """
+    def __init__(self, prefix=METRIC_PREFIX, buckets=SPAN_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.spans = {}
+        self.counters = {}
+        self.gauges = {}
+        self.memory = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def observe(self, name, seconds, ok=True, self_seconds=None, allocated=None, **labels):
+        """Record one finished span; spans timed elsewhere (another process) are recorded here too"""
+        key = (name, label_key(labels))
+        with self.lock:
+            data = self.spans.get(key)
+            if data is None:
+                data = self.spans[key] = {
+                    'counts': [0] * (len(self.buckets) + 1),
+                    'count': 0,
+                    'errors': 0,
+                    'total': 0.0,
+                    'self': 0.0,
+                    'max': 0.0,
+                    'allocated': None,
+                }
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    data['counts'][i] += 1
+                    break
+            else:
+                data['counts'][-1] += 1
+            data['count'] += 1
+            data['total'] += seconds
+            data['self'] += seconds if self_seconds is None else self_seconds
+            data['max'] = max(data['max'], seconds)
+            if not ok:
+                data['errors'] += 1
+            if allocated is not None:
+                data['allocated'] = (data['allocated'] or 0) + allocated
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Time the block; an exception leaving it counts as an error and is re-raised"""
+        stack = self.local.__dict__.setdefault('stack', [])
+        # Time spent in child spans, added by them on exit
+        stack.append(0.0)
+        tracing = tracemalloc.is_tracing()
+        memory_before = tracemalloc.get_traced_memory()[0] if tracing else None
+        ok = False
+        started = time.perf_counter()
+        try:
+            yield
+            ok = True
+        finally:
+            elapsed = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            allocated = tracemalloc.get_traced_memory()[0] - memory_before if tracing else None
+            self.observe(name, elapsed, ok, elapsed - children, allocated, **labels)
+
+    def timed(self, name=None, **labels):
+        """Decorator running every call of the function in a span (named after it by default)"""
+        def decorate(function):
+            span_name = name or function.__name__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name, **labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def count(self, name, value=1, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, label_key(labels))] = value
+
+    def to_dict(self):
+        with self.lock:
+            labels = [f"<={bound}s" for bound in self.buckets] + [f">{self.buckets[-1]}s"]
+            spans = []
+            for (name, key), data in sorted(self.spans.items()):
+                span = {
+                    'name': name,
+                    'labels': dict(key),
+                    'count': data['count'],
+                    'errors': data['errors'],
+                    'total_seconds': round(data['total'], 6),
+                    'self_seconds': round(data['self'], 6),
+                    'mean_seconds': round(data['total'] / data['count'], 6),
+                    'max_seconds': round(data['max'], 6),
+                    'buckets': dict(zip(labels, data['counts'])),
+                }
+                if data['allocated'] is not None:
+                    span['allocated_bytes'] = data['allocated']
+                spans.append(span)
+            report = {
+                'version': 1,
+                'generated_at': time.time(),
+                'spans': spans,
+                'counters': [{'name': name, 'labels': dict(key), 'value': value}
+                             for (name, key), value in sorted(self.counters.items())],
+                'gauges': [{'name': name, 'labels': dict(key), 'value': value}
+                           for (name, key), value in sorted(self.gauges.items())],
+            }
+            if self.memory is not None:
+                report['memory'] = self.memory
+            return report
+
+    def to_prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        prefix = self.prefix
+        lines = []
+        with self.lock:
+            spans = sorted(self.spans.items())
+            if spans:
+                lines += [f"# HELP {prefix}_span_seconds Time spent in instrumented spans",
+                          f"# TYPE {prefix}_span_seconds histogram"]
+                for (name, key), data in spans:
+                    key = (('span', name),) + key
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + ('+Inf',), data['counts']):
+                        cumulative += count
+                        lines.append(f"{prefix}_span_seconds_bucket{prometheus_labels(key, le=bound)} {cumulative}")
+                    lines.append(f"{prefix}_span_seconds_sum{prometheus_labels(key)} {data['total']:.6f}")
+                    lines.append(f"{prefix}_span_seconds_count{prometheus_labels(key)} {data['count']}")
+                for metric, field, kind, help_text in (
+                        ('span_self_seconds_total', 'self', 'counter', 'Time spent in spans outside their child spans'),
+                        ('span_errors_total', 'errors', 'counter', 'Spans left by an exception'),
+                        # Net allocations, negative when a span freed more than it kept
+                        ('span_allocated_bytes', 'allocated', 'gauge', 'Memory left allocated by spans (tracemalloc)')):
+                    rows = [((('span', name),) + key, round(data[field], 6)) for (name, key), data in spans
+                            if data[field] is not None]
+                    if not rows:
+                        continue
+                    lines += [f"# HELP {prefix}_{metric} {help_text}", f"# TYPE {prefix}_{metric} {kind}"]
+                    lines += [f"{prefix}_{metric}{prometheus_labels(key)} {value}" for key, value in rows]
+
+            for kind, values, suffix in (('counter', self.counters, '_total'), ('gauge', self.gauges, '')):
+                names = sorted(set(name for name, _ in values))
+                for name in names:
+                    metric = f"{prefix}_{name}{suffix}"
+                    lines.append(f"# TYPE {metric} {kind}")
+                    lines += [f"{metric}{prometheus_labels(key)} {value}"
+                              for (other, key), value in sorted(values.items()) if other == name]
+        return '\n'.join(lines) + '\n'
+
+    def write_json(self, path):
+        write_json_atomic(path, self.to_dict())
+
+    def write_prometheus(self, path):
+        """Write the text format atomically, as the node exporter textfile collector expects"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        fsync_dir(path)
+
+    def print_report(self, limit=10):
+        """Print the spans that took the most time in total"""
+        spans = self.to_dict()['spans']
+        if not spans:
+            return
+        print("Time by span:")
+        for span in sorted(spans, key=lambda span: -span['total_seconds'])[:limit]:
+            labels = ','.join(f"{name}={value}" for name, value in span['labels'].items())
+            name = f"{span['name']}{{{labels}}}" if labels else span['name']
+            print(f"  {name:<36} n={span['count']:<5} total={span['total_seconds']:.2f}s "
+                  f"self={span['self_seconds']:.2f}s max={span['max_seconds']:.3f}s errors={span['errors']}")
+
+
+# Process-wide registry the instrumented modules record into
+metrics = Metrics()
+
+
+def memory_report(limit=TOP_ALLOCATIONS):
+    """Traced memory and the source lines holding the most of it"""
+    current, peak = tracemalloc.get_traced_memory()
+    top = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    )).statistics('lineno')[:limit]
+    return {
+        'current_bytes': current,
+        'peak_bytes': peak,
+        'top': [{'where': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 'size_bytes': stat.size, 'count': stat.count} for stat in top],
+    }
+
+
+def add_arguments(parser):
+    """The instrumentation options shared by the command line tools"""
+    group = parser.add_argument_group('instrumentation')
+    group.add_argument('--metrics', metavar='PATH', help='write span timings and counters as JSON')
+    group.add_argument('--metrics-prom', metavar='PATH',
+                       help='write them in the Prometheus text format (e.g. for the node exporter)')
+    group.add_argument('--profile', metavar='PATH',
+                       help='run under cProfile, dump the stats here and print the top functions')
+    group.add_argument('--trace-memory', action='store_true',
+                       help='trace allocations: memory per span and the top allocation sites in --metrics')
+    return parser
+
+
+@contextmanager
+def session(args, registry=metrics):
+    """Run the block with the profiling the options ask for, then write the metrics files"""
+    profiler = cProfile.Profile() if args.profile else None
+    if args.trace_memory:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    started = time.perf_counter()
+    try:
+        yield registry
+    finally:
+        if profiler:
+            profiler.disable()
+        registry.gauge('run_seconds', round(time.perf_counter() - started, 6))
+        if resource is not None:
+            # ru_maxrss is in bytes on macOS and in KiB on Linux and the BSDs
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            registry.gauge('max_rss_bytes', max_rss if sys.platform == 'darwin' else max_rss * 1024)
+        if args.trace_memory:
+            registry.memory = memory_report()
+            registry.gauge('traced_memory_peak_bytes', registry.memory['peak_bytes'])
+            tracemalloc.stop()
+        if args.metrics:
+            registry.write_json(args.metrics)
+            print(f"Metrics written to {args.metrics}")
+        if args.metrics_prom:
+            registry.write_prometheus(args.metrics_prom)
+            print(f"Prometheus metrics written to {args.metrics_prom}")
+        if profiler:
+            profiler.dump_stats(args.profile)
+            print(f"Profile written to {args.profile} (main thread only); top functions:")
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(TOP_PROFILE_ENTRIES)
+
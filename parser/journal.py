@@ -0,0 +1,58 @@
+import json
+import os
+
+
+def fsync_dir(path):
+    """Flush a directory entry so a rename survives a crash"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_json_atomic(path, data, indent=2):
+    """Write JSON through a fsync'd temporary file so readers never see a partial file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_dir(path)
+
+
+class BlockJournal:
+    """Append-only JSONL journal with one record per finished block"""
+    def __init__(self, path='parsing_journal.jsonl'):
+        self.path = path
+        self.file = None
+
+    def append(self, record):
+        """Append one record and make sure it reached the disk"""
+        if self.file is None:
+            self.file = open(self.path, 'a', encoding='utf-8')
+        self.file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def replay(self):
+        """Yield journal records in write order, skipping a torn last line"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Skipping unreadable journal line {line_number} in {self.path}")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -1,195 +1,61 @@
-import json
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.enums import TA_LEFT
-from reportlab.lib.colors import HexColor
+from reportlab.platypus import Paragraph, Spacer
 
-# Register fonts that support Cyrillic
-try:
-    pdfmetrics.registerFont(TTFont('DejaVuSans', 'DejaVuSans.ttf'))
-    pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', 'DejaVuSans-Bold.ttf'))
-    font_name = 'DejaVuSans'
-    font_bold = 'DejaVuSans-Bold'
-except:
-    print("Warning: DejaVuSans fonts not found. Using default fonts")
-    font_name = 'Helvetica'
-    font_bold = 'Helvetica-Bold'
+import pdf_cli
+from pdf_cache import ParagraphFactory
+from pdf_fonts import register_fonts
+from pdf_render import Bookmark
+from pdf_styles import get_styles
+from pdf_text import sanitize_text
 
-def sanitize_text(text):
-    """Sanitize text for ReportLab PDF generation"""
-    if not text:
-        return text
-    text = text.replace('<br>', '<br/>')
-    text = text.replace('<BR>', '<br/>')
-    text = text.replace('<br >', '<br/>')
-    text = text.replace('&', '&amp;')
-    return text
+# Per-process cache of sanitized texts and parsed paragraphs
+paragraphs = ParagraphFactory(sanitize_text)
 
-def create_answers_pdf(json_file, output_pdf):
-    # Load JSON data
-    with open(json_file, 'r', encoding='utf-8') as f:
-        questions = json.load(f)
-    
-    # Group and deduplicate questions by theme
-    themes = {}
-    seen_questions = {}  # Track unique questions by text
-    
-    for q in questions:
-        theme_id = q['theme_id']
-        question_text = q['question'].strip()
-        
-        # Initialize theme if not exists
-        if theme_id not in themes:
-            themes[theme_id] = {
-                'name': q['theme_name'],
-                'questions': {}
-            }
-        
-        # Check if this exact question already exists in this theme
-        if question_text not in themes[theme_id]['questions']:
-            # New unique question
-            themes[theme_id]['questions'][question_text] = {
-                'question': q['question'],
-                'correct_answers': [q['correct_answer_text']],
-                'article': q.get('article', ''),
-                'question_number': q.get('question_number', 0)
-            }
-        else:
-            # Question exists, add the correct answer if it's different
-            existing = themes[theme_id]['questions'][question_text]
-            if q['correct_answer_text'] not in existing['correct_answers']:
-                existing['correct_answers'].append(q['correct_answer_text'])
-    
-    # Create PDF
-    doc = SimpleDocTemplate(output_pdf, pagesize=A4,
-                            leftMargin=2*cm, rightMargin=2*cm,
-                            topMargin=2*cm, bottomMargin=2*cm)
-    
-    # Define styles
-    styles = getSampleStyleSheet()
-    
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontName=font_bold,
-        fontSize=16,
-        spaceAfter=12,
-        alignment=TA_LEFT
-    )
-    
-    theme_style = ParagraphStyle(
-        'ThemeTitle',
-        parent=styles['Heading2'],
-        fontName=font_bold,
-        fontSize=14,
-        spaceAfter=10,
-        spaceBefore=10,
-        alignment=TA_LEFT,
-        textColor=HexColor('#1e40af')
-    )
-    
-    question_style = ParagraphStyle(
-        'Question',
-        parent=styles['Normal'],
-        fontName=font_bold,
-        fontSize=11,
-        spaceAfter=6,
-        alignment=TA_LEFT
-    )
-    
-    answer_style = ParagraphStyle(
-        'Answer',
-        parent=styles['Normal'],
-        fontName=font_bold,
-        fontSize=10,
-        spaceAfter=4,
-        leftIndent=20,
-        textColor=HexColor('#16a34a'),
-        alignment=TA_LEFT
-    )
-    
-    article_style = ParagraphStyle(
-        'Article',
-        parent=styles['Normal'],
-        fontName=font_name,
-        fontSize=9,
-        spaceAfter=15,
-        leftIndent=20,
-        textColor=HexColor('#6b7280'),
-        alignment=TA_LEFT
-    )
-    
-    # Build PDF content
+def theme_title(theme_id, theme_data):
+    return f"Тема {theme_id}: {theme_data['name']}"
+
+def build_theme_story(theme_id, theme_data, first=False):
+    """Flowables for one theme; the first theme also carries the document title"""
+    styles = get_styles('answers', *register_fonts())
     story = []
     
     # Add title
-    story.append(Paragraph("Ответы на вопросы экзамена", title_style))
-    story.append(Spacer(1, 0.5*cm))
-    
-    question_counter = 1
+    if first:
+        story.append(Paragraph("Ответы на вопросы экзамена", styles['title']))
+        story.append(Spacer(1, 0.5*cm))
+    
+    # Add theme title
+    story.append(Bookmark(theme_title(theme_id, theme_data), f"theme_{theme_id}"))
+    story.append(Paragraph(f"<b>{sanitize_text(theme_title(theme_id, theme_data))}</b>", styles['theme']))
+    story.append(Spacer(1, 0.3*cm))
+    
+    # Sort questions by original question number if available
+    sorted_questions = sorted(
+        theme_data['questions'],
+        key=lambda group: group.question_number
+    )
     
-    # Add questions grouped by theme
-    for theme_id in sorted(themes.keys(), key=lambda x: int(x)):
-        question_counter = 1
-        theme_data = themes[theme_id]
+    # Add questions with correct answers only
+    for question_counter, q_data in enumerate(sorted_questions, 1):
+        # Question number and text
+        question_display = f"<b>{question_counter}.</b> {paragraphs.sanitize(q_data.question)}"
+        story.append(Paragraph(question_display, styles['question']))
         
-        # Add theme title
-        story.append(Paragraph(f"<b>Тема {theme_id}: {theme_data['name']}</b>", theme_style))
-        story.append(Spacer(1, 0.3*cm))
+        # Correct answers (may be multiple if same question had different correct answers)
+        for answer in q_data.answers:
+            story.append(paragraphs.paragraph(f"✓ {paragraphs.sanitize(answer)}", styles['answer']))
         
-        # Sort questions by original question number if available
-        sorted_questions = sorted(
-            theme_data['questions'].items(),
-            key=lambda x: x[1]['question_number']
-        )
-        
-        # Add questions with correct answers only
-        for question_text, q_data in sorted_questions:
-            # Question number and text
-            question_display = f"<b>{question_counter}.</b> {sanitize_text(q_data['question'])}"
-            story.append(Paragraph(question_display, question_style))
-            
-            # Correct answers (may be multiple if same question had different correct answers)
-            for i, answer in enumerate(q_data['correct_answers']):
-                if len(q_data['correct_answers']) > 1:
-                    # Multiple correct answers for same question
-                    answer_text = f"✓ {sanitize_text(answer)}"
-                else:
-                    answer_text = f"✓ {sanitize_text(answer)}"
-                
-                story.append(Paragraph(answer_text, answer_style))
-            
-            # Add article reference if available
-            if q_data['article']:
-                story.append(Paragraph(f"<i>Статья: {q_data['article']}</i>", article_style))
-            else:
-                story.append(Spacer(1, 0.3*cm))
-            
-            question_counter += 1
-        
-        # Add page break after each theme (except the last one)
-        theme_ids = list(themes.keys())
-        if theme_id != theme_ids[-1]:
-            story.append(PageBreak())
-    
-    # Build PDF
-    doc.build(story)
+        # Add article reference if available
+        if q_data.article:
+            story.append(paragraphs.paragraph(f"<i>Статья: {paragraphs.sanitize(q_data.article)}</i>", styles['article']))
+        else:
+            story.append(Spacer(1, 0.3*cm))
     
-    # Print statistics
-    total_unique = sum(len(theme['questions']) for theme in themes.values())
-    print(f"PDF successfully created: {output_pdf}")
-    print(f"Total themes: {len(themes)}")
-    print(f"Total unique questions: {total_unique}")
-    print(f"Original questions in JSON: {len(questions)}")
-    print(f"Duplicates removed: {len(questions) - total_unique}")
+    return story
+
+def create_answers_pdf(json_file, output_pdf, near_duplicates=False, jobs=1):
+    return pdf_cli.render('answers', json_file, output_pdf, jobs=jobs, near_duplicates=near_duplicates)
 
-# Usage
+# Usage: same options as pdf_cli.py, with this layout preselected
 if __name__ == "__main__":
-    json_file = "all_questions.json"  # Your JSON file
-    output_pdf = "quiz_answers_only.pdf"  # Output PDF file
-    
-    create_answers_pdf(json_file, output_pdf)
\ No newline at end of file
+    pdf_cli.main(layout='answers')
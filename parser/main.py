@@ -1,46 +1,100 @@
-import requests
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
+import argparse
 import json
+import queue
+import threading
 import time
-import os
-from pathlib import Path
+
+from content_store import ContentStore, diff_questions, payload_hash
+from crawler import AsyncCrawler
+from exporters import export, make_sinks
+from http_fetcher import BLOCK_URL_TEMPLATE, START_URL, HttpExtractor
+import instrumentation
+from instrumentation import metrics
+from progress import ProgressState
+from readiness import DEFAULT_TIMEOUTS, LatencyHistogram, ReadinessWaiter
+from journal import BlockJournal, write_json_atomic
+from testobj import parse_testobj
+from validate import validate
+
+
+class WorkerStats:
+    """Throughput counters for a single browser worker"""
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.blocks_done = 0
+        self.blocks_failed = 0
+        self.questions = 0
+        self.busy_seconds = 0.0
+
+    def record(self, success, question_count, elapsed):
+        if success:
+            self.blocks_done += 1
+        else:
+            self.blocks_failed += 1
+        self.questions += question_count
+        self.busy_seconds += elapsed
+
+    def blocks_per_minute(self):
+        if not self.busy_seconds:
+            return 0.0
+        return self.blocks_done * 60 / self.busy_seconds
+
+    def summary(self):
+        return (f"Worker {self.worker_id}: {self.blocks_done} blocks, "
+                f"{self.blocks_failed} failed, {self.questions} questions, "
+                f"{self.busy_seconds:.1f}s busy, {self.blocks_per_minute():.2f} blocks/min")
+
 
 class TestParser:
-    def __init__(self, headless=False):
-        self.setup_driver(headless)
+    def __init__(self, headless=False, workers=1, timeouts=None, block_delay=0.0, http=None,
+                 start_url=START_URL, crawler=None, rediscover=False, refresh=False, tree=False):
+        self.headless = headless
+        self.tree = tree
+        self.refresh = refresh
+        self.outputs_stale = True
+        self.rediscover = rediscover
+        self.start_url = start_url
+        self.http = http
+        self.crawler = crawler
+        self.workers = max(1, workers)
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.block_delay = block_delay
+        self.latency = LatencyHistogram()
+        self.worker_id = 0
+        self.stats = WorkerStats(0)
+        self.lock = threading.RLock()
+        # Chrome is started lazily, a resumed or HTTP-only run may not need it
+        self.driver = None
         self.all_questions = []
-        self.progress_file = 'parsing_progress.json'
-        self.progress = self.load_progress()
-        
-    def load_progress(self):
-        """Load progress from file if exists"""
-        if os.path.exists(self.progress_file):
-            try:
-                with open(self.progress_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    print(f"Loaded progress: {len(data.get('completed', []))} completed blocks")
-                    return data
-            except Exception as e:
-                print(f"Error loading progress: {e}")
-        return {'completed': [], 'total_questions': 0}
+        self.progress = ProgressState(BlockJournal('parsing_journal.jsonl'),
+                                      'parsing_progress.json').load()
+        self.all_questions.extend(self.progress.questions())
+        if self.progress.blocks:
+            print(f"Loaded progress: {len(self.progress.blocks)} completed blocks, "
+                  f"{len(self.all_questions)} questions")
     
-    def save_progress_state(self, zakon_index, block_index):
-        """Save that we completed this zakon/block combination"""
-        key = f"{zakon_index}_{block_index}"
-        if key not in self.progress['completed']:
-            self.progress['completed'].append(key)
-            self.progress['total_questions'] = len(self.all_questions)
-            with open(self.progress_file, 'w', encoding='utf-8') as f:
-                json.dump(self.progress, f, ensure_ascii=False, indent=2)
+    def save_checkpoint(self):
+        """Atomically write the progress summary"""
+        with self.lock:
+            self.progress.save_checkpoint()
     
     def is_completed(self, zakon_index, block_index):
         """Check if this zakon/block combination was already processed"""
-        key = f"{zakon_index}_{block_index}"
-        return key in self.progress['completed']
+        return self.progress.is_completed(zakon_index, block_index)
+
+    def record_block(self, zakon_index, block_index, questions):
+        """Journal the questions of a finished block"""
+        with self.lock:
+            self.progress.add_block(zakon_index, block_index, questions)
+            self.all_questions.extend(questions)
+            metrics.count('blocks_recorded')
+            metrics.count('questions_recorded', len(questions))
+            print(f"✓ Extracted {len(questions)} questions")
+            print(f"✓ Total questions so far: {len(self.all_questions)}")
         
     def setup_driver(self, headless):
         chrome_options = Options()
@@ -56,31 +110,41 @@ class TestParser:
         self.driver = webdriver.Chrome(options=chrome_options)
         self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
         self.wait = WebDriverWait(self.driver, 20)
+        self.ready = ReadinessWaiter(self.driver, self.timeouts, self.latency)
+
+    def ensure_driver(self):
+        """Start Chrome on first use"""
+        if self.driver is None:
+            print("Starting Chrome fallback...")
+            self.setup_driver(self.headless)
         
-    def click_element(self, element, timeout=10):
-        """Helper function to click element with wait"""
+    def click_element(self, element, timeout=None):
+        """Helper function to click element once it is clickable"""
+        element = self.ready.clickable('click', element, timeout=timeout)
+        if not element:
+            return False
         try:
-            element = WebDriverWait(self.driver, timeout).until(
-                EC.element_to_be_clickable(element)
-            )
             self.driver.execute_script("arguments[0].click();", element)
-            time.sleep(1)
             return True
         except Exception as e:
             print(f"Error clicking element: {e}")
             return False
             
-    def wait_for_element(self, selector, by=By.CSS_SELECTOR, timeout=10):
+    def wait_for_element(self, selector, by=By.CSS_SELECTOR, timeout=None, step='element'):
         """Wait for element to be present"""
-        try:
-            return WebDriverWait(self.driver, timeout).until(
-                EC.presence_of_element_located((by, selector))
-            )
-        except Exception as e:
-            print(f"Element not found {selector}: {e}")
-            return None
+        element = self.ready.present(step, selector, by=by, timeout=timeout)
+        if element is None:
+            print(f"Element not found {selector}")
+        return element
+
+    def wait_for_blocks(self):
+        """Wait until the block choice window is shown with its blocks"""
+        if not self.ready.visible('block_choice', 'div.window-block-choice'):
+            return []
+        return self.ready.all_present('block_choice', 'div.but-blocks-table[data-block-num]') or []
 
-    def extract_questions_from_javascript(self):
+    @metrics.timed()
+    def extract_questions_from_javascript(self, block_num=None, block_name=None):
         """Extract questions from JavaScript testobj variable"""
         try:
             testobj_script = """
@@ -104,57 +168,31 @@ class TestParser:
             result = self.driver.execute_script(testobj_script)
             if result:
                 testobj = json.loads(result)
-                return self.parse_testobj(testobj)
+                return self.parse_testobj(testobj, block_num, block_name)
+            metrics.count('extract_failures', reason='no_testobj')
             return []
         except Exception as e:
             print(f"Error extracting questions from JS: {e}")
+            metrics.count('extract_failures', reason=e.__class__.__name__)
             return []
 
-    def parse_testobj(self, testobj):
+    def parse_testobj(self, testobj, block_num=None, block_name=None):
         """Parse testobj structure and extract questions"""
-        questions = []
-        
-        if 'questions' in testobj:
-            for theme_id, theme_questions in testobj['questions'].items():
-                theme_name = testobj.get('zakon_names', {}).get(theme_id, f"Theme {theme_id}")
-                
-                for i, question_data in enumerate(theme_questions):
-                    question_obj = {
-                        'theme_id': theme_id,
-                        'theme_name': theme_name,
-                        'question_number': i + 1,
-                        'question': question_data.get('question', ''),
-                        'answers': {},
-                        'correct_answer': None,
-                        'article': question_data.get('statya', '')
-                    }
-                    
-                    for key, value in question_data.items():
-                        if key.startswith('reply'):
-                            answer_num = key.replace('reply', '')
-                            question_obj['answers'][answer_num] = value
-                    
-                    correct = question_data.get('correctly')
-                    if correct and str(correct) in question_obj['answers']:
-                        question_obj['correct_answer'] = str(correct)
-                        question_obj['correct_answer_text'] = question_obj['answers'].get(str(correct), '')
-                    
-                    questions.append(question_obj)
-        
-        return questions
+        return parse_testobj(testobj, block_num, block_name)
 
+    @metrics.timed()
     def navigate_to_start(self):
         """Navigate to main page and click Program 2"""
         print("Loading main page...")
-        self.driver.get('https://findh.org/743-onlayn-testirovanie-na-gosudarstvennuyu-sluzhbu-rk.html')
-        time.sleep(3)
+        self.driver.get(self.start_url)
         
         print("Navigating to Program 2...")
-        program2_element = self.wait_for_element('div.button-table[data-subject="prog2"]')
+        program2_element = self.wait_for_element('div.button-table[data-subject="prog2"]', step='page_load')
         if program2_element and self.click_element(program2_element):
-            self.wait_for_element('div.window-zakon-choice')
-            time.sleep(2)
-            return True
+            return bool(
+                self.ready.visible('zakon_choice', 'div.window-zakon-choice')
+                and self.ready.all_present('zakon_choice', 'div.but-zakons-table[data-zakon-num]')
+            )
         return False
 
     def get_zakon_info(self, index):
@@ -197,6 +235,7 @@ class TestParser:
         except:
             return 0
 
+    @metrics.timed()
     def process_single_block(self, zakon_index, block_index):
         """Process a single zakon/block combination from scratch"""
         
@@ -205,111 +244,148 @@ class TestParser:
             print(f"Block {zakon_index}_{block_index} already completed, skipping...")
             return True
         
+        started = time.perf_counter()
+        questions = self.scrape_block(zakon_index, block_index)
+        elapsed = time.perf_counter() - started
+        self.stats.record(bool(questions), len(questions), elapsed)
+        self.latency.observe('block_total', elapsed, ok=bool(questions))
+        
+        if questions:
+            self.record_block(zakon_index, block_index, questions)
+            return True
+        else:
+            print("✗ No questions extracted")
+            metrics.count('blocks_failed', source='browser')
+            return False
+
+    def scrape_block(self, zakon_index, block_index):
+        """Walk the site to the given block and return its questions"""
         print(f"\n{'='*80}")
-        print(f"Processing Zakon {zakon_index + 1}, Block {block_index + 1}")
+        print(f"[worker {self.worker_id}] Processing Zakon {zakon_index + 1}, Block {block_index + 1}")
         print(f"{'='*80}")
         
         # Navigate to start
         if not self.navigate_to_start():
             print("Failed to navigate to start")
-            return False
+            return []
         
         # Click zakon
         zakon_element, zakon_name, zakon_num = self.get_zakon_info(zakon_index)
         if not zakon_element:
             print(f"Failed to get zakon {zakon_index + 1}")
-            return False
+            return []
         
         print(f"Zakon: {zakon_name}")
         if not self.click_element(zakon_element):
             print(f"Failed to click zakon {zakon_index + 1}")
-            return False
+            return []
         
-        time.sleep(2)
-        self.wait_for_element('div.window-block-choice')
+        self.wait_for_blocks()
         
         # Click block
         block_element, block_name, block_num = self.get_block_info(block_index)
         if not block_element:
             print(f"Failed to get block {block_index + 1}")
-            return False
+            return []
         
         print(f"Block: {block_name}")
         if not self.click_element(block_element):
             print(f"Failed to click block {block_index + 1}")
-            return False
-        
-        time.sleep(2)
+            return []
         
         # Start quiz
         print("Starting quiz...")
-        quiz_button = self.wait_for_element('div.but-blocks-block-testing-table')
+        quiz_button = self.ready.clickable('click', 'div.but-blocks-block-testing-table')
         if not quiz_button or not self.click_element(quiz_button):
             print("Failed to start quiz")
-            return False
+            return []
         
-        time.sleep(3)
+        if not self.ready.js('quiz_ready', "typeof testobj !== 'undefined' && testobj && testobj.questions"):
+            print("Quiz data did not load")
         
         # Extract questions
         print("Extracting questions...")
-        questions = self.extract_questions_from_javascript()
+        return self.extract_questions_from_javascript(block_num, block_name)
+
+    @metrics.timed()
+    def discover_structure(self):
+        """Open every zakon once and collect its blocks"""
+        self.ensure_driver()
+        if not self.navigate_to_start():
+            print("Failed initial navigation")
+            return []
         
-        if questions:
-            self.all_questions.extend(questions)
-            print(f"✓ Extracted {len(questions)} questions")
-            print(f"✓ Total questions so far: {len(self.all_questions)}")
+        total_zakons = self.get_counts()
+        print(f"\nFound {total_zakons} zakons")
+        
+        # Get blocks for each zakon
+        structure = []
+        for z_idx in range(total_zakons):
+            zakon = {'index': z_idx, 'num': None, 'name': None, 'blocks': []}
+            structure.append(zakon)
+            if not self.navigate_to_start():
+                continue
             
-            # Mark as completed
-            self.save_progress_state(zakon_index, block_index)
-            self.save_questions()
-            return True
-        else:
-            print("✗ No questions extracted")
-            return False
+            zakon_element, zakon_name, zakon_num = self.get_zakon_info(z_idx)
+            zakon['num'], zakon['name'] = zakon_num, zakon_name
+            if zakon_element and self.click_element(zakon_element):
+                for b_idx, element in enumerate(self.wait_for_blocks()):
+                    zakon['blocks'].append({
+                        'index': b_idx,
+                        'num': element.get_attribute('data-block-num'),
+                        'name': element.find_element(By.CLASS_NAME, 'but-blocks-text').text,
+                    })
+                print(f"Zakon {z_idx + 1} ({zakon_name}): {len(zakon['blocks'])} blocks")
+        return structure
 
     def parse_all_questions(self):
         """Main method to parse all questions from the site"""
         try:
-            # First, get total counts
-            if not self.navigate_to_start():
-                print("Failed initial navigation")
-                return
-            
-            total_zakons = self.get_counts()
-            print(f"\nFound {total_zakons} zakons")
+            # First, find all zakons and their blocks (cached from earlier runs)
+            structure = None if self.rediscover else self.progress.structure
+            if structure is not None:
+                print(f"\nUsing cached structure of {len(structure)} zakons")
+            else:
+                structure = self.http.discover() if self.http else None
+                if structure is None:
+                    structure = self.discover_structure()
+                else:
+                    print(f"\nFound {len(structure)} zakons over HTTP")
+                if any(zakon['blocks'] for zakon in structure):
+                    self.progress.set_structure(structure)
             
-            # Get block counts for each zakon
-            zakon_blocks = {}
-            for z_idx in range(total_zakons):
-                if not self.navigate_to_start():
-                    continue
-                
-                zakon_element, zakon_name, _ = self.get_zakon_info(z_idx)
-                if zakon_element and self.click_element(zakon_element):
-                    time.sleep(2)
-                    blocks = self.driver.find_elements(By.CSS_SELECTOR, 'div.but-blocks-table[data-block-num]')
-                    zakon_blocks[z_idx] = len(blocks)
-                    print(f"Zakon {z_idx + 1} ({zakon_name}): {len(blocks)} blocks")
+            # Only the zakon/block combinations that are not finished yet
+            jobs = self.progress.pending_jobs(structure)
             
             print(f"\n{'='*80}")
-            print(f"Starting to process all blocks...")
+            print(f"Starting to process {len(jobs)} remaining blocks...")
             print(f"{'='*80}\n")
             
-            # Process each zakon/block combination
-            for zakon_index in range(total_zakons):
-                num_blocks = zakon_blocks.get(zakon_index, 0)
-                
-                for block_index in range(num_blocks):
-                    success = self.process_single_block(zakon_index, block_index)
-                    
-                    if not success:
-                        print(f"Failed to process zakon {zakon_index + 1}, block {block_index + 1}")
-                    
-                    # Small delay between blocks
-                    time.sleep(2)
+            if self.refresh:
+                jobs = self.refresh_blocks(structure)
+            elif self.http and jobs:
+                if self.crawler:
+                    jobs = self.crawler.run(structure, jobs, self.record_block)
+                else:
+                    jobs = self.process_blocks_http(structure, jobs)
+                if jobs:
+                    print(f"\n{len(jobs)} blocks need the browser fallback")
+            
+            if jobs and self.workers == 1:
+                self.ensure_driver()
+            
+            if not jobs:
+                worker_stats = [self.stats]
+            elif self.workers > 1:
+                worker_stats = self.process_blocks_parallel(jobs)
+            else:
+                self.process_blocks(self, jobs)
+                worker_stats = [self.stats]
             
             print(f"\n{'='*80}")
             print(f"COMPLETED: Total questions extracted: {len(self.all_questions)}")
+            self.print_throughput(worker_stats)
+            self.latency.print_report()
             print(f"{'='*80}")
             
         except Exception as e:
@@ -317,70 +393,284 @@ class TestParser:
             import traceback
             traceback.print_exc()
         finally:
+            self.latency.save('latency_report.json')
             self.save_final_results()
 
-    def save_questions(self):
-        """Quick save of questions"""
-        try:
-            with open('questions_progress.json', 'w', encoding='utf-8') as f:
-                json.dump(self.all_questions, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Error saving questions: {e}")
+    def refresh_blocks(self, structure):
+        """Re-fetch every block and merge only those whose payload changed"""
+        store = ContentStore('block_hashes.json')
+        report = {'unchanged': 0, 'not_modified': 0, 'changed_blocks': 0, 'unchecked': [], 'blocks': {}}
+        
+        for zakon in structure:
+            for block in zakon['blocks']:
+                key = f"{zakon['index']}_{block['index']}"
+                completed = self.is_completed(zakon['index'], block['index'])
+                # A block missing from the journal (e.g. interrupted earlier) is
+                # fetched in full: the server's copy being unchanged does not make it scraped
+                headers = store.conditional_headers(key) if completed else {}
+                try:
+                    status, testobj, etag, last_modified = self.http.fetch_block_conditional(
+                        zakon['num'], block['num'], headers
+                    )
+                except Exception as e:
+                    print(f"Refresh failed for block {key}: {e}")
+                    report['unchecked'].append(key)
+                    continue
+                
+                if status == 304:
+                    if completed:
+                        report['not_modified'] += 1
+                    else:
+                        report['unchecked'].append(key)
+                    continue
+                questions = None
+                if testobj is not None:
+                    questions = self.http.block_questions(testobj, zakon['num'], block['num'], block['name'])
+                if questions is None:
+                    report['unchecked'].append(key)
+                    continue
+                
+                content_hash = payload_hash(testobj)
+                if store.get(key).get('hash') == content_hash and completed:
+                    store.update(key, etag=etag, last_modified=last_modified)
+                    report['unchanged'] += 1
+                    continue
+                
+                diff = diff_questions(self.progress.blocks.get(key, []), questions)
+                store.update(key, content_hash, etag, last_modified)
+                if not any(diff.values()):
+                    report['unchanged'] += 1
+                    continue
+                
+                print(f"Block {key} changed: +{len(diff['added'])} -{len(diff['removed'])} "
+                      f"~{len(diff['changed'])}")
+                report['changed_blocks'] += 1
+                report['blocks'][key] = diff
+                with self.lock:
+                    self.progress.add_block(zakon['index'], block['index'], questions)
+        
+        store.save()
+        write_json_atomic('refresh_report.json', report)
+        self.all_questions = list(self.progress.questions())
+        self.outputs_stale = report['changed_blocks'] > 0
+        print(f"Refresh: {report['changed_blocks']} changed, {report['unchanged']} unchanged, "
+              f"{report['not_modified']} not modified, {len(report['unchecked'])} unchecked "
+              f"(see refresh_report.json)")
+        return []
+
+    def process_blocks_http(self, structure, jobs):
+        """Fetch blocks without a browser and return the jobs that still need one"""
+        remaining = []
+        for zakon_index, block_index in jobs:
+            zakon = structure[zakon_index]
+            block = zakon['blocks'][block_index]
+            started = time.perf_counter()
+            with metrics.span('fetch_block', source='http'):
+                questions = self.http.fetch_block(zakon['num'], block['num'], block['name'])
+            elapsed = time.perf_counter() - started
+            self.latency.observe('http_block', elapsed, ok=bool(questions))
+            
+            if questions:
+                print(f"HTTP: Zakon {zakon_index + 1}, Block {block_index + 1}")
+                self.stats.record(True, len(questions), elapsed)
+                self.record_block(zakon_index, block_index, questions)
+            else:
+                metrics.count('blocks_failed', source='http')
+                remaining.append((zakon_index, block_index))
+        return remaining
+
+    @staticmethod
+    def process_blocks(worker, jobs):
+        """Run block jobs one after another on the given worker's driver"""
+        for zakon_index, block_index in jobs:
+            success = worker.process_single_block(zakon_index, block_index)
+            
+            if not success:
+                print(f"Failed to process zakon {zakon_index + 1}, block {block_index + 1}")
+            
+            # Optional politeness delay between blocks
+            if worker.block_delay:
+                time.sleep(worker.block_delay)
 
+    def process_blocks_parallel(self, jobs):
+        """Spread block jobs across a pool of browser workers"""
+        pending = [job for job in jobs if not self.is_completed(*job)]
+        job_queue = queue.Queue()
+        for job in pending:
+            job_queue.put(job)
+        
+        worker_count = min(self.workers, len(pending)) or 1
+        print(f"Starting {worker_count} workers for {len(pending)} blocks...")
+        worker_stats = [WorkerStats(worker_id) for worker_id in range(1, worker_count + 1)]
+        
+        def run(stats):
+            try:
+                worker = BlockWorker(self, stats)
+            except Exception as e:
+                print(f"Worker {stats.worker_id} failed to start: {e}")
+                return
+            try:
+                while True:
+                    try:
+                        job = job_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    self.process_blocks(worker, [job])
+            finally:
+                worker.close()
+        
+        threads = [threading.Thread(target=run, args=(stats,), daemon=True)
+                   for stats in worker_stats]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        return worker_stats
+
+    def print_throughput(self, worker_stats):
+        """Print per-worker throughput counters"""
+        worker_stats = [stats for stats in worker_stats if stats.blocks_done or stats.blocks_failed]
+        if not worker_stats:
+            return
+        print("Throughput:")
+        for stats in worker_stats:
+            print(f"  {stats.summary()}")
+        total_blocks = sum(stats.blocks_done for stats in worker_stats)
+        total_rate = sum(stats.blocks_per_minute() for stats in worker_stats)
+        print(f"  Total: {total_blocks} blocks, {total_rate:.2f} blocks/min")
+
+    @metrics.timed()
     def save_final_results(self):
         """Save final results to multiple formats"""
+        try:
+            self.save_checkpoint()
+        except Exception as e:
+            print(f"Error saving checkpoint: {e}")
+        
+        if not self.outputs_stale:
+            print("No question changes, outputs left as they are")
+            return
+        
         if not self.all_questions:
             print("No questions to save")
             return
 
-        # Save as JSON
-        with open('all_questions.json', 'w', encoding='utf-8') as f:
-            json.dump(self.all_questions, f, ensure_ascii=False, indent=2)
-
-        # Save as readable text
-        with open('all_questions.txt', 'w', encoding='utf-8') as f:
-            for i, q in enumerate(self.all_questions, 1):
-                f.write(f"Question {i}:\n")
-                f.write(f"Theme: {q['theme_name']}\n")
-                f.write(f"Question: {q['question']}\n")
-                f.write("Answers:\n")
-                for ans_num, ans_text in q['answers'].items():
-                    marker = " ✓" if ans_num == q['correct_answer'] else ""
-                    f.write(f"  {ans_num}) {ans_text}{marker}\n")
-                f.write(f"Article: {q['article']}\n")
-                f.write("-" * 80 + "\n\n")
-
-        # Save as CSV
-        import csv
-        with open('all_questions.csv', 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Theme', 'Question', 'Answer1', 'Answer2', 'Answer3', 'Answer4', 'Correct Answer', 'Article'])
-            
-            for q in self.all_questions:
-                answers = [q['answers'].get(str(i), '') for i in range(1, 5)]
-                writer.writerow([
-                    q['theme_name'],
-                    q['question'],
-                    *answers,
-                    q['correct_answer'],
-                    q['article']
-                ])
+        with metrics.span('validate'):
+            report = validate(self.progress.questions())
+            report.write('validation_report.json')
+        print(report.summary())
+
+        # Stream every question once through all output formats
+        with metrics.span('export'):
+            formats = ['json', 'tree', 'txt', 'csv'] if self.tree else ['json', 'txt', 'csv']
+            saved = export(self.progress.questions(), make_sinks(formats, 'all_questions'))
+        metrics.gauge('questions_saved', saved)
 
         print(f"\nResults saved to:")
         print("- all_questions.json (structured data)")
+        if self.tree:
+            print("- all_questions.tree.json (grouped by theme and block, with counts)")
         print("- all_questions.txt (readable format)")
         print("- all_questions.csv (spreadsheet format)")
+        print("- validation_report.json (missing answers, duplicate options, markup and encoding issues)")
         print("- parsing_progress.json (progress tracking)")
+        print("- parsing_journal.jsonl (per-block journal used to resume)")
+
+    def close(self):
+        """Close the browser, HTTP session and journal"""
+        self.progress.journal.close()
+        if self.driver:
+            self.driver.quit()
+        if self.http:
+            self.http.close()
+
+class BlockWorker(TestParser):
+    """Additional browser session that reports its blocks to the owning parser"""
+    def __init__(self, owner, stats):
+        self.owner = owner
+        self.http = None
+        self.start_url = owner.start_url
+        self.headless = owner.headless
+        self.timeouts = owner.timeouts
+        self.block_delay = owner.block_delay
+        self.latency = owner.latency
+        self.worker_id = stats.worker_id
+        self.stats = stats
+        self.setup_driver(owner.headless)
+
+    def is_completed(self, zakon_index, block_index):
+        return self.owner.is_completed(zakon_index, block_index)
+
+    def record_block(self, zakon_index, block_index, questions):
+        self.owner.record_block(zakon_index, block_index, questions)
 
     def close(self):
-        """Close the browser"""
         if self.driver:
             self.driver.quit()
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Scrape exam questions from findh.org')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of parallel browser workers (default: 1)')
+    parser.add_argument('--headless', action='store_true',
+                        help='run Chrome without a visible window')
+    parser.add_argument('--timeout', action='append', default=[], metavar='STEP=SECONDS',
+                        help=f"override a readiness timeout, steps: {', '.join(DEFAULT_TIMEOUTS)}")
+    parser.add_argument('--delay', type=float, default=0.0,
+                        help='pause in seconds between blocks (default: 0)')
+    parser.add_argument('--http', action='store_true',
+                        help='fetch block pages over plain HTTP, using Chrome only as a fallback')
+    parser.add_argument('--rediscover', action='store_true',
+                        help='discover zakons and blocks again instead of using the cached structure')
+    parser.add_argument('--refresh', action='store_true',
+                        help='re-check every block over HTTP and merge only the changed ones')
+    parser.add_argument('--tree', action='store_true',
+                        help='also write all_questions.tree.json (holds the whole bank in memory)')
+    parser.add_argument('--crawl', action='store_true',
+                        help='like --http, but fetch all block pages concurrently')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='maximum parallel requests in --crawl mode (default: 8)')
+    parser.add_argument('--rate', type=float, default=4.0,
+                        help='maximum requests per second in --crawl mode (default: 4)')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='retries per block page in --crawl mode (default: 3)')
+    parser.add_argument('--start-url', default=START_URL,
+                        help='start page URL (point it at a local server to test with saved pages)')
+    parser.add_argument('--block-url', default=BLOCK_URL_TEMPLATE,
+                        help='block page URL template with {start_url}, {zakon} and {block} fields')
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    
+    timeouts = {}
+    for item in args.timeout:
+        step, _, seconds = item.partition('=')
+        if step not in DEFAULT_TIMEOUTS or not seconds:
+            parser.error(f"invalid --timeout {item!r}")
+        timeouts[step] = float(seconds)
+    args.timeouts = timeouts
+    return args
+
 def main():
-    parser = TestParser(headless=False)
+    args = parse_args()
+    http = crawler = None
+    if args.crawl:
+        # The crawler does its own retries with backoff
+        http = HttpExtractor(args.start_url, args.block_url,
+                             pool_size=max(4, args.concurrency), retries=0)
+        crawler = AsyncCrawler(http, concurrency=args.concurrency,
+                               rate=args.rate, retries=args.retries)
+    elif args.http or args.refresh:
+        http = HttpExtractor(args.start_url, args.block_url, pool_size=max(4, args.workers))
+    parser = TestParser(headless=args.headless, workers=args.workers,
+                        timeouts=args.timeouts, block_delay=args.delay, http=http,
+                        start_url=args.start_url, crawler=crawler,
+                        rediscover=args.rediscover, refresh=args.refresh, tree=args.tree)
     try:
-        parser.parse_all_questions()
+        with instrumentation.session(args):
+            parser.parse_all_questions()
+            metrics.print_report()
     except KeyboardInterrupt:
         print("\n\nProcess interrupted by user")
         print(f"Progress saved. {len(parser.all_questions)} questions extracted so far.")
@@ -0,0 +1,123 @@
+import copy
+from collections import OrderedDict
+
+from reportlab.platypus import Paragraph
+
+DEFAULT_TEXT_CACHE = 8192
+DEFAULT_PARAGRAPH_CACHE = 4096
+DEFAULT_LAYOUT_CACHE = 4096
+
+
+class LRUCache:
+    """Small bounded mapping that evicts the least recently used entry"""
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        if key not in self.entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class CachedParagraph(Paragraph):
+    """Paragraph that shares its line breaking with identical paragraphs.
+
+    Breaking lines measures every word and dominates doc.build, so the result
+    for a (markup, style, widths) key is computed once and reused. Paragraphs
+    produced by split() have no key and break their lines as usual.
+    """
+    layout_key = None
+    layouts = None
+
+    def breakLines(self, width):
+        if self.layout_key is None:
+            return super().breakLines(width)
+        key = (self.layout_key, tuple(width) if isinstance(width, list) else width)
+        cached = self.layouts.get(key)
+        if cached is None:
+            lines = super().breakLines(width)
+            self.layouts.put(key, (lines, self.frags, self._width_max))
+            return lines
+        lines, self.frags, self._width_max = cached
+        return lines
+
+
+class ParagraphFactory:
+    """Memoized text sanitizing and Paragraph creation for repeated content.
+
+    The first Paragraph made for a (markup, style) pair is kept as a prototype
+    and every request, the first included, gets a shallow copy sharing its
+    parsed fragments, so the markup is parsed once. The prototype is never
+    laid out itself: a flowable used in one build cannot go into another, and
+    handing it out made the next build fail with LayoutError. Copies also
+    share line breaking through CachedParagraph. All caches are bounded LRUs;
+    a size of 0 disables one.
+    """
+    def __init__(self, sanitize, text_cache_size=DEFAULT_TEXT_CACHE,
+                 paragraph_cache_size=DEFAULT_PARAGRAPH_CACHE, layout_cache_size=DEFAULT_LAYOUT_CACHE):
+        self.sanitize_func = sanitize
+        self.texts = LRUCache(text_cache_size)
+        self.paragraphs = LRUCache(paragraph_cache_size)
+        self.layouts = LRUCache(layout_cache_size)
+
+    def sanitize(self, text):
+        if not text:
+            return self.sanitize_func(text)
+        result = self.texts.get(text)
+        if result is None:
+            result = self.sanitize_func(text)
+            self.texts.put(text, result)
+        return result
+
+    def paragraph(self, markup, style):
+        key = (markup, style)
+        prototype = self.paragraphs.get(key)
+        if prototype is None:
+            prototype = CachedParagraph(markup, style)
+            if self.layouts.maxsize > 0:
+                prototype.layout_key = key
+                prototype.layouts = self.layouts
+            self.paragraphs.put(key, prototype)
+        # The prototype itself never goes into a story: a document build leaves
+        # state such as _postponed on the flowables it lays out
+        return copy.copy(prototype)
+
+    def clear(self):
+        self.texts.clear()
+        self.paragraphs.clear()
+        self.layouts.clear()
+
+    def stats(self):
+        return {
+            'texts': self.texts.stats(),
+            'paragraphs': self.paragraphs.stats(),
+            'layouts': self.layouts.stats(),
+        }
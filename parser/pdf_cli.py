@@ -0,0 +1,225 @@
+import argparse
+import hashlib
+import importlib
+import json
+import sys
+import time
+
+import instrumentation
+from dedup import group_by_question, group_by_theme
+from exporters import iter_questions
+from instrumentation import metrics
+from validate import validate
+
+# ReportLab and the layout modules are only imported once a PDF is actually
+# rendered, so --stats and argument errors return right away.
+DEFAULT_CACHE_DIR = '.pdf_fragments'
+
+LAYOUTS = {
+    'questions': {
+        'module': 'json_to_pdf',
+        'output': 'quiz_questions.pdf',
+        'description': 'all questions with every answer option',
+    },
+    'answers': {
+        'module': 'json_to_pdf_only_answers',
+        'output': 'quiz_answers_only.pdf',
+        'description': 'questions with their correct answers only',
+    },
+}
+
+
+class BankSelection:
+    """Questions of the selected themes and blocks, read from the bank as a stream.
+
+    Only matching records are kept in memory. For every selected theme a
+    digest of its records is kept as well, which keys the fragment cache.
+    """
+    def __init__(self, theme_ids=None, block_ids=None):
+        self.theme_ids = set(theme_ids or ())
+        self.block_ids = set(block_ids or ())
+        self.questions = []
+        self.total = 0
+        self.themes_seen = set()
+        self.blocks_seen = set()
+        self.hashes = {}
+
+    def matches(self, q):
+        return ((not self.theme_ids or str(q['theme_id']) in self.theme_ids) and
+                (not self.block_ids or str(q.get('block_id')) in self.block_ids))
+
+    def read(self, json_file):
+        for q in iter_questions(json_file):
+            self.total += 1
+            self.themes_seen.add(str(q['theme_id']))
+            if q.get('block_id') is not None:
+                self.blocks_seen.add(str(q['block_id']))
+            if self.matches(q):
+                self.questions.append(q)
+                digest = self.hashes.get(str(q['theme_id']))
+                if digest is None:
+                    digest = self.hashes[str(q['theme_id'])] = hashlib.sha256()
+                digest.update(json.dumps(q, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+        self.check()
+        return self
+
+    def check(self):
+        for label, wanted, seen in (('theme', self.theme_ids, self.themes_seen),
+                                    ('block', self.block_ids, self.blocks_seen)):
+            unknown = sorted(wanted - seen)
+            if unknown:
+                available = ', '.join(sorted(seen, key=lambda x: int(x) if x.isdigit() else 0)) or 'none'
+                raise SystemExit(f"Unknown {label}(s): {', '.join(unknown)}. Available: {available}")
+        if not self.questions:
+            raise SystemExit("No questions match the selected themes and blocks")
+
+    def digests(self):
+        return {theme_id: digest.hexdigest() for theme_id, digest in self.hashes.items()}
+
+
+@metrics.timed()
+def load_questions(json_file, theme_ids=None, block_ids=None):
+    return BankSelection(theme_ids, block_ids).read(json_file)
+
+
+def check_bank(selection, strict=False, report_path=None):
+    """Validate the selected questions before anything is written"""
+    with metrics.span('validate'):
+        report = validate(selection.questions)
+    print(report.summary())
+    if report_path:
+        report.write(report_path)
+        print(f"Validation report written to {report_path}")
+    if strict and not report.ok:
+        raise SystemExit(f"{len(report.error_rows())} question(s) failed validation; not writing a PDF")
+    return report
+
+
+@metrics.timed()
+def group_themes(layout, questions, near_duplicates=False):
+    """Deduplicate and group questions by theme the way the layout prints them"""
+    if layout == 'answers':
+        return group_by_question(questions, near_duplicates=near_duplicates)
+    return group_by_theme(questions)
+
+
+def ordered_themes(themes):
+    """Themes in print order"""
+    return [(theme_id, themes[theme_id]) for theme_id in sorted(themes, key=lambda x: int(x))]
+
+
+def print_stats(selection, selected):
+    for theme_id, theme_data in selected:
+        print(f"  Тема {theme_id}: {theme_data['name']} - {len(theme_data['questions'])} questions")
+    unique_count = sum(len(theme_data['questions']) for _, theme_data in selected)
+    print(f"Total themes: {len(selected)}")
+    print(f"Total unique questions: {unique_count}")
+    print(f"Questions in JSON: {selection.total} ({len(selection.questions)} selected)")
+    print(f"Duplicates removed: {len(selection.questions) - unique_count}")
+
+
+def render(layout, json_file, output_pdf, jobs=1, near_duplicates=False, theme_ids=None, block_ids=None,
+           cache_dir=DEFAULT_CACHE_DIR, strict=False, report_path=None):
+    """Render one layout of the selected questions to output_pdf; return the printed themes.
+
+    With a cache_dir (and pypdf installed) every theme is kept as a PDF
+    fragment and only themes whose questions changed are rendered again.
+    """
+    from pdf_fonts import discover_font, register_fonts
+    from pdf_render import parallel_available, render_themes
+
+    # Find the font before any heavy work so a missing one fails right away
+    font_name, _ = register_fonts()
+    module = importlib.import_module(LAYOUTS[layout]['module'])
+
+    selection = load_questions(json_file, theme_ids, block_ids)
+    check_bank(selection, strict, report_path)
+    selected = ordered_themes(group_themes(layout, selection.questions, near_duplicates))
+
+    if cache_dir and not parallel_available():
+        print("Warning: pypdf is not installed, rendering without the fragment cache")
+        cache_dir = None
+    if cache_dir:
+        from pdf_fragments import FragmentCache, render_cached, render_salt
+        options = {'near_duplicates': near_duplicates, 'font': discover_font()}
+        cache = FragmentCache(cache_dir, layout, render_salt(module, options))
+        with metrics.span('pdf_render', layout=layout):
+            rendered = render_cached(selected, selection.digests(), module.build_theme_story,
+                                     output_pdf, font_name, cache, jobs=jobs, theme_title=module.theme_title)
+        metrics.count('pdf_themes_reused', len(selected) - len(rendered))
+        print(f"Rendered {len(rendered)} theme(s){': ' + ', '.join(rendered) if rendered else ''}; "
+              f"reused {len(selected) - len(rendered)} from {cache_dir}")
+    else:
+        with metrics.span('pdf_render', layout=layout):
+            render_themes(selected, module.build_theme_story, output_pdf, font_name,
+                          jobs=jobs, theme_title=module.theme_title)
+
+    print(f"PDF successfully created: {output_pdf}")
+    print_stats(selection, selected)
+    return selected
+
+
+def parse_args(argv=None, layout=None):
+    parser = argparse.ArgumentParser(
+        description='Create a PDF from the question bank: ' +
+                    '; '.join(f"{name} = {spec['description']}" for name, spec in LAYOUTS.items()))
+    parser.add_argument('json_file', nargs='?', default='all_questions.json')
+    parser.add_argument('output_pdf', nargs='?', default=None,
+                        help='output file (default depends on the layout)')
+    parser.add_argument('--layout', choices=sorted(LAYOUTS), default=layout or 'questions')
+    parser.add_argument('--theme', action='append', dest='themes', metavar='ID',
+                        help='only include this theme (repeatable)')
+    parser.add_argument('--block', action='append', dest='blocks', metavar='ID',
+                        help='only include questions of this block (repeatable)')
+    parser.add_argument('--stats', action='store_true',
+                        help='print per-theme counts without rendering')
+    parser.add_argument('--near-duplicates', action='store_true',
+                        help='answers layout: also merge questions whose texts are almost identical')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='render themes in parallel with this many processes (needs pypdf)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f"where rendered theme fragments are kept (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--no-cache', action='store_true',
+                        help='render everything and keep no fragments')
+    parser.add_argument('--strict', action='store_true',
+                        help='stop without writing a PDF if any question fails validation')
+    parser.add_argument('--validation-report', metavar='PATH',
+                        help='write the JSON validation report of the selected questions here')
+    parser.add_argument('--font-dir', action='append', default=[], metavar='DIR',
+                        help='extra directory with a Cyrillic TTF font (also $PDF_FONT_DIR)')
+    instrumentation.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None, layout=None):
+    started = time.perf_counter()
+    args = parse_args(argv, layout)
+    with instrumentation.session(args):
+        run(args, started)
+
+
+def run(args, started):
+    if args.stats:
+        selection = load_questions(args.json_file, args.themes, args.blocks)
+        check_bank(selection, report_path=args.validation_report)
+        selected = ordered_themes(group_themes(args.layout, selection.questions, args.near_duplicates))
+        print_stats(selection, selected)
+        print(f"Done in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return
+
+    from pdf_fonts import FontNotFoundError, add_font_dirs
+    if args.font_dir:
+        add_font_dirs(args.font_dir)
+    try:
+        render(args.layout, args.json_file, args.output_pdf or LAYOUTS[args.layout]['output'],
+               jobs=args.jobs, near_duplicates=args.near_duplicates, theme_ids=args.themes,
+               block_ids=args.blocks, cache_dir=None if args.no_cache else args.cache_dir,
+               strict=args.strict, report_path=args.validation_report)
+    except FontNotFoundError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        raise SystemExit(2)
+    print(f"Done in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
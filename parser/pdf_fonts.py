@@ -0,0 +1,135 @@
+import json
+import os
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+# Font families with Cyrillic glyphs, in order of preference: (name, regular file, bold file)
+FONT_FAMILIES = [
+    ('DejaVuSans', 'DejaVuSans.ttf', 'DejaVuSans-Bold.ttf'),
+    ('LiberationSans', 'LiberationSans-Regular.ttf', 'LiberationSans-Bold.ttf'),
+    ('NotoSans', 'NotoSans-Regular.ttf', 'NotoSans-Bold.ttf'),
+    ('FreeSans', 'FreeSans.ttf', 'FreeSansBold.ttf'),
+    ('Arial', 'arial.ttf', 'arialbd.ttf'),
+]
+CYRILLIC_SAMPLE = 'АБВЖЩЯабвжщяЁё'
+FONT_DIR_ENV = 'PDF_FONT_DIR'
+CACHE_FILE = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'quiz-pdf' / 'fonts.json'
+
+
+class FontNotFoundError(RuntimeError):
+    pass
+
+
+def extra_dirs():
+    """Font directories given in the environment; worker processes inherit them"""
+    return [Path(d) for d in os.environ.get(FONT_DIR_ENV, '').split(os.pathsep) if d]
+
+
+def add_font_dirs(dirs):
+    os.environ[FONT_DIR_ENV] = os.pathsep.join([str(d) for d in dirs] + [str(d) for d in extra_dirs()])
+    register_fonts.cache_clear()
+
+
+def search_dirs():
+    """(directory, recursive) pairs to look for fonts in, explicit ones first.
+
+    The working and project directories are only checked at the top level,
+    font directories are searched with their subfolders.
+    """
+    dirs = [(directory, True) for directory in extra_dirs()]
+    here = Path(__file__).resolve().parent
+    dirs += [(Path.cwd(), False), (here, False), (here.parent, False)]
+    home = Path.home()
+    if sys.platform == 'win32':
+        system = [Path(os.environ.get('WINDIR', 'C:\\Windows')) / 'Fonts']
+    elif sys.platform == 'darwin':
+        system = [home / 'Library' / 'Fonts', Path('/Library/Fonts'), Path('/System/Library/Fonts')]
+    else:
+        system = [home / '.fonts', home / '.local' / 'share' / 'fonts',
+                  Path('/usr/local/share/fonts'), Path('/usr/share/fonts')]
+    return dirs + [(directory, True) for directory in system]
+
+
+def find_files(names, dirs):
+    """Map each wanted file name to the first place it is found in"""
+    wanted = set(names)
+    found = {}
+    for directory, recursive in dirs:
+        if wanted <= found.keys():
+            break
+        if not directory.is_dir():
+            continue
+        if not recursive:
+            for name in wanted - found.keys():
+                if (directory / name).is_file():
+                    found[name] = directory / name
+            continue
+        for root, _, files in os.walk(directory):
+            for name in wanted.intersection(files) - found.keys():
+                found[name] = Path(root) / name
+    return found
+
+
+def load_cache():
+    try:
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if all(os.path.isfile(cached.get(key) or '') for key in ('regular', 'bold')):
+        return cached
+    return None
+
+
+def save_cache(entry):
+    try:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=2)
+    except OSError:
+        pass
+
+
+def discover_font():
+    """Locate the regular and bold files of the first installed Cyrillic family.
+
+    A previous hit is reused from the cache file as long as its files still
+    exist; font directories given explicitly always take precedence.
+    """
+    if not extra_dirs():
+        cached = load_cache()
+        if cached:
+            return cached
+
+    dirs = search_dirs()
+    found = find_files([name for family in FONT_FAMILIES for name in family[1:]], dirs)
+    for family, regular, bold in FONT_FAMILIES:
+        if regular in found and bold in found:
+            entry = {'family': family, 'regular': str(found[regular]), 'bold': str(found[bold])}
+            save_cache(entry)
+            return entry
+
+    families = ', '.join(f"{regular}/{bold}" for _, regular, bold in FONT_FAMILIES)
+    raise FontNotFoundError(
+        f"No Cyrillic TrueType font found. Install one of {families} "
+        f"(e.g. the fonts-dejavu package), or put the files in a directory given by "
+        f"--font-dir or {FONT_DIR_ENV}. Searched: {', '.join(str(d) for d, _ in dirs)}"
+    )
+
+
+@lru_cache(maxsize=None)
+def register_fonts():
+    """Register the Cyrillic font pair with ReportLab once; return (regular, bold) names"""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    entry = discover_font()
+    regular_name, bold_name = entry['family'], f"{entry['family']}-Bold"
+    regular = TTFont(regular_name, entry['regular'])
+    missing = [char for char in CYRILLIC_SAMPLE if ord(char) not in regular.face.charToGlyph]
+    if missing:
+        raise FontNotFoundError(f"{entry['regular']} has no glyphs for {''.join(missing)}")
+    pdfmetrics.registerFont(regular)
+    pdfmetrics.registerFont(TTFont(bold_name, entry['bold']))
+    return regular_name, bold_name
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+from pdf_render import merge_fragments, render_fragments
+
+KEY_LENGTH = 16
+KEEP_PER_THEME = 3
+
+# Modules whose code ends up in a rendered fragment; editing any of them
+# invalidates the cache
+RENDER_MODULES = ('pdf_render', 'pdf_styles', 'pdf_text', 'pdf_cache', 'pdf_fonts')
+
+
+def render_salt(layout_module, options):
+    """Hash of everything besides the questions that changes how a fragment looks"""
+    digest = hashlib.sha256()
+    for name in (layout_module.__name__, *RENDER_MODULES):
+        digest.update(Path(sys.modules[name].__file__).read_bytes())
+    digest.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class FragmentCache:
+    """Per-theme PDF fragments on disk, named after a hash of their inputs.
+
+    A fragment is valid as long as its theme's questions, the render options
+    and the rendering code are unchanged, so a fragment that exists under its
+    expected name can be merged as is.
+    """
+    def __init__(self, cache_dir, layout, salt):
+        self.cache_dir = Path(cache_dir)
+        self.layout = layout
+        self.salt = salt
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, theme_digest, first):
+        digest = hashlib.sha256(f"{self.salt}:{theme_digest}:{int(first)}".encode('utf-8'))
+        return digest.hexdigest()[:KEY_LENGTH]
+
+    def path(self, theme_id, theme_digest, first):
+        return self.cache_dir / f"{self.layout}-theme_{theme_id}-{self.key(theme_digest, first)}.pdf"
+
+    def touch(self, path):
+        """Mark a fragment as used, pruning keeps the most recently used ones"""
+        os.utime(path)
+
+    def prune(self, theme_ids, keep_per_theme=KEEP_PER_THEME):
+        """Remove all but the newest fragments of the given themes; return how many were removed.
+
+        More than one fragment per theme is kept because partial runs (--theme,
+        --block) produce other variants of a theme than the full document.
+        """
+        pattern = re.compile(rf"^{re.escape(self.layout)}-theme_(\w+)-[0-9a-f]+\.pdf(\.tmp)?$")
+        by_theme = {}
+        for path in self.cache_dir.iterdir():
+            match = pattern.match(path.name)
+            if match and match.group(1) in theme_ids:
+                by_theme.setdefault(match.group(1), []).append(path)
+        removed = 0
+        for paths in by_theme.values():
+            paths.sort(key=lambda path: path.stat().st_mtime, reverse=True)
+            for path in paths[keep_per_theme:]:
+                path.unlink()
+                removed += 1
+        return removed
+
+
+def render_cached(themes, digests, builder, output_pdf, font_name, cache, jobs=1, theme_title=None):
+    """Render only the themes without a valid fragment, then merge all fragments.
+
+    themes is a list of (theme_id, theme_data) and digests maps every theme id
+    to a hash of its questions. Returns the ids of the themes rendered anew.
+    """
+    paths = [cache.path(theme_id, digests[theme_id], i == 0) for i, (theme_id, _) in enumerate(themes)]
+    missing = []
+    for i, ((theme_id, theme_data), path) in enumerate(zip(themes, paths)):
+        if path.exists():
+            cache.touch(path)
+        else:
+            missing.append((theme_id, theme_data, i == 0, str(path)))
+    render_fragments(missing, builder, jobs)
+    merge_fragments(themes, [str(path) for path in paths], output_pdf, font_name, theme_title)
+    cache.prune({theme_id for theme_id, _ in themes})
+    return [theme_id for theme_id, *_ in missing]
@@ -0,0 +1,167 @@
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Flowable, PageBreak, SimpleDocTemplate
+
+from instrumentation import metrics
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    PdfReader = PdfWriter = None
+
+PAGE_MARGIN = 2 * cm
+
+
+class Bookmark(Flowable):
+    """Zero-size flowable that adds a PDF outline entry at its position"""
+    def __init__(self, title, key):
+        super().__init__()
+        self.title = title
+        self.key = key
+
+    def wrap(self, available_width, available_height):
+        return 0, 0
+
+    def draw(self):
+        self.canv.bookmarkPage(self.key)
+        self.canv.addOutlineEntry(self.title, self.key, level=0)
+
+
+def make_doc(output_pdf):
+    return SimpleDocTemplate(output_pdf, pagesize=A4,
+                             leftMargin=PAGE_MARGIN, rightMargin=PAGE_MARGIN,
+                             topMargin=PAGE_MARGIN, bottomMargin=PAGE_MARGIN)
+
+
+def draw_page_number(canv, number, font_name):
+    canv.setFont(font_name, 8)
+    canv.drawCentredString(A4[0] / 2, PAGE_MARGIN / 2, str(number))
+
+
+def build_document(story, output_pdf, font_name):
+    """Build a single PDF with page numbers in the footer"""
+    def on_page(canv, doc):
+        canv.saveState()
+        draw_page_number(canv, doc.page, font_name)
+        canv.restoreState()
+
+    doc = make_doc(output_pdf)
+    with metrics.span('pdf_build'):
+        doc.build(story, onFirstPage=on_page, onLaterPages=on_page)
+    metrics.count('pdf_pages', doc.page)
+
+
+def render_fragment(builder, theme_id, theme_data, first, path):
+    """Worker: render one theme to its own PDF; returns its page count and the seconds
+    spent on the story and in doc.build, which the parent records (it may be another process)"""
+    tmp_path = f"{path}.tmp"
+    doc = make_doc(tmp_path)
+    started = time.perf_counter()
+    story = builder(theme_id, theme_data, first)
+    built = time.perf_counter()
+    doc.build(story)
+    # A fragment only appears under its final name once it is complete
+    os.replace(tmp_path, path)
+    return doc.page, built - started, time.perf_counter() - built
+
+
+def stamp_page_numbers(writer, font_name):
+    """Draw running page numbers on every page of the merged document"""
+    # All numbers go into one overlay document, so the font is embedded once
+    buffer = io.BytesIO()
+    overlay = canvas.Canvas(buffer, pagesize=A4)
+    for number in range(1, len(writer.pages) + 1):
+        draw_page_number(overlay, number, font_name)
+        overlay.showPage()
+    overlay.save()
+    buffer.seek(0)
+    for page, number_page in zip(writer.pages, PdfReader(buffer).pages):
+        page.merge_page(number_page)
+
+
+def parallel_available():
+    return PdfWriter is not None
+
+
+def pool_options(jobs):
+    options = {'max_workers': jobs}
+    if sys.version_info >= (3, 11):
+        # A fresh process per theme keeps each worker's memory bounded
+        options['max_tasks_per_child'] = 1
+    return options
+
+
+def render_fragments(fragments, builder, jobs=1):
+    """Render (theme_id, theme_data, first, path) entries, in a process pool if jobs > 1.
+
+    Returns the page count of every fragment.
+    """
+    if jobs > 1 and len(fragments) > 1:
+        with ProcessPoolExecutor(**pool_options(min(jobs, len(fragments)))) as pool:
+            futures = [pool.submit(render_fragment, builder, *fragment) for fragment in fragments]
+            results = [future.result() for future in futures]
+    else:
+        results = [render_fragment(builder, *fragment) for fragment in fragments]
+    for (theme_id, *_), (pages, story_seconds, build_seconds) in zip(fragments, results):
+        metrics.observe('pdf_story', story_seconds, theme=theme_id)
+        metrics.observe('pdf_build', build_seconds, theme=theme_id)
+        metrics.count('pdf_pages', pages)
+    return [pages for pages, *_ in results]
+
+
+def merge_fragments(themes, paths, output_pdf, font_name, theme_title=None):
+    """Concatenate per-theme PDFs with a bookmark per theme and running page numbers"""
+    with metrics.span('pdf_merge'):
+        writer = PdfWriter()
+        for (theme_id, theme_data), path in zip(themes, paths):
+            title = theme_title(theme_id, theme_data) if theme_title else f"Тема {theme_id}"
+            writer.append(path, outline_item=title, import_outline=False)
+        stamp_page_numbers(writer, font_name)
+        with open(output_pdf, 'wb') as f:
+            writer.write(f)
+    return len(writer.pages)
+
+
+def render_parallel(themes, builder, output_pdf, font_name, jobs=None, theme_title=None):
+    """Render each theme in a process pool, then merge the fragments in order.
+
+    themes is a list of (theme_id, theme_data); builder(theme_id, theme_data, first)
+    must be a module-level function returning the story of one theme. Every
+    fragment becomes a bookmark, and page numbers run across the whole document.
+    """
+    if not parallel_available():
+        raise RuntimeError("Parallel rendering needs pypdf: pip install pypdf")
+
+    with tempfile.TemporaryDirectory(prefix='pdf_fragments_') as tmp_dir:
+        paths = [os.path.join(tmp_dir, f"theme_{theme_id}.pdf") for theme_id, _ in themes]
+        fragments = [(theme_id, theme_data, i == 0, path)
+                     for i, ((theme_id, theme_data), path) in enumerate(zip(themes, paths))]
+        render_fragments(fragments, builder, jobs or os.cpu_count() or 1)
+        return merge_fragments(themes, paths, output_pdf, font_name, theme_title)
+
+
+def render_themes(themes, builder, output_pdf, font_name, jobs=1, theme_title=None):
+    """Render (theme_id, theme_data) pairs to one PDF, in parallel if jobs > 1 and pypdf is available"""
+    if jobs > 1 and not parallel_available():
+        print("Warning: pypdf is not installed, rendering on a single core")
+        jobs = 1
+
+    if jobs > 1:
+        # Render every theme in its own process and merge the fragments
+        render_parallel(themes, builder, output_pdf, font_name, jobs=jobs, theme_title=theme_title)
+    else:
+        # One story with a page break after each theme (except the last one)
+        story = []
+        for i, (theme_id, theme_data) in enumerate(themes):
+            if i:
+                story.append(PageBreak())
+            story.extend(builder(theme_id, theme_data, i == 0))
+        build_document(story, output_pdf, font_name)
@@ -0,0 +1,51 @@
+from functools import lru_cache
+
+from reportlab.lib.colors import HexColor
+from reportlab.lib.enums import TA_LEFT
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+
+# Style specs per PDF layout: name -> (parent, bold, options).
+# 'questions' is the full question list, 'answers' the correct-answers-only list.
+LAYOUTS = {
+    'questions': {
+        'title': ('Heading1', True, {'fontSize': 16, 'spaceAfter': 12}),
+        'theme': ('Heading2', True, {'fontSize': 14, 'spaceAfter': 10, 'spaceBefore': 10}),
+        'question': ('Normal', True, {'fontSize': 11, 'spaceAfter': 8}),
+        'answer': ('Normal', False, {'fontSize': 10, 'spaceAfter': 4, 'leftIndent': 20}),
+        'correct_answer': ('Normal', True, {'fontSize': 10, 'spaceAfter': 4, 'leftIndent': 20,
+                                            'textColor': 'green'}),
+        'article': ('Normal', False, {'fontSize': 9, 'spaceAfter': 15, 'leftIndent': 20,
+                                      'textColor': 'grey'}),
+    },
+    'answers': {
+        'title': ('Heading1', True, {'fontSize': 16, 'spaceAfter': 12}),
+        'theme': ('Heading2', True, {'fontSize': 14, 'spaceAfter': 10, 'spaceBefore': 10,
+                                     'textColor': HexColor('#1e40af')}),
+        'question': ('Normal', True, {'fontSize': 11, 'spaceAfter': 6}),
+        'answer': ('Normal', True, {'fontSize': 10, 'spaceAfter': 4, 'leftIndent': 20,
+                                    'textColor': HexColor('#16a34a')}),
+        'article': ('Normal', False, {'fontSize': 9, 'spaceAfter': 15, 'leftIndent': 20,
+                                      'textColor': HexColor('#6b7280')}),
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def sample_styles():
+    return getSampleStyleSheet()
+
+
+@lru_cache(maxsize=None)
+def get_styles(layout, font_name, font_bold):
+    """Paragraph styles of a layout, built once per process and font pair"""
+    base = sample_styles()
+    styles = {}
+    for name, (parent, bold, options) in LAYOUTS[layout].items():
+        styles[name] = ParagraphStyle(
+            f"{layout}-{name}",
+            parent=base[parent],
+            fontName=font_bold if bold else font_name,
+            alignment=TA_LEFT,
+            **options
+        )
+    return styles
@@ -0,0 +1,136 @@
+import argparse
+import html
+import json
+import re
+import timeit
+from html.entities import name2codepoint
+
+# One pass over the text: every branch starts with the character it handles,
+# a <br> in any spelling or an entity is consumed whole, anything else is a bare & < >
+MARKUP_RE = re.compile(
+    r'<(?P<br>/?\s*[bB][rR]\s*/?\s*>)?'
+    r'|&(?P<entity>(?:#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);)?'
+    r'|>'
+)
+ESCAPES = {'&': '&amp;', '<': '&lt;', '>': '&gt;'}
+KNOWN_ENTITIES = frozenset(name + ';' for name in name2codepoint)
+
+
+def _replace(match):
+    text = match.group()
+    if len(text) == 1:
+        return ESCAPES[text]
+    if text[0] == '<':
+        return '<br/>'
+    entity = match.group('entity')
+    if entity[0] == '#' or entity in KNOWN_ENTITIES:
+        return text
+    return '&amp;' + entity
+
+
+def sanitize_text(text):
+    """Turn plain question text into safe ReportLab paragraph markup.
+
+    Every spelling of <br> becomes <br/>, other < > & are escaped and
+    entities that are already escaped are kept, so the function is
+    idempotent and safe to call on its own output.
+    """
+    if not text or ('&' not in text and '<' not in text and '>' not in text):
+        return text
+    return MARKUP_RE.sub(_replace, text)
+
+
+def chained_sanitize(text):
+    """The replace chain sanitize_text superseded, kept as a benchmark baseline"""
+    if not text:
+        return text
+    text = text.replace('<br>', '<br/>')
+    text = text.replace('<BR>', '<br/>')
+    text = text.replace('<br >', '<br/>')
+    text = text.replace('&', '&amp;')
+    return text
+
+
+# Inputs the bank does not have (yet) but the scraper may return one day
+EDGE_CASES = [
+    'a & b', 'a &amp; b', 'x < y > z', '1 <2', 'line<br>break', 'line<BR >break',
+    'line<br />break', 'line<Br/>break', 'line</br>break', '&#1040;&#x410;&nbsp;',
+    '&unknown; &', '<script>alert(1)</script>', '<<br>>', '&&&', '&amp;amp;',
+]
+
+
+def bank_texts(questions):
+    for q in questions:
+        yield q.get('theme_name')
+        yield q.get('question')
+        yield q.get('article')
+        yield q.get('correct_answer_text')
+        yield from q.get('answers', {}).values()
+
+
+def visible_text(markup):
+    """What a reader sees: line breaks as newlines and entities decoded"""
+    return html.unescape(re.sub(r'</?\s*br\s*/?\s*>', '\n', markup, flags=re.IGNORECASE))
+
+
+def check_properties(texts):
+    """Check sanitize_text on every text; return a list of (text, problem)"""
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph
+
+    style = getSampleStyleSheet()['Normal']
+    failures = []
+    for text in texts:
+        if not text:
+            continue
+        markup = sanitize_text(text)
+        if sanitize_text(markup) != markup:
+            failures.append((text, 'not idempotent'))
+        if re.search(r'<(?!br/>)|(?<!<br/)>', markup):
+            failures.append((text, 'unescaped < or >'))
+        if visible_text(markup) != visible_text(text):
+            failures.append((text, 'visible text changed'))
+        try:
+            Paragraph(markup, style)
+        except ValueError as e:
+            failures.append((text, f"rejected by ReportLab: {e}"))
+    return failures
+
+
+def benchmark(texts, repeat=5):
+    """Best-of-N milliseconds to sanitize all texts with each implementation"""
+    texts = [text for text in texts if text]
+    results = {}
+    for name, func in (('chained replace', chained_sanitize), ('single pass', sanitize_text)):
+        runs = timeit.repeat(lambda: [func(text) for text in texts], number=1, repeat=repeat)
+        results[name] = min(runs) * 1000
+    return len(texts), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark sanitize_text on a question bank')
+    parser.add_argument('json_file', nargs='?', default='all_questions.json')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.json_file, 'r', encoding='utf-8') as f:
+        texts = list(bank_texts(json.load(f)))
+
+    failures = check_properties(texts + EDGE_CASES)
+    print(f"Checked {len(texts) + len(EDGE_CASES)} texts: {len(failures)} problems")
+    for text, problem in failures[:20]:
+        print(f"  {problem}: {text[:80]!r}")
+
+    with_markup = [text for text in texts if text and re.search('[&<>]', text)]
+    for label, sample in (('all texts', texts), ('texts with markup', with_markup * 100)):
+        count, results = benchmark(sample, args.repeat)
+        baseline = results['chained replace']
+        print(f"{label} ({count}):")
+        for name, ms in results.items():
+            print(f"  {name:<16}{ms:>9.2f} ms ({baseline / ms:.1f}x)")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
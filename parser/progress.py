@@ -0,0 +1,131 @@
+import json
+import os
+
+from journal import write_json_atomic
+
+
+def block_key(zakon_index, block_index):
+    return f"{zakon_index}_{block_index}"
+
+
+class ProgressState:
+    """In-memory index of finished blocks, persisted through the block journal"""
+    def __init__(self, journal, checkpoint_file='parsing_progress.json',
+                 legacy_questions_file='questions_progress.json'):
+        self.journal = journal
+        self.checkpoint_file = checkpoint_file
+        self.legacy_questions_file = legacy_questions_file
+        self.blocks = {}
+        self.structure = None
+
+    def load(self):
+        """Replay the journal; without one, import the files of a run from before the journal"""
+        try:
+            for record in self.journal.replay():
+                if record.get('type') == 'structure':
+                    self.structure = record['structure']
+                else:
+                    # A later record for the same block replaces the earlier one
+                    self.blocks[record['key']] = record['questions']
+        except Exception as e:
+            print(f"Error loading journal: {e}")
+        self.fill_blocks()
+
+        if not self.blocks and os.path.exists(self.checkpoint_file):
+            try:
+                self.import_legacy()
+            except Exception as e:
+                print(f"Error loading progress: {e}")
+        return self
+
+    def import_legacy(self):
+        """Journal the blocks of an old checkpoint with their questions from questions_progress.json.
+
+        The old files only list completed block keys and all questions in the
+        order they were scraped. Block boundaries are where question numbers
+        start over at 1 (numbers also restart per theme). The questions are
+        only assigned when they split into exactly as many blocks as were
+        completed. Otherwise no block counts as done and all are scraped
+        again, because a completed block without its questions would be lost
+        from the final export.
+        """
+        with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+            completed = json.load(f).get('completed', [])
+        if not completed:
+            return
+        if not os.path.exists(self.legacy_questions_file):
+            print(f"{self.checkpoint_file} lists {len(completed)} completed blocks but "
+                  f"{self.legacy_questions_file} is missing, scraping them again")
+            return
+        with open(self.legacy_questions_file, 'r', encoding='utf-8') as f:
+            questions = json.load(f)
+
+        segments = []
+        previous = None
+        for q in questions:
+            number = q.get('question_number')
+            if previous is None or number is None or number <= previous:
+                segments.append([])
+            segments[-1].append(q)
+            previous = number
+        if len(segments) != len(completed):
+            print(f"{self.legacy_questions_file} holds {len(segments)} blocks of questions for "
+                  f"{len(completed)} completed blocks, scraping them again")
+            return
+
+        for key, block_questions in zip(completed, segments):
+            zakon_index, _, block_index = key.partition('_')
+            self.add_block(int(zakon_index), int(block_index), block_questions)
+        print(f"Imported {len(questions)} questions of {len(completed)} blocks from {self.legacy_questions_file}")
+
+    def fill_blocks(self):
+        """Give questions journaled before blocks were recorded their block from the structure"""
+        for zakon in self.structure or []:
+            for block in zakon['blocks']:
+                for q in self.blocks.get(block_key(zakon['index'], block['index']), ()):
+                    if 'block_id' not in q:
+                        q['block_id'] = str(block['num'])
+                        q['block_name'] = block['name'] or ''
+
+    def is_completed(self, zakon_index, block_index):
+        return block_key(zakon_index, block_index) in self.blocks
+
+    def add_block(self, zakon_index, block_index, questions):
+        key = block_key(zakon_index, block_index)
+        self.journal.append({
+            'key': key,
+            'zakon_index': zakon_index,
+            'block_index': block_index,
+            'questions': questions,
+        })
+        self.blocks[key] = questions
+
+    def set_structure(self, structure):
+        """Cache the discovered zakon/block structure for resumed runs"""
+        self.journal.append({'type': 'structure', 'structure': structure})
+        self.structure = structure
+
+    def zakon_blocks(self):
+        """Map of zakon index to block count from the cached structure"""
+        return {zakon['index']: len(zakon['blocks']) for zakon in self.structure or []}
+
+    def pending_jobs(self, structure):
+        return [(zakon['index'], block['index'])
+                for zakon in structure
+                for block in zakon['blocks']
+                if not self.is_completed(zakon['index'], block['index'])]
+
+    def questions(self):
+        for questions in self.blocks.values():
+            yield from questions
+
+    def question_count(self):
+        return sum(len(questions) for questions in self.blocks.values())
+
+    def save_checkpoint(self):
+        """Atomically write a summary of the progress"""
+        write_json_atomic(self.checkpoint_file, {
+            'completed': list(self.blocks),
+            'total_questions': self.question_count(),
+            'zakon_blocks': self.zakon_blocks(),
+        })
@@ -0,0 +1,274 @@
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    user_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    correct INTEGER NOT NULL,
+    answered_at REAL NOT NULL,
+    PRIMARY KEY (user_id, event_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS question_stats (
+    user_id TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    block TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    last_correct INTEGER NOT NULL,
+    last_answered_at REAL NOT NULL,
+    PRIMARY KEY (user_id, question_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS block_stats (
+    user_id TEXT NOT NULL,
+    block TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    mistakes INTEGER NOT NULL,
+    PRIMARY KEY (user_id, block)
+) WITHOUT ROWID;
+
+CREATE TEMP TABLE IF NOT EXISTS incoming (
+    user_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    block TEXT NOT NULL,
+    correct INTEGER NOT NULL,
+    answered_at REAL NOT NULL,
+    PRIMARY KEY (user_id, event_id)
+);
+
+CREATE TEMP TABLE IF NOT EXISTS batch (
+    user_id TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    block TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    last_correct INTEGER NOT NULL,
+    last_answered_at REAL NOT NULL
+);
+"""
+
+# New events only (a re-sent event is skipped), coalesced to one row per
+# user and question. With MAX() SQLite takes the bare column `correct` from
+# the row of the latest answer.
+COALESCE_SQL = """
+INSERT INTO batch
+SELECT user_id, question_id, block, COUNT(*), SUM(correct), correct, MAX(answered_at)
+FROM incoming AS i
+WHERE NOT EXISTS (SELECT 1 FROM events AS e WHERE e.user_id = i.user_id AND e.event_id = i.event_id)
+GROUP BY user_id, question_id
+"""
+
+# Block aggregates move by the batch totals. A question counts as a mistake
+# while its latest answer is wrong, so the mistake count changes by the
+# difference between the question's state before and after the batch.
+# Answers synced late (older than the stored one) don't change that state.
+BLOCK_SQL = """
+INSERT INTO block_stats (user_id, block, total, correct, mistakes)
+SELECT b.user_id, b.block, SUM(b.attempts), SUM(b.correct),
+       SUM((CASE WHEN q.last_answered_at IS NULL OR b.last_answered_at >= q.last_answered_at
+                 THEN b.last_correct ELSE q.last_correct END) = 0)
+       - SUM(COALESCE(q.last_correct, 1) = 0)
+FROM batch AS b
+LEFT JOIN question_stats AS q ON q.user_id = b.user_id AND q.question_id = b.question_id
+WHERE true
+GROUP BY b.user_id, b.block
+ON CONFLICT (user_id, block) DO UPDATE SET
+    total = total + excluded.total,
+    correct = correct + excluded.correct,
+    mistakes = mistakes + excluded.mistakes
+"""
+
+QUESTION_SQL = """
+INSERT INTO question_stats
+SELECT user_id, question_id, block, attempts, correct, last_correct, last_answered_at FROM batch WHERE true
+ON CONFLICT (user_id, question_id) DO UPDATE SET
+    attempts = attempts + excluded.attempts,
+    correct = correct + excluded.correct,
+    last_correct = CASE WHEN excluded.last_answered_at >= last_answered_at
+                        THEN excluded.last_correct ELSE last_correct END,
+    last_answered_at = MAX(last_answered_at, excluded.last_answered_at)
+"""
+
+EVENTS_SQL = """
+INSERT OR IGNORE INTO events
+SELECT user_id, event_id, question_id, correct, answered_at FROM incoming
+"""
+
+
+def connect(path):
+    connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    # In WAL mode NORMAL only risks the last commits on power loss, never corruption
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.execute('PRAGMA busy_timeout=5000')
+    return connection
+
+
+class ProgressStore:
+    """Answer events of every user plus aggregates kept up to date on write.
+
+    Events are (user_id, event_id, question_id, block, correct, answered_at)
+    tuples; event ids come from the client, so a re-sent batch is applied
+    once. Every write() is one transaction that coalesces its events per
+    question and moves the question and block aggregates by the batch totals,
+    so reads never scan the event log.
+    """
+    def __init__(self, path='progress.sqlite'):
+        self.path = path
+        self.connection = connect(path)
+        self.connection.executescript(SCHEMA)
+        # Readers get their own connection, WAL lets them run next to a write.
+        # Reads run on worker threads, one at a time on this connection.
+        self.reader = connect(path)
+        self.read_lock = threading.Lock()
+
+    def write(self, events):
+        """Apply a batch of events; return how many were new"""
+        if not events:
+            return 0
+        db = self.connection
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany('INSERT OR IGNORE INTO incoming VALUES (?, ?, ?, ?, ?, ?)', events)
+            db.execute(COALESCE_SQL)
+            db.execute(BLOCK_SQL)
+            db.execute(QUESTION_SQL)
+            applied = db.execute(EVENTS_SQL).rowcount
+            db.execute('DELETE FROM incoming')
+            db.execute('DELETE FROM batch')
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return applied
+
+    def read(self, *queries):
+        """Rows of every (sql, params) query, all read from one snapshot of the database"""
+        with self.read_lock:
+            self.reader.execute('BEGIN')
+            try:
+                return [self.reader.execute(sql, params).fetchall() for sql, params in queries]
+            finally:
+                self.reader.execute('COMMIT')
+
+    def progress(self, user_id):
+        """Per-block totals of one user with the ids of the questions last answered wrong"""
+        block_rows, mistake_rows = self.read(
+            ('SELECT block, total, correct, mistakes FROM block_stats WHERE user_id = ?', (user_id,)),
+            ('SELECT block, question_id FROM question_stats WHERE user_id = ? AND last_correct = 0 '
+             'ORDER BY last_answered_at', (user_id,)))
+        blocks = {}
+        for block, total, correct, mistakes in block_rows:
+            blocks[block] = {'total': total, 'correct': correct, 'mistakes': mistakes, 'incorrectIds': []}
+        for block, question_id in mistake_rows:
+            blocks[block]['incorrectIds'].append(question_id)
+        return {'user_id': user_id, 'blocks': blocks}
+
+    def answers(self, user_id):
+        """(question_id, correct, answered_at) of every answer of one user, oldest first"""
+        rows, = self.read(('SELECT question_id, correct, answered_at FROM events WHERE user_id = ? '
+                           'ORDER BY answered_at', (user_id,)))
+        return rows
+
+    def cohort(self):
+        """Totals of every block over all users"""
+        rows, = self.read(
+            ('SELECT block, COUNT(*), SUM(total), SUM(correct), SUM(mistakes) FROM block_stats GROUP BY block', ()))
+        return {
+            block: {'users': users, 'total': total, 'correct': correct, 'mistakes': mistakes,
+                    'accuracy': round(correct / total, 4) if total else 0.0}
+            for block, users, total, correct, mistakes in rows
+        }
+
+    def recompute(self):
+        """Block aggregates rebuilt from the event log, to check the incremental ones"""
+        rows, mistake_rows = self.read(("""
+            SELECT e.user_id, q.block, COUNT(*), SUM(e.correct)
+            FROM events AS e JOIN question_stats AS q ON q.user_id = e.user_id AND q.question_id = e.question_id
+            GROUP BY e.user_id, q.block
+        """, ()), ('SELECT user_id, block, SUM(last_correct = 0) FROM question_stats GROUP BY user_id, block', ()))
+        blocks = {(user_id, block): [total, correct, 0] for user_id, block, total, correct in rows}
+        for user_id, block, mistakes in mistake_rows:
+            blocks[(user_id, block)][2] = mistakes
+        return blocks
+
+    def stored(self):
+        rows, = self.read(('SELECT user_id, block, total, correct, mistakes FROM block_stats', ()))
+        return {(user_id, block): [total, correct, mistakes] for user_id, block, total, correct, mistakes in rows}
+
+    def close(self):
+        self.reader.close()
+        self.connection.close()
+
+
+def make_event(user_id, question_id, block, correct, answered_at=None, event_id=None):
+    return (user_id, event_id or uuid.uuid4().hex, question_id, block, int(bool(correct)),
+            float(answered_at if answered_at is not None else time.time()))
+
+
+class BatchWriter:
+    """Group commit for concurrent requests.
+
+    Requests hand their events to submit() and wait; a single task collects
+    whatever arrived within max_delay (or up to max_batch events) and writes
+    it in one transaction on a worker thread, so the event loop never blocks
+    on SQLite and many small syncs cost one commit.
+    """
+    def __init__(self, store, max_batch=5000, max_delay=0.01):
+        self.store = store
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.pending = []
+        self.pending_events = 0
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.commits = 0
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def submit(self, events):
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((events, future))
+        self.pending_events += len(events)
+        self.wakeup.set()
+        return await future
+
+    async def run(self):
+        while True:
+            await self.wakeup.wait()
+            if self.pending_events < self.max_batch:
+                await asyncio.sleep(self.max_delay)
+            self.wakeup.clear()
+            batch, self.pending, self.pending_events = self.pending, [], 0
+            events = [event for events, _ in batch for event in events]
+            try:
+                await asyncio.to_thread(self.store.write, events)
+                self.commits += 1
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
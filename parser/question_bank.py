@@ -0,0 +1,263 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from collections.abc import Mapping
+
+from dedup import question_id
+from exporters import iter_questions
+
+# Fields of a record in the order the scraper writes them
+FIELDS = ('theme_id', 'theme_name', 'block_id', 'block_name', 'question_number', 'question', 'answers',
+          'correct_answer', 'article', 'correct_answer_text', 'id')
+# Fields stored as an index into the string table
+STRING_FIELDS = tuple(field for field in FIELDS if field not in ('question_number', 'answers'))
+# Index of a field the record does not have, and of one it has with the value None
+MISSING = 0xFFFFFFFF
+NULL = 0xFFFFFFFE
+
+SNAPSHOT_MAGIC = b'QBNK'
+SNAPSHOT_VERSION = 2
+# magic, version, byte order, records, answer options, strings, UTF-8 bytes
+SNAPSHOT_HEADER = struct.Struct('<4sHHIIII')
+
+
+class StringTable:
+    """Every distinct string once, handed out by index"""
+    def __init__(self):
+        self.strings = []
+        self.index = {}
+
+    def add(self, text):
+        if text is None:
+            return NULL
+        text = str(text)
+        position = self.index.get(text)
+        if position is None:
+            position = self.index[text] = len(self.strings)
+            self.strings.append(sys.intern(text))
+        return position
+
+
+class MappedStrings:
+    """Strings of a snapshot, decoded from the mapped UTF-8 block on first use"""
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+        self.decoded = {}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        text = self.decoded.get(position)
+        if text is None:
+            text = self.decoded[position] = sys.intern(
+                str(self.blob[self.offsets[position]:self.offsets[position + 1]], 'utf-8'))
+        return text
+
+
+class Question(Mapping):
+    """One record of a QuestionBank.
+
+    A view of two slots (bank and row) instead of a dict per record; fields
+    are read from the bank's columns. It is a read-only mapping with the
+    keys the scraped record had, None values included, so code written for
+    dicts (q['question'], q.get('block_id'), {**q}) works unchanged.
+    """
+    __slots__ = ('bank', 'row')
+
+    def __init__(self, bank, row):
+        self.bank = bank
+        self.row = row
+
+    def __getitem__(self, field):
+        if not self.bank.has(self.row, field):
+            raise KeyError(field)
+        return self.bank.value(self.row, field)
+
+    def __iter__(self):
+        return (field for field in FIELDS if self.bank.has(self.row, field))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __getattr__(self, field):
+        if field in FIELDS:
+            return self.bank.value(self.row, field)
+        raise AttributeError(field)
+
+    def __repr__(self):
+        return f"Question({self.bank.value(self.row, 'id')!r})"
+
+    def to_dict(self):
+        return {field: self.bank.value(self.row, field) for field in self}
+
+
+class QuestionBank:
+    """The bank as uint32 columns over one table of interned strings.
+
+    Every string field is an index into the table, so a theme name or a
+    common answer option is stored once however many records use it.
+    Answer options are flattened into key and text columns located through
+    an offset column. A bank is built from JSON or loaded from a binary
+    snapshot; loading maps the file and decodes strings only when read.
+    """
+    def __init__(self, strings, columns, answer_offsets, answer_keys, answer_texts):
+        self.strings = strings
+        self.columns = columns
+        self.answer_offsets = answer_offsets
+        self.answer_keys = answer_keys
+        self.answer_texts = answer_texts
+        self.mapped = None
+
+    @classmethod
+    def build(cls, questions):
+        """Bank of the records; records with an id already seen are skipped"""
+        table = StringTable()
+        columns = {field: array('I') for field in STRING_FIELDS + ('question_number',)}
+        answer_offsets, answer_keys, answer_texts = array('I', [0]), array('I'), array('I')
+        seen = set()
+        for q in questions:
+            qid = question_id(q)
+            if qid in seen:
+                continue
+            seen.add(qid)
+            for field in STRING_FIELDS:
+                if field == 'id':
+                    columns[field].append(table.add(qid))
+                else:
+                    columns[field].append(table.add(q[field]) if field in q else MISSING)
+            number = q.get('question_number', MISSING)
+            columns['question_number'].append(NULL if number is None else number)
+            for key, text in (q.get('answers') or {}).items():
+                answer_keys.append(table.add(key))
+                answer_texts.append(table.add(text))
+            answer_offsets.append(len(answer_keys))
+        return cls(table.strings, columns, answer_offsets, answer_keys, answer_texts)
+
+    def __len__(self):
+        return len(self.answer_offsets) - 1
+
+    def __getitem__(self, row):
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return Question(self, row)
+
+    def __iter__(self):
+        return (Question(self, row) for row in range(len(self)))
+
+    def has(self, row, field):
+        """Whether the record has the field (its value may be None)"""
+        if field == 'answers':
+            return True
+        column = self.columns.get(field)
+        return column is not None and column[row] != MISSING
+
+    def value(self, row, field):
+        if field == 'answers':
+            start, end = self.answer_offsets[row], self.answer_offsets[row + 1]
+            strings = self.strings
+            return {strings[key]: strings[text] for key, text
+                    in zip(self.answer_keys[start:end], self.answer_texts[start:end])}
+        column = self.columns.get(field)
+        if column is None:
+            return None
+        position = column[row]
+        if position >= NULL:
+            return None
+        return position if field == 'question_number' else self.strings[position]
+
+    def ids(self):
+        return [self.strings[position] for position in self.columns['id']]
+
+    def write_snapshot(self, path):
+        """Write the bank as a binary snapshot load_snapshot can map"""
+        encoded = [text.encode('utf-8') for text in self.strings]
+        offsets = array('I', [0])
+        for data in encoded:
+            offsets.append(offsets[-1] + len(data))
+        byteorder = 1 if sys.byteorder == 'little' else 2
+        with open(path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, byteorder, len(self),
+                                         len(self.answer_keys), len(encoded), offsets[-1]))
+            f.write(offsets.tobytes())
+            for field in STRING_FIELDS + ('question_number',):
+                f.write(array('I', self.columns[field]).tobytes())
+            for column in (self.answer_offsets, self.answer_keys, self.answer_texts):
+                f.write(array('I', column).tobytes())
+            f.write(b''.join(encoded))
+
+    @classmethod
+    def load_snapshot(cls, path):
+        """Map a snapshot; columns are read in place and strings decoded on first use"""
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, byteorder, rows, options, string_count, blob_size = SNAPSHOT_HEADER.unpack_from(mapped)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is not a question bank snapshot (version {SNAPSHOT_VERSION})")
+        if byteorder != (1 if sys.byteorder == 'little' else 2):
+            raise ValueError(f"{path} was written on a machine with the other byte order, rebuild it")
+
+        view = memoryview(mapped)
+        position = SNAPSHOT_HEADER.size
+
+        def take(count):
+            nonlocal position
+            end = position + 4 * count
+            column = view[position:end].cast('I')
+            position = end
+            return column
+
+        offsets = take(string_count + 1)
+        columns = {field: take(rows) for field in STRING_FIELDS + ('question_number',)}
+        answer_offsets, answer_keys, answer_texts = take(rows + 1), take(options), take(options)
+        strings = MappedStrings(view[position:position + blob_size], offsets)
+        bank = cls(strings, columns, answer_offsets, answer_keys, answer_texts)
+        bank.mapped = mapped
+        return bank
+
+
+def is_snapshot(path):
+    with open(path, 'rb') as f:
+        return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+
+def load_bank(path):
+    """QuestionBank of a JSON bank (flat or tree) or of a binary snapshot"""
+    if is_snapshot(path):
+        return QuestionBank.load_snapshot(path)
+    return QuestionBank.build(iter_questions(path))
+
+
+def load_questions(path):
+    """Records of a bank file: the mapped bank of a snapshot, plain dicts of JSON.
+
+    Building the columns from JSON is slower than json.load at any bank size
+    and only saves memory on banks far larger than today's, so JSON is not
+    loaded into a QuestionBank here.
+    """
+    if is_snapshot(path):
+        return QuestionBank.load_snapshot(path)
+    return list(iter_questions(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile the question bank into a binary snapshot')
+    parser.add_argument('json_file', nargs='?', default='all_questions.json')
+    parser.add_argument('--out', default='all_questions.qbank')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    bank = load_bank(args.json_file)
+    bank.write_snapshot(args.out)
+    size = os.path.getsize(args.out)
+    print(f"Wrote {len(bank)} questions with {len(bank.strings)} distinct strings to {args.out} "
+          f"({size:,} bytes) in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,518 @@
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import random
+import re
+import time
+from functools import lru_cache
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from build_bank import DEFAULT_BLOCK_ID, DEFAULT_BLOCK_NAME, compact_json
+from dedup import question_id
+from progress_store import BatchWriter, ProgressStore, make_event
+from question_bank import load_questions
+from spaced_repetition import ReviewBank, ReviewScheduler
+from tickets import ShortTicketError, TicketGenerator
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+MIN_GZIP_BYTES = 1024
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+DEFAULT_TICKET_SIZE = 20
+KEEP_ALIVE_TIMEOUT = 15
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or status.phrase)
+        self.status = status
+
+
+def answer_items(answers):
+    return sorted(answers.items(), key=lambda item: int(item[0]) if item[0].isdigit() else 0)
+
+
+def json_object(fields, items):
+    """JSON text of an object with plain fields plus a 'questions' list of pre-encoded items"""
+    return compact_json(fields)[:-1] + ',"questions":[' + ','.join(items) + ']}'
+
+
+class QuestionStore:
+    """The bank in memory, indexed by id, theme, block and article.
+
+    Questions are kept once, the indexes only hold ids in bank order. The
+    public view of every question (without the correct answer, check()
+    reveals it) is encoded to JSON up front, responses are joined from it.
+    """
+    def __init__(self):
+        self.questions = {}
+        self.all_ids = []
+        self.public = {}
+        self.themes = {}
+        self.by_theme = {}
+        self.by_block = {}
+        self.by_article = {}
+        self.block_keys = {}
+        self.rng = random.Random()
+        self.tickets = None
+
+    def add(self, q):
+        qid = question_id(q)
+        if qid in self.questions:
+            return
+        theme_id = str(q['theme_id'])
+        block_id = str(q.get('block_id') or DEFAULT_BLOCK_ID)
+        self.questions[qid] = q
+        self.all_ids.append(qid)
+
+        theme = self.themes.get(theme_id)
+        if theme is None:
+            theme = self.themes[theme_id] = {'id': theme_id, 'name': q.get('theme_name', ''),
+                                             'count': 0, 'blocks': {}}
+        theme['count'] += 1
+        block = theme['blocks'].get(block_id)
+        if block is None:
+            block = theme['blocks'][block_id] = {'id': block_id, 'count': 0,
+                                                 'name': q.get('block_name') or DEFAULT_BLOCK_NAME}
+        block['count'] += 1
+        self.by_theme.setdefault(theme_id, []).append(qid)
+        self.by_block.setdefault((theme_id, block_id), []).append(qid)
+        self.block_keys[qid] = f"{theme_id}_{block_id}"
+        if q.get('article'):
+            self.by_article.setdefault((theme_id, str(q['article'])), []).append(qid)
+
+        self.public[qid] = compact_json({
+            'id': qid,
+            'theme_id': theme_id,
+            'block_id': block_id,
+            'question_number': q.get('question_number'),
+            'question': q.get('question', ''),
+            'answers': [{'id': answer_id, 'text': text} for answer_id, text in answer_items(q.get('answers', {}))],
+        })
+
+    @classmethod
+    def load(cls, json_file):
+        store = cls()
+        for q in load_questions(json_file):
+            store.add(q)
+        return store
+
+    def theme_list(self):
+        themes = sorted(self.themes.values(), key=lambda t: int(t['id']) if t['id'].isdigit() else 0)
+        return [{**theme, 'blocks': list(theme['blocks'].values())} for theme in themes]
+
+    def block_ids(self, theme_id, block_id):
+        ids = self.by_block.get((theme_id, block_id))
+        if ids is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No block {block_id} in theme {theme_id}")
+        return ids
+
+    def theme_ids(self, theme_id):
+        ids = self.by_theme.get(theme_id)
+        if ids is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No theme {theme_id}")
+        return ids
+
+    def page(self, ids, page, per_page):
+        """JSON text of one page of questions"""
+        start = (page - 1) * per_page
+        fields = {'page': page, 'per_page': per_page, 'total': len(ids),
+                  'pages': (len(ids) + per_page - 1) // per_page}
+        return json_object(fields, [self.public[qid] for qid in ids[start:start + per_page]])
+
+    def ticket_generator(self):
+        """The TicketGenerator over the bank, built on first use (it groups near-duplicate stems)"""
+        if self.tickets is None:
+            self.tickets = TicketGenerator(self.questions.values())
+        return self.tickets
+
+    def ticket(self, theme_id=None, size=DEFAULT_TICKET_SIZE, seed=None):
+        """JSON text of a ticket of a theme, or of the whole bank spread over themes and blocks"""
+        if theme_id:
+            self.theme_ids(theme_id)
+        generator = self.ticket_generator()
+        rng = self.rng if seed is None else random.Random(seed)
+        try:
+            positions = generator.draw(rng, size, theme_id or None)
+        except ShortTicketError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+        return json_object({'seed': seed, 'theme_id': theme_id},
+                           [self.public[generator.ids[position]] for position in positions])
+
+    def check(self, qid, answer):
+        q = self.questions.get(qid)
+        if q is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No question {qid}")
+        correct = q.get('correct_answer')
+        return {
+            'id': qid,
+            'correct': answer is not None and str(answer) == correct,
+            'correct_answer': correct,
+            'article': q.get('article', ''),
+        }
+
+
+def int_param(query, name, default, low, high):
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer")
+    if not low <= value <= high:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be between {low} and {high}")
+    return value
+
+
+class Response:
+    """A JSON body with its ETag and a gzipped copy made on first use.
+
+    Cached responses are compressed once, so they get a higher level than
+    the ones built for a single request.
+    """
+    __slots__ = ('status', 'body', 'etag', 'cacheable', 'compressed')
+
+    def __init__(self, text, status=HTTPStatus.OK, cacheable=True):
+        self.status = status
+        self.body = text.encode('utf-8')
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=8).hexdigest() + '"'
+        self.cacheable = cacheable
+        self.compressed = None
+
+    @property
+    def compressible(self):
+        return len(self.body) >= MIN_GZIP_BYTES
+
+    def gzipped(self):
+        if self.compressed is None:
+            self.compressed = gzip.compress(self.body, 6 if self.cacheable else 1, mtime=0)
+        return self.compressed
+
+
+class QuizAPI:
+    """Routes of the quiz API; GET responses are rendered once and cached.
+
+    GET /api/themes
+    GET /api/themes/{theme}/blocks/{block}/questions?page=&per_page=
+    GET /api/questions/{id}
+    GET /api/articles/{theme}/{article}
+    GET /api/ticket?theme=&size=&seed=     (no seed: a fresh random ticket)
+    POST /api/check  {"id": ..., "answer": ...} or a list of those
+    """
+    ROUTES = [
+        (re.compile(r'^/api/themes$'), 'themes'),
+        (re.compile(r'^/api/themes/([^/]+)/blocks/([^/]+)/questions$'), 'block_questions'),
+        (re.compile(r'^/api/questions/([^/]+)$'), 'question'),
+        (re.compile(r'^/api/articles/([^/]+)/([^/]+)$'), 'article'),
+        (re.compile(r'^/api/ticket$'), 'ticket'),
+    ]
+
+    def __init__(self, store, cache_size=4096):
+        self.store = store
+        self.render = lru_cache(maxsize=cache_size)(self.render_uncached)
+
+    def get(self, target):
+        parts = urlsplit(target)
+        query = parse_qs(parts.query)
+        if parts.path == '/api/ticket' and 'seed' not in query:
+            # Random tickets differ on every request and are not cached
+            return Response(self.ticket(query), cacheable=False)
+        # Normalize the query so equal requests share one cache entry
+        return self.render(parts.path, tuple(sorted((k, tuple(v)) for k, v in query.items())))
+
+    def render_uncached(self, path, query):
+        query = dict(query)
+        for pattern, name in self.ROUTES:
+            match = pattern.match(path)
+            if match:
+                args = [unquote(arg) for arg in match.groups()]
+                return Response(getattr(self, name)(query, *args))
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route {path}")
+
+    def themes(self, query):
+        return compact_json({'total': len(self.store.questions), 'themes': self.store.theme_list()})
+
+    def block_questions(self, query, theme_id, block_id):
+        ids = self.store.block_ids(theme_id, block_id)
+        per_page = int_param(query, 'per_page', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        page = int_param(query, 'page', 1, 1, max(1, (len(ids) + per_page - 1) // per_page))
+        return self.store.page(ids, page, per_page)
+
+    def question(self, query, qid):
+        public = self.store.public.get(qid)
+        if public is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No question {qid}")
+        return public
+
+    def article(self, query, theme_id, article):
+        ids = self.store.by_article.get((theme_id, article))
+        if ids is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No questions cite article {article} of theme {theme_id}")
+        return compact_json({'theme_id': theme_id, 'article': article, 'ids': ids})
+
+    def ticket(self, query):
+        theme_id = (query.get('theme') or [None])[0]
+        size = int_param(query, 'size', DEFAULT_TICKET_SIZE, 1, MAX_PAGE_SIZE)
+        seed = int_param(query, 'seed', None, 0, 2 ** 63) if 'seed' in query else None
+        return self.store.ticket(theme_id, size, seed)
+
+    def post(self, target, body):
+        if urlsplit(target).path != '/api/check':
+            raise HTTPError(HTTPStatus.NOT_FOUND)
+        try:
+            data = json.loads(body or b'null')
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Body is not JSON')
+        items = data if isinstance(data, list) else [data]
+        if not all(isinstance(item, dict) and 'id' in item for item in items):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Expected {"id": ..., "answer": ...} or a list of those')
+        results = [self.store.check(str(item['id']), item.get('answer')) for item in items]
+        return Response(compact_json(results if isinstance(data, list) else results[0]), cacheable=False)
+
+
+class ProgressAPI:
+    """Answer history of every user, stored through a ProgressStore.
+
+    GET /api/progress                 totals of every block over all users
+    GET /api/progress/{user}          the user's blocks with their mistakes
+    GET /api/progress/{user}/next?theme=&block=&limit=
+                                      the user's review order (spaced_repetition)
+    POST /api/progress/{user}/sync    {"events": [{"id", "question_id", "answer", "answered_at"}, ...]}
+
+    Sync answers with the user's progress once the events are committed.
+    Answers are graded here, and events for questions no longer in the bank
+    are skipped so an old client queue can always drain. The review order
+    comes from a ReviewScheduler fed the user's stored answers, so it needs
+    no scheduler state besides the event log.
+    """
+    ROUTE = re.compile(r'^/api/progress(?:/([A-Za-z0-9_-]{1,64})(/sync|/next)?)?$')
+    MAX_EVENTS = 1000
+
+    def __init__(self, store, progress, writer):
+        self.store = store
+        self.progress = progress
+        self.writer = writer
+
+    def matches(self, path):
+        return path == '/api/progress' or path.startswith('/api/progress/')
+
+    def parse_events(self, user_id, body):
+        try:
+            data = json.loads(body or b'null')
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Body is not JSON')
+        items = data.get('events') if isinstance(data, dict) else None
+        if not isinstance(items, list) or len(items) > self.MAX_EVENTS:
+            raise HTTPError(HTTPStatus.BAD_REQUEST,
+                            f'Expected {{"events": [...]}} with at most {self.MAX_EVENTS} events')
+        now = time.time()
+        events = []
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(item.get('id'), str) or len(item['id']) > 64:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, 'Every event needs a string id')
+            qid = str(item.get('question_id'))
+            if qid not in self.store.questions:
+                continue
+            answered_at = item.get('answered_at')
+            if not isinstance(answered_at, (int, float)) or answered_at > now + 60:
+                answered_at = now
+            correct = self.store.check(qid, item.get('answer'))['correct']
+            events.append(make_event(user_id, qid, self.store.block_keys[qid], correct, answered_at, item['id']))
+        return len(items), events
+
+    def review_order(self, user_id, query):
+        """Due reviews (most overdue first), new questions in bank order, then the scheduled ones"""
+        theme_id = (query.get('theme') or [None])[0]
+        block_id = (query.get('block') or [None])[0]
+        if block_id is not None:
+            ids = self.store.block_ids(theme_id, block_id)
+        elif theme_id is not None:
+            ids = self.store.theme_ids(theme_id)
+        else:
+            ids = self.store.all_ids
+        limit = int_param(query, 'limit', DEFAULT_PAGE_SIZE, 1, max(1, len(ids)))
+        scheduler = ReviewScheduler.from_answers(ReviewBank(ids), self.progress.answers(user_id))
+        now = time.time()
+        return {'user_id': user_id, 'due': scheduler.due_count(now), 'order': scheduler.review_order(now, limit)}
+
+    async def handle(self, method, target, body):
+        parts = urlsplit(target)
+        match = self.ROUTE.match(parts.path)
+        if match is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No route {parts.path}")
+        user_id, action = match.groups()
+        if action == '/next':
+            if method not in ('GET', 'HEAD'):
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+            result = await asyncio.to_thread(self.review_order, user_id, parse_qs(parts.query))
+        elif action == '/sync':
+            if method != 'POST':
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+            received, events = self.parse_events(user_id, body)
+            await self.writer.submit(events)
+            result = await asyncio.to_thread(self.progress.progress, user_id)
+            result.update(received=received, skipped=received - len(events))
+        elif method not in ('GET', 'HEAD'):
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+        elif user_id is None:
+            result = await asyncio.to_thread(self.progress.cohort)
+        else:
+            result = await asyncio.to_thread(self.progress.progress, user_id)
+        return Response(compact_json(result), cacheable=False)
+
+
+class QuizServer:
+    """HTTP/1.1 with keep-alive on asyncio streams, just enough for the API"""
+    def __init__(self, api, cors=True, progress=None):
+        self.api = api
+        self.cors = cors
+        self.progress = progress
+        self.requests = 0
+
+    async def read_request(self, reader):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ')
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Malformed request line')
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Bad Content-Length')
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        body = await reader.readexactly(length) if length else b''
+        return method, target, version, headers, body
+
+    async def respond(self, method, target, headers, body):
+        if self.progress is not None and self.progress.matches(urlsplit(target).path) and method != 'OPTIONS':
+            return await self.progress.handle(method, target, body)
+        if method in ('GET', 'HEAD'):
+            return self.api.get(target)
+        if method == 'POST':
+            return self.api.post(target, body)
+        if method == 'OPTIONS':
+            return None
+        raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+
+    def encode(self, response, method, headers, keep_alive):
+        extra = []
+        if self.cors:
+            extra.append('Access-Control-Allow-Origin: *')
+            extra.append('Access-Control-Allow-Headers: Content-Type, If-None-Match')
+        if response is None:
+            status, payload = HTTPStatus.NO_CONTENT, b''
+            extra.append('Access-Control-Allow-Methods: GET, POST, OPTIONS')
+        elif response.cacheable and headers.get('if-none-match') == response.etag:
+            status, payload = HTTPStatus.NOT_MODIFIED, b''
+            extra.append(f"ETag: {response.etag}")
+        else:
+            status, payload = response.status, response.body
+            extra.append('Content-Type: application/json; charset=utf-8')
+            if response.cacheable:
+                extra.append(f"ETag: {response.etag}")
+                extra.append('Cache-Control: no-cache')
+            else:
+                extra.append('Cache-Control: no-store')
+            if response.compressible:
+                extra.append('Vary: Accept-Encoding')
+                if 'gzip' in headers.get('accept-encoding', ''):
+                    payload = response.gzipped()
+                    extra.append('Content-Encoding: gzip')
+        head = [f"HTTP/1.1 {status.value} {status.phrase}", f"Content-Length: {len(payload)}",
+                f"Connection: {'keep-alive' if keep_alive else 'close'}", *extra]
+        data = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1')
+        return data if method == 'HEAD' else data + payload
+
+    def error(self, e):
+        return Response(compact_json({'error': str(e)}), status=e.status, cacheable=False)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                keep_alive = False
+                method, headers = 'GET', {}
+                try:
+                    request = await self.read_request(reader)
+                    if request is None:
+                        break
+                    method, target, version, headers, body = request
+                    keep_alive = (headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1')
+                    response = await self.respond(method, target, headers, body)
+                except HTTPError as e:
+                    response = self.error(e)
+                except Exception as e:
+                    print(f"Error handling request: {e!r}")
+                    response = self.error(HTTPError(HTTPStatus.INTERNAL_SERVER_ERROR))
+                self.requests += 1
+                writer.write(self.encode(response, method, headers, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host, port):
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES, backlog=1024)
+
+
+def make_server(json_file, cache_size=4096, progress_db=None):
+    """Load the bank and build the server; progress routes need a SQLite file"""
+    started = time.perf_counter()
+    store = QuestionStore.load(json_file)
+    store.ticket_generator()
+    print(f"Loaded {len(store.questions)} questions in {len(store.themes)} themes "
+          f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+    progress = None
+    if progress_db:
+        progress_store = ProgressStore(progress_db)
+        progress = ProgressAPI(store, progress_store, BatchWriter(progress_store))
+        print(f"Storing progress in {progress_db}")
+    return QuizServer(QuizAPI(store, cache_size), progress=progress)
+
+
+async def serve(server, host, port):
+    listener = await server.start(host, port)
+    print(f"Serving on http://{host}:{port}/api/themes")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the question bank as a JSON API')
+    parser.add_argument('json_file', nargs='?', default='all_questions.json')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--cache-size', type=int, default=4096, help='rendered GET responses kept in memory')
+    parser.add_argument('--progress', metavar='DB', help='store user progress in this SQLite file')
+    args = parser.parse_args()
+
+    server = make_server(args.json_file, args.cache_size, args.progress)
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except OSError as e:
+        raise SystemExit(f"Cannot listen on {args.host}:{args.port}: {e.strerror}")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import json
+import threading
+import time
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+from instrumentation import metrics
+
+# Seconds to wait for each step before giving up
+DEFAULT_TIMEOUTS = {
+    'page_load': 20,
+    'click': 10,
+    'element': 10,
+    'zakon_choice': 10,
+    'block_choice': 10,
+    'quiz_ready': 15,
+}
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20)
+
+
+class LatencyHistogram:
+    """Thread-safe per-step latency histogram"""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.steps = {}
+        self.lock = threading.Lock()
+
+    def observe(self, step, seconds, ok=True):
+        """Record how long one step took"""
+        with self.lock:
+            data = self.steps.get(step)
+            if data is None:
+                data = {
+                    'counts': [0] * (len(self.buckets) + 1),
+                    'count': 0,
+                    'timeouts': 0,
+                    'total': 0.0,
+                    'max': 0.0,
+                }
+                self.steps[step] = data
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    data['counts'][i] += 1
+                    break
+            else:
+                data['counts'][-1] += 1
+            data['count'] += 1
+            data['total'] += seconds
+            data['max'] = max(data['max'], seconds)
+            if not ok:
+                data['timeouts'] += 1
+
+    def to_dict(self):
+        with self.lock:
+            report = {}
+            for step, data in self.steps.items():
+                labels = [f"<={bound}s" for bound in self.buckets] + [f">{self.buckets[-1]}s"]
+                report[step] = {
+                    'count': data['count'],
+                    'timeouts': data['timeouts'],
+                    'total_seconds': round(data['total'], 3),
+                    'mean_seconds': round(data['total'] / data['count'], 3),
+                    'max_seconds': round(data['max'], 3),
+                    'buckets': dict(zip(labels, data['counts'])),
+                }
+            return report
+
+    def print_report(self):
+        """Print a compact per-step summary"""
+        report = self.to_dict()
+        if not report:
+            return
+        print("Step latency:")
+        for step, data in sorted(report.items(), key=lambda item: -item[1]['total_seconds']):
+            print(f"  {step:<14} n={data['count']:<5} mean={data['mean_seconds']:.3f}s "
+                  f"max={data['max_seconds']:.3f}s total={data['total_seconds']:.1f}s "
+                  f"timeouts={data['timeouts']}")
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+class ReadinessWaiter:
+    """Wait for real DOM/JS conditions instead of sleeping a fixed time"""
+    def __init__(self, driver, timeouts=None, histogram=None, poll_frequency=0.1):
+        self.driver = driver
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.histogram = histogram if histogram is not None else LatencyHistogram()
+        self.poll_frequency = poll_frequency
+
+    def until(self, step, condition, timeout=None):
+        """Wait until condition returns a truthy value; None on timeout"""
+        if timeout is None:
+            timeout = self.timeouts.get(step, self.timeouts['element'])
+        started = time.perf_counter()
+        try:
+            with metrics.span('wait', step=step):
+                result = WebDriverWait(self.driver, timeout, poll_frequency=self.poll_frequency).until(condition)
+            self.histogram.observe(step, time.perf_counter() - started)
+            return result
+        except Exception as e:
+            self.histogram.observe(step, time.perf_counter() - started, ok=False)
+            print(f"Timed out waiting for {step}: {e.__class__.__name__}")
+            return None
+
+    def js(self, step, expression, timeout=None):
+        """Wait for a JavaScript expression to become truthy"""
+        script = f"return !!({expression});"
+        return self.until(step, lambda driver: driver.execute_script(script), timeout)
+
+    def present(self, step, selector, by=By.CSS_SELECTOR, timeout=None):
+        return self.until(step, EC.presence_of_element_located((by, selector)), timeout)
+
+    def visible(self, step, selector, by=By.CSS_SELECTOR, timeout=None):
+        return self.until(step, EC.visibility_of_element_located((by, selector)), timeout)
+
+    def clickable(self, step, element_or_selector, by=By.CSS_SELECTOR, timeout=None):
+        if isinstance(element_or_selector, str):
+            element_or_selector = (by, element_or_selector)
+        return self.until(step, EC.element_to_be_clickable(element_or_selector), timeout)
+
+    def all_present(self, step, selector, by=By.CSS_SELECTOR, timeout=None):
+        """Wait until at least one element matches and return all matches"""
+        return self.until(step, lambda driver: driver.find_elements(by, selector) or False, timeout)
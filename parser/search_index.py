@@ -0,0 +1,171 @@
+import argparse
+import json
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from dedup import normalize_text, question_id
+from exporters import iter_questions
+
+MIN_TOKEN_LENGTH = 2
+SEARCH_FIELDS = ('question', 'article', 'correct_answer_text')
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def tokenize(text):
+    """Cyrillic-normalized words of a text: lowercase, ё folded into е, no markup or punctuation"""
+    return [token for token in normalize_text(text).split() if len(token) >= MIN_TOKEN_LENGTH]
+
+
+def to_base36(number):
+    digits = ''
+    while True:
+        number, digit = divmod(number, 36)
+        digits = DIGITS[digit] + digits
+        if not number:
+            return digits
+
+
+def encode_postings(positions):
+    """Sorted document positions as comma-separated base-36 gaps"""
+    previous = 0
+    gaps = []
+    for position in positions:
+        gaps.append(to_base36(position - previous))
+        previous = position
+    return ','.join(gaps)
+
+
+def decode_postings(encoded):
+    positions = []
+    position = 0
+    for gap in encoded.split(','):
+        position += int(gap, 36)
+        positions.append(position)
+    return positions
+
+
+class SearchIndex:
+    """Inverted index from normalized tokens to question ids.
+
+    Tokens are kept sorted, so every query word matches as a prefix and
+    "закон" finds "закона" and "законом" too. The dict form is plain JSON
+    with delta-encoded postings and is what the web app downloads.
+    """
+    def __init__(self, ids, themes, blocks, tokens, postings):
+        self.ids = ids
+        self.themes = themes
+        self.blocks = blocks
+        self.tokens = tokens
+        self.postings = postings
+        self.decoded = {}
+
+    @classmethod
+    def build(cls, questions):
+        ids, themes, blocks = [], [], []
+        seen = set()
+        inverted = {}
+        for q in questions:
+            qid = question_id(q)
+            if qid in seen:
+                continue
+            seen.add(qid)
+            position = len(ids)
+            ids.append(qid)
+            themes.append(str(q['theme_id']))
+            blocks.append(str(q.get('block_id') or '0'))
+            texts = [q.get(field) for field in SEARCH_FIELDS]
+            texts.extend(q.get('answers', {}).values())
+            for token in set(token for text in texts for token in tokenize(text)):
+                inverted.setdefault(token, []).append(position)
+        tokens = sorted(inverted)
+        return cls(ids, themes, blocks, tokens, [encode_postings(inverted[token]) for token in tokens])
+
+    def to_dict(self):
+        return {
+            'version': 1,
+            'ids': self.ids,
+            'themes': self.themes,
+            'blocks': self.blocks,
+            'tokens': self.tokens,
+            'postings': self.postings,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['ids'], data['themes'], data['blocks'], data['tokens'], data['postings'])
+
+    def positions(self, index):
+        positions = self.decoded.get(index)
+        if positions is None:
+            positions = self.decoded[index] = decode_postings(self.postings[index])
+        return positions
+
+    def prefix_matches(self, word):
+        """Document positions of every token starting with word"""
+        start = bisect_left(self.tokens, word)
+        end = bisect_left(self.tokens, word + '\uffff', start)
+        if end - start == 1:
+            return set(self.positions(start))
+        matches = set()
+        for index in range(start, end):
+            matches.update(self.positions(index))
+        return matches
+
+    def search(self, query, limit=None, theme_id=None):
+        """Ids of questions containing every word of the query (as a prefix), in bank order"""
+        words = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not words:
+            return []
+        result = None
+        for word in words:
+            matches = self.prefix_matches(word)
+            result = matches if result is None else result & matches
+            if not result:
+                return []
+        if theme_id is not None:
+            result = [position for position in result if self.themes[position] == str(theme_id)]
+        ids = [self.ids[position] for position in sorted(result)]
+        return ids[:limit] if limit else ids
+
+
+def build_index(json_file):
+    return SearchIndex.build(iter_questions(json_file))
+
+
+def load_index(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return SearchIndex.from_dict(json.load(f))
+
+
+def index_json(index):
+    return json.dumps(index.to_dict(), ensure_ascii=False, separators=(',', ':'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and query the full-text search index of the bank')
+    parser.add_argument('json_file', nargs='?', default='all_questions.json')
+    parser.add_argument('--out', help='write the index to this file')
+    parser.add_argument('--index', help='query an index file instead of building one')
+    parser.add_argument('--query', action='append', default=[], help='search for this text (repeatable)')
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = load_index(args.index) if args.index else build_index(args.json_file)
+    print(f"{len(index.ids)} questions, {len(index.tokens)} tokens "
+          f"({(time.perf_counter() - started) * 1000:.0f} ms to {'load' if args.index else 'build'})")
+
+    if args.out:
+        Path(args.out).write_text(index_json(index), encoding='utf-8')
+        print(f"Wrote {args.out} ({Path(args.out).stat().st_size:,} bytes)")
+
+    for query in args.query:
+        started = time.perf_counter()
+        ids = index.search(query)
+        elapsed = (time.perf_counter() - started) * 1e6
+        print(f"{query!r}: {len(ids)} questions in {elapsed:.0f} us: {', '.join(ids[:args.limit])}")
+
+
+if __name__ == "__main__":
+    main()
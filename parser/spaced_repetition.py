@@ -0,0 +1,257 @@
+import argparse
+import heapq
+import json
+import os
+import time
+
+from dedup import question_id
+from exporters import iter_questions
+from journal import write_json_atomic
+from progress_store import ProgressStore
+
+DAY = 86400
+RELEARN_DELAY = 10 * 60
+MIN_EASE = 1.3
+START_EASE = 2.5
+PASSING_GRADE = 3
+
+
+class Card:
+    """SM-2 state of one question for one learner"""
+    __slots__ = ('ease', 'interval', 'reps', 'lapses', 'due', 'last_review', 'version')
+
+    def __init__(self, ease=START_EASE, interval=0.0, reps=0, lapses=0, due=0.0, last_review=None):
+        self.ease = ease
+        self.interval = interval
+        self.reps = reps
+        self.lapses = lapses
+        self.due = due
+        self.last_review = last_review
+        self.version = 0
+
+    def review(self, grade, now):
+        """Apply an answer graded 0-5 (SM-2 quality) at time now"""
+        if grade >= PASSING_GRADE:
+            if self.reps == 0:
+                self.interval = 1.0
+            elif self.reps == 1:
+                self.interval = 6.0
+            else:
+                self.interval = round(self.interval * self.ease, 2)
+            self.reps += 1
+            self.due = now + self.interval * DAY
+        else:
+            # Forgotten: start over, but ask again within the same session
+            self.reps = 0
+            self.lapses += 1
+            self.interval = 0.0
+            self.due = now + RELEARN_DELAY
+        self.ease = max(MIN_EASE, self.ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+        self.last_review = now
+        self.version += 1
+
+    def to_list(self):
+        return [round(self.ease, 3), self.interval, self.reps, self.lapses, self.due, self.last_review]
+
+    @classmethod
+    def from_list(cls, values):
+        return cls(*values)
+
+
+def grade_answer(correct, slow=False):
+    """SM-2 grade of a quiz answer: wrong is 1, slow but right 3, right 4"""
+    if not correct:
+        return 1
+    return 3 if slow else 4
+
+
+class ReviewBank:
+    """Question ids in the order new questions are introduced, shared by all learners"""
+    def __init__(self, question_ids):
+        self.ids = tuple(dict.fromkeys(question_ids))
+        self.positions = {qid: i for i, qid in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, qid):
+        return qid in self.positions
+
+
+class ReviewScheduler:
+    """Review queue of one learner over a bank of question ids.
+
+    Reviewed questions sit in a heap ordered by due time. A review pushes a
+    new entry and bumps the card's version, older entries are dropped when
+    they surface, so every operation stays O(log n). Questions never seen
+    are served in bank order after the due ones and only get a Card once
+    answered, so a learner's state grows with their reviews, not the bank.
+    Pass one ReviewBank to all schedulers of a process to share the ids.
+    """
+    def __init__(self, bank, cards=None):
+        self.bank = bank if isinstance(bank, ReviewBank) else ReviewBank(bank)
+        self.cards = cards or {}
+        self.heap = []
+        self.counter = 0
+        self.new_position = 0
+        for qid, card in self.cards.items():
+            self.push(qid, card)
+
+    def push(self, qid, card):
+        self.counter += 1
+        heapq.heappush(self.heap, (card.due, self.counter, qid, card.version))
+
+    def is_live(self, entry):
+        due, _, qid, version = entry
+        card = self.cards.get(qid)
+        return card is not None and card.version == version and qid in self.bank
+
+    def due_reviews(self, now, limit):
+        """Ids of reviewed questions due at now, most overdue first"""
+        result = []
+        taken = []
+        while self.heap and len(result) < limit:
+            entry = heapq.heappop(self.heap)
+            if not self.is_live(entry):
+                continue
+            taken.append(entry)
+            if entry[0] > now:
+                break
+            result.append(entry[2])
+        for entry in taken:
+            heapq.heappush(self.heap, entry)
+        return result
+
+    def new_questions(self, limit):
+        """The next never-answered ids in bank order"""
+        result = []
+        ids = self.bank.ids
+        position = self.new_position
+        while position < len(ids) and len(result) < limit:
+            qid = ids[position]
+            if qid in self.cards:
+                if position == self.new_position:
+                    self.new_position += 1
+            else:
+                result.append(qid)
+            position += 1
+        return result
+
+    def next_due(self, now=None, limit=20, new_limit=None):
+        """Up to limit ids to ask next: due reviews first, then new questions"""
+        now = time.time() if now is None else now
+        result = self.due_reviews(now, limit)
+        if len(result) < limit:
+            new_count = limit - len(result)
+            if new_limit is not None:
+                new_count = min(new_count, new_limit)
+            result.extend(self.new_questions(new_count))
+        return result
+
+    def review(self, qid, grade, now=None):
+        now = time.time() if now is None else now
+        card = self.cards.get(qid)
+        if card is None:
+            card = self.cards[qid] = Card()
+        card.review(grade, now)
+        self.push(qid, card)
+        # Drop stale entries once they make up most of the heap
+        if len(self.heap) > 4 * len(self.cards) + 64:
+            self.compact()
+        return card
+
+    def compact(self):
+        self.heap = [entry for entry in self.heap if self.is_live(entry)]
+        heapq.heapify(self.heap)
+
+    def due_count(self, now=None):
+        now = time.time() if now is None else now
+        return sum(1 for qid, card in self.cards.items() if card.due <= now and qid in self.bank)
+
+    def review_order(self, now=None, limit=None):
+        """The full order the learner would see from now on, without answering anything"""
+        now = time.time() if now is None else now
+        live = sorted((card.due, qid) for qid, card in self.cards.items() if qid in self.bank)
+        order = [{'id': qid, 'due': due, 'status': 'due' if due <= now else 'scheduled'}
+                 for due, qid in live if due <= now]
+        order.extend({'id': qid, 'due': None, 'status': 'new'}
+                     for qid in self.bank.ids if qid not in self.cards)
+        order.extend({'id': qid, 'due': due, 'status': 'scheduled'}
+                     for due, qid in live if due > now)
+        return order[:limit] if limit else order
+
+    def to_dict(self):
+        return {'version': 1, 'cards': {qid: card.to_list() for qid, card in self.cards.items()}}
+
+    @classmethod
+    def from_dict(cls, bank, data):
+        cards = {qid: Card.from_list(values) for qid, values in (data or {}).get('cards', {}).items()}
+        return cls(bank, cards)
+
+    @classmethod
+    def from_answers(cls, bank, answers):
+        """Scheduler of a learner rebuilt by replaying (question_id, correct, answered_at) answers in time order"""
+        scheduler = cls(bank)
+        for qid, correct, answered_at in answers:
+            if qid in scheduler.bank:
+                scheduler.review(qid, grade_answer(correct), answered_at)
+        return scheduler
+
+
+def load_bank_ids(json_file):
+    """Question ids in bank order plus the theme of every id"""
+    ids = []
+    themes = {}
+    for q in iter_questions(json_file):
+        qid = question_id(q)
+        if qid not in themes:
+            ids.append(qid)
+            themes[qid] = str(q['theme_id'])
+    return ids, themes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the spaced-repetition review order of a learner')
+    parser.add_argument('json_file', nargs='?', default='all_questions.json')
+    parser.add_argument('--state', help='learner state saved by the scheduler (default: a new learner)')
+    parser.add_argument('--progress', metavar='DB',
+                        help="replay the answers of --user from the quiz server's progress store instead")
+    parser.add_argument('--user', help='user id in --progress')
+    parser.add_argument('--theme', action='append', dest='themes', metavar='ID',
+                        help='only schedule questions of this theme (repeatable)')
+    parser.add_argument('--limit', type=int, default=None, help='export only the first N entries')
+    parser.add_argument('--out', default='review_order.json')
+    args = parser.parse_args()
+    if bool(args.progress) != bool(args.user):
+        parser.error('--progress and --user go together')
+    if args.progress and args.state:
+        parser.error('use either --state or --progress')
+    if args.progress and not os.path.exists(args.progress):
+        parser.error(f"No progress store at {args.progress}")
+
+    ids, themes = load_bank_ids(args.json_file)
+    if args.themes:
+        ids = [qid for qid in ids if themes[qid] in set(args.themes)]
+    if args.progress:
+        store = ProgressStore(args.progress)
+        try:
+            scheduler = ReviewScheduler.from_answers(ReviewBank(ids), store.answers(args.user))
+        finally:
+            store.close()
+    else:
+        state = None
+        if args.state:
+            with open(args.state, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        scheduler = ReviewScheduler.from_dict(ReviewBank(ids), state)
+
+    now = time.time()
+    order = scheduler.review_order(now, args.limit)
+    for entry in order:
+        entry['theme_id'] = themes[entry['id']]
+    write_json_atomic(args.out, {'generated_at': now, 'due': scheduler.due_count(now), 'order': order})
+    print(f"Exported {len(order)} entries ({scheduler.due_count(now)} due) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
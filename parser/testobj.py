@@ -0,0 +1,62 @@
+import json
+import re
+
+from dedup import question_id
+
+# Start of the `testobj = {...}` literal embedded in quiz pages
+TESTOBJ_START = re.compile(r'\btestobj\s*=\s*(?=\{)')
+
+
+def find_testobj(html):
+    """Return the decoded testobj literal embedded in a page, or None"""
+    decoder = json.JSONDecoder()
+    for match in TESTOBJ_START.finditer(html):
+        try:
+            testobj, _ = decoder.raw_decode(html, match.end())
+        except ValueError:
+            continue
+        if isinstance(testobj, dict):
+            return testobj
+    return None
+
+
+def parse_testobj(testobj, block_id=None, block_name=None):
+    """Parse testobj structure and extract questions.
+
+    The page itself does not name its block, so callers that know it pass
+    block_id/block_name and every question records them.
+    """
+    questions = []
+    block = {'block_id': str(block_id), 'block_name': block_name or ''} if block_id is not None else {}
+
+    if 'questions' in testobj:
+        for theme_id, theme_questions in testobj['questions'].items():
+            theme_name = testobj.get('zakon_names', {}).get(theme_id, f"Theme {theme_id}")
+
+            for i, question_data in enumerate(theme_questions):
+                question_obj = {
+                    'theme_id': theme_id,
+                    'theme_name': theme_name,
+                    **block,
+                    'question_number': i + 1,
+                    'question': question_data.get('question', ''),
+                    'answers': {},
+                    'correct_answer': None,
+                    'article': question_data.get('statya', '')
+                }
+
+                for key, value in question_data.items():
+                    if key.startswith('reply'):
+                        answer_num = key.replace('reply', '')
+                        question_obj['answers'][answer_num] = value
+
+                correct = question_data.get('correctly')
+                if correct and str(correct) in question_obj['answers']:
+                    question_obj['correct_answer'] = str(correct)
+                    question_obj['correct_answer_text'] = question_obj['answers'].get(str(correct), '')
+
+                # Stable across re-scrapes, unlike question_number
+                question_obj['id'] = question_id(question_obj)
+                questions.append(question_obj)
+
+    return questions
@@ -0,0 +1,302 @@
+import argparse
+import random
+import time
+from array import array
+from pathlib import Path
+
+from build_bank import DEFAULT_BLOCK_ID
+from dedup import find_near_duplicates, normalize_text, question_id
+from journal import write_json_atomic
+from question_bank import load_questions
+
+DEFAULT_TICKET_SIZE = 20
+NEAR_DUPLICATE_THRESHOLD = 0.85
+# Random picks per missing question before a stratum falls back to a full shuffle
+MAX_PICKS_PER_QUESTION = 4
+
+
+class ShortTicketError(ValueError):
+    """A ticket could not get as many questions with distinct stems as asked"""
+
+
+def allocate(size, weights):
+    """Split size over weights (largest remainder); every count stays within its capacity.
+
+    weights is a list of (weight, capacity) pairs; a share that exceeds its
+    capacity goes to the others.
+    """
+    counts = [0] * len(weights)
+    remaining = size
+    open_slots = [i for i, (weight, capacity) in enumerate(weights) if weight > 0 and capacity > 0]
+    while remaining and open_slots:
+        total = sum(weights[i][0] for i in open_slots)
+        shares = {i: remaining * weights[i][0] / total for i in open_slots}
+        granted = {i: min(int(shares[i]), weights[i][1] - counts[i]) for i in open_slots}
+        left = remaining - sum(granted.values())
+        for i in sorted(open_slots, key=lambda i: shares[i] - int(shares[i]), reverse=True):
+            if not left:
+                break
+            if granted[i] < weights[i][1] - counts[i]:
+                granted[i] += 1
+                left -= 1
+        for i, count in granted.items():
+            counts[i] += count
+        if left == remaining:
+            break
+        remaining = left
+        open_slots = [i for i in open_slots if counts[i] < weights[i][1]]
+    return counts
+
+
+def stem_groups(questions, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """Group number of every question's stem: equal normalized texts and near duplicates share one"""
+    stems = {}
+    stem_of = [stems.setdefault(normalize_text(q.get('question')), len(stems)) for q in questions]
+    parent = list(range(len(stems)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    if threshold is not None:
+        for i, j in find_near_duplicates(list(stems), threshold):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+    return array('I', (find(stem) for stem in stem_of))
+
+
+class TicketGenerator:
+    """Seeded exam tickets drawn across themes and blocks.
+
+    A ticket's size is split over the themes by weight (question counts by
+    default, themes left out of given weights get none) and within a theme
+    over its blocks by their size. Questions whose stems are equal or near
+    duplicates share a stem group, and a ticket holds at most one question
+    per group. Per-block index arrays and the split for each ticket size are
+    computed once, so a ticket costs a few random picks per question.
+    """
+    def __init__(self, questions, weights=None, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.questions = []
+        self.ids = []
+        seen = set()
+        for q in questions:
+            qid = question_id(q)
+            if qid not in seen:
+                seen.add(qid)
+                self.ids.append(qid)
+                self.questions.append(q)
+        self.groups = stem_groups(self.questions, threshold)
+
+        self.themes = {}
+        for position, q in enumerate(self.questions):
+            blocks = self.themes.setdefault(str(q['theme_id']), {})
+            blocks.setdefault(str(q.get('block_id') or DEFAULT_BLOCK_ID), array('I')).append(position)
+        self.theme_names = {str(q['theme_id']): q.get('theme_name', '') for q in self.questions}
+        if weights is None:
+            weights = {theme_id: sum(map(len, blocks.values())) for theme_id, blocks in self.themes.items()}
+        self.weights = {theme_id: weights.get(theme_id, 0) for theme_id in self.themes}
+        self.plans = {}
+
+    def capacity(self, indices):
+        """Most questions a ticket can take from these indices: one per stem group"""
+        return len(set(self.groups[i] for i in indices))
+
+    def plan(self, size, theme_id=None):
+        """[(indices, count), ...] per block for tickets of this size, computed once"""
+        key = (size, theme_id)
+        plan = self.plans.get(key)
+        if plan is not None:
+            return plan
+        if theme_id is not None and theme_id not in self.themes:
+            raise KeyError(theme_id)
+        theme_ids = [theme_id] if theme_id is not None else list(self.themes)
+        themes = [[(indices, self.capacity(indices)) for indices in self.themes[t].values()] for t in theme_ids]
+        theme_counts = allocate(size, [(self.weights[t] if theme_id is None else 1, sum(c for _, c in blocks))
+                                       for t, blocks in zip(theme_ids, themes)])
+        plan = []
+        for blocks, count in zip(themes, theme_counts):
+            block_counts = allocate(count, [(len(indices), capacity) for indices, capacity in blocks])
+            plan.extend((indices, block_count) for (indices, _), block_count in zip(blocks, block_counts) if block_count)
+        self.plans[key] = plan
+        return plan
+
+    def draw(self, rng, size=DEFAULT_TICKET_SIZE, theme_id=None):
+        """Positions of one ticket's questions, in bank order.
+
+        Raises ShortTicketError when fewer than size questions with distinct
+        stems could be drawn (stem groups shared across blocks can leave a
+        block short even though plan() found enough capacity).
+        """
+        groups = self.groups
+        used = set()
+        chosen = []
+        for indices, count in self.plan(size, theme_id):
+            picked = 0
+            for _ in range(count * MAX_PICKS_PER_QUESTION):
+                position = indices[rng.randrange(len(indices))]
+                if groups[position] not in used:
+                    used.add(groups[position])
+                    chosen.append(position)
+                    picked += 1
+                    if picked == count:
+                        break
+            else:
+                # Groups shared with other blocks or themes ran this block short, scan it instead
+                for position in rng.sample(indices, len(indices)):
+                    if picked == count:
+                        break
+                    if groups[position] not in used:
+                        used.add(groups[position])
+                        chosen.append(position)
+                        picked += 1
+        if len(chosen) < size:
+            raise ShortTicketError(f"Only {len(chosen)} questions with distinct stems for a ticket of {size}")
+        chosen.sort()
+        return chosen
+
+    def ticket(self, seed, number=1, size=DEFAULT_TICKET_SIZE, theme_id=None):
+        """Ticket number of a series: the same seed and number always give the same questions"""
+        return self.draw(random.Random(f"{seed}:{number}"), size, theme_id)
+
+    def batch(self, count, seed, size=DEFAULT_TICKET_SIZE, theme_id=None):
+        """Tickets 1..count of the series seed as (number, positions) pairs"""
+        for number in range(1, count + 1):
+            yield number, self.ticket(seed, number, size, theme_id)
+
+    def ticket_dict(self, number, positions, seed=None):
+        return {
+            'number': number,
+            'seed': seed,
+            'questions': [{**self.questions[position], 'id': self.ids[position]} for position in positions],
+        }
+
+
+def load_generator(json_file, weights=None, threshold=NEAR_DUPLICATE_THRESHOLD):
+    return TicketGenerator(load_questions(json_file), weights, threshold)
+
+
+def weight_option(value):
+    """--weight THEME=W as a (theme_id, weight) pair"""
+    theme_id, _, weight = value.partition('=')
+    try:
+        return theme_id.strip(), float(weight)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected THEME=WEIGHT, got {value!r}")
+
+
+def build_tickets_story(generator, tickets, font_name, font_bold):
+    """Flowables with one ticket per page and its answer key under the questions"""
+    from reportlab.lib.units import cm
+    from reportlab.platypus import PageBreak, Paragraph, Spacer
+
+    from pdf_cache import ParagraphFactory
+    from pdf_render import Bookmark
+    from pdf_styles import get_styles
+    from pdf_text import sanitize_text
+
+    paragraphs = ParagraphFactory(sanitize_text)
+    styles = get_styles('questions', font_name, font_bold)
+    story = []
+    for number, positions in tickets:
+        if story:
+            story.append(PageBreak())
+        title = f"Билет {number}"
+        story.append(Bookmark(title, f"ticket_{number}"))
+        story.append(Paragraph(f"<b>{title}</b>", styles['theme']))
+        story.append(Spacer(1, 0.3 * cm))
+        key = []
+        for counter, position in enumerate(positions, 1):
+            q = generator.questions[position]
+            story.append(Paragraph(f"<b>{counter}.</b> {paragraphs.sanitize(q['question'])}", styles['question']))
+            answer_ids = sorted(q.get('answers', {}), key=lambda x: int(x) if x.isdigit() else 0)
+            for letter, answer_id in enumerate(answer_ids):
+                text = f"{chr(ord('А') + letter)}) {paragraphs.sanitize(q['answers'][answer_id])}"
+                story.append(paragraphs.paragraph(text, styles['answer']))
+                if answer_id == q.get('correct_answer'):
+                    key.append(f"{counter} — {chr(ord('А') + letter)}")
+            story.append(Spacer(1, 0.2 * cm))
+        story.append(Paragraph(f"<i>Ответы: {', '.join(key)}</i>", styles['article']))
+    return story
+
+
+def export_pdf(generator, tickets, output_pdf):
+    from pdf_fonts import register_fonts
+    from pdf_render import build_document
+
+    font_name, font_bold = register_fonts()
+    build_document(build_tickets_story(generator, tickets, font_name, font_bold), output_pdf, font_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate seeded exam tickets drawn across themes and blocks')
+    parser.add_argument('json_file', nargs='?', default='all_questions.json')
+    parser.add_argument('--count', type=int, default=30, help='number of tickets')
+    parser.add_argument('--size', type=int, default=DEFAULT_TICKET_SIZE, help='questions per ticket')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--theme', help='draw from this theme only')
+    parser.add_argument('--weight', action='append', type=weight_option, metavar='THEME=W',
+                        help='draw from the listed themes in these proportions instead of by '
+                             'question count (repeatable)')
+    parser.add_argument('--threshold', type=float, default=NEAR_DUPLICATE_THRESHOLD,
+                        help='similarity at which two stems count as near duplicates')
+    parser.add_argument('--out', help='write the tickets to this JSON file')
+    parser.add_argument('--pdf', help='render the tickets to this PDF file')
+    parser.add_argument('--bench', type=int, metavar='N', help='time generating N tickets')
+    args = parser.parse_args()
+    if args.count < 1:
+        parser.error('--count must be at least 1')
+    if args.size < 1:
+        parser.error('--size must be at least 1')
+
+    started = time.perf_counter()
+    weights = dict(args.weight) if args.weight else None
+    generator = load_generator(args.json_file, weights, args.threshold)
+    print(f"{len(generator.ids)} questions, {len(set(generator.groups))} stem groups in "
+          f"{len(generator.themes)} themes ({time.perf_counter() - started:.2f} s to prepare)")
+    unknown = [theme_id for theme_id in weights or () if theme_id not in generator.themes]
+    if unknown:
+        available = ', '.join(sorted(generator.themes, key=lambda x: int(x) if x.isdigit() else 0))
+        parser.error(f"Unknown theme(s) in --weight: {', '.join(unknown)}. Available: {available}")
+    try:
+        plan = generator.plan(args.size, args.theme)
+    except KeyError:
+        parser.error(f"No theme {args.theme}")
+    available = sum(count for _, count in plan)
+    if available < args.size:
+        parser.error(f"Only {available} questions with distinct stems, asked for {args.size}")
+
+    try:
+        tickets = list(generator.batch(args.count, args.seed, args.size, args.theme))
+    except ShortTicketError as e:
+        parser.error(str(e))
+    per_theme = {}
+    for position in tickets[0][1]:
+        theme_id = str(generator.questions[position]['theme_id'])
+        per_theme[theme_id] = per_theme.get(theme_id, 0) + 1
+    print(f"Ticket 1 by theme: {', '.join(f'{t}: {n}' for t, n in per_theme.items())}")
+
+    if args.out:
+        write_json_atomic(args.out, {
+            'seed': args.seed,
+            'size': args.size,
+            'theme_id': args.theme,
+            'tickets': [generator.ticket_dict(number, positions, args.seed) for number, positions in tickets],
+        })
+        print(f"Wrote {len(tickets)} tickets to {args.out} ({Path(args.out).stat().st_size:,} bytes)")
+    if args.pdf:
+        started = time.perf_counter()
+        export_pdf(generator, tickets, args.pdf)
+        print(f"Wrote {args.pdf} in {time.perf_counter() - started:.1f} s")
+    if args.bench:
+        started = time.perf_counter()
+        for _ in generator.batch(args.bench, args.seed + 1, args.size, args.theme):
+            pass
+        elapsed = time.perf_counter() - started
+        print(f"{args.bench} tickets in {elapsed:.2f} s: {args.bench / elapsed:,.0f} tickets/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import argparse
+import re
+import time
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from functools import partial
+
+from dedup import normalize_text, question_id
+from exporters import iter_questions
+from journal import write_json_atomic
+
+# Joins a text column into one string, so a check is one regex scan per column.
+# A private-use character: not whitespace, not markup, never in the bank.
+SEPARATOR = '\ue000'
+
+DETAIL_LENGTH = 60
+
+# Checks and whether they make a record unusable
+ERRORS = ('empty_question', 'no_answers', 'missing_answer', 'encoding')
+WARNINGS = ('missing_answer_text', 'duplicate_options', 'empty_article', 'whitespace', 'markup')
+
+# Double spaces and any whitespace but a plain space (tabs, newlines, no-break spaces).
+# Leading and trailing whitespace is found with str.strip, which is faster.
+WHITESPACE_RE = re.compile(r'[^\S ]| {2}')
+MARKUP_RE = re.compile(r'<[^<>\ue000]*>|&(?:#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);')
+# Control characters, U+FFFD, and UTF-8 Cyrillic decoded as Latin-1 (Ð°) or cp1251 (СЃ).
+# Only Р/С followed by a cp1251 misdecode letter (Ђ-Џ, ђ-џ) counts: quotes,
+# no-break spaces and other punctuation after an abbreviation such as ЕАЭС» are
+# normal text.
+ENCODING_RE = re.compile(
+    r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f\ufffd]'
+    r'|[\xd0\xd1][\x80-\xbf]'
+    r'|[РС][Ђ-Џђ-џ]'
+)
+
+
+class BankColumns:
+    """The bank as parallel columns instead of a list of dicts.
+
+    Scalar fields are one list each; answer options are flattened into
+    option columns with an array of per-record offsets, so a check runs
+    over whole columns.
+    """
+    def __init__(self):
+        self.ids = []
+        self.themes = []
+        self.numbers = []
+        self.questions = []
+        self.correct = []
+        self.correct_texts = []
+        self.articles = []
+        self.option_offsets = array('I', [0])
+        self.option_rows = array('I')
+        self.option_keys = []
+        self.option_texts = []
+
+    @classmethod
+    def from_records(cls, questions):
+        columns = cls()
+        for row, q in enumerate(questions):
+            columns.ids.append(q.get('id'))
+            columns.themes.append(str(q.get('theme_id')))
+            columns.numbers.append(q.get('question_number'))
+            columns.questions.append(q.get('question') or '')
+            columns.correct.append(q.get('correct_answer'))
+            columns.correct_texts.append(q.get('correct_answer_text'))
+            columns.articles.append(q.get('article') or '')
+            answers = q.get('answers') or {}
+            columns.option_keys.extend(answers)
+            columns.option_texts.extend(text or '' for text in answers.values())
+            columns.option_rows.extend([row] * len(answers))
+            columns.option_offsets.append(len(columns.option_texts))
+        return columns
+
+    def __len__(self):
+        return len(self.ids)
+
+    def question_id(self, row):
+        """Stored id of a record, or the one dedup.question_id derives from its columns"""
+        if self.ids[row]:
+            return self.ids[row]
+        start, end = self.option_offsets[row], self.option_offsets[row + 1]
+        return question_id({'theme_id': self.themes[row], 'question': self.questions[row],
+                            'answers': dict(zip(self.option_keys[start:end], self.option_texts[start:end]))})
+
+    def option_counts(self):
+        offsets = self.option_offsets
+        return [end - start for start, end in zip(offsets, offsets[1:])]
+
+
+def matching_rows(pattern, texts, rows=None):
+    """Rows of a text column the pattern matches, with the first match and its text.
+
+    The column is joined with SEPARATOR and scanned once; match positions are
+    mapped back to rows through the start offset of every text. rows maps a
+    text to its record when the column is flattened (answer options).
+    """
+    starts = array('I')
+    position = 0
+    for text in texts:
+        starts.append(position)
+        position += len(text) + 1
+    hits = {}
+    for match in pattern.finditer(SEPARATOR.join(texts)):
+        index = bisect_right(starts, match.start()) - 1
+        row = rows[index] if rows is not None else index
+        if row not in hits:
+            hits[row] = (match.group(), texts[index])
+    return hits
+
+
+def padded_rows(texts, rows=None):
+    """Rows of a text column with leading or trailing whitespace, like matching_rows"""
+    hits = {}
+    for index in [index for index, text in enumerate(texts) if text != text.strip()]:
+        row = rows[index] if rows is not None else index
+        if row not in hits:
+            text = texts[index]
+            hits[row] = (text[:len(text) - len(text.lstrip())] or text[len(text.rstrip()):], text)
+    return hits
+
+
+def text_issues(find, columns):
+    """Rows where find(texts, rows) has hits in the question, an option or the article"""
+    found = {}
+    for field, hits in (('question', find(columns.questions)),
+                        ('answers', find(columns.option_texts, columns.option_rows)),
+                        ('article', find(columns.articles))):
+        for row, (matched, text) in hits.items():
+            found.setdefault(row, f"{matched!r} in {field} {text[:DETAIL_LENGTH]!r}")
+    return found
+
+
+def check(columns):
+    """{check name: {row: detail}} for every check over the whole bank"""
+    counts = columns.option_counts()
+    valid_answers = set(zip(columns.option_rows, columns.option_keys))
+    answer_texts = dict(zip(zip(columns.option_rows, columns.option_keys), columns.option_texts))
+
+    normalized = list(map(normalize_text, columns.option_texts))
+    repeated = Counter(zip(columns.option_rows, normalized))
+    duplicates = {}
+    for (row, text), count in repeated.items():
+        if count > 1:
+            duplicates.setdefault(row, f"{count}x {text!r}")
+
+    return {
+        'empty_question': {row: '' for row, text in enumerate(columns.questions) if not text.strip()},
+        'no_answers': {row: f"{count} option(s)" for row, count in enumerate(counts) if count < 2},
+        'missing_answer': {
+            row: f"correct_answer={correct!r}" for row, correct in enumerate(columns.correct)
+            if counts[row] and (row, correct) not in valid_answers
+        },
+        'missing_answer_text': {
+            row: f"correct_answer_text={text!r}"
+            for row, (correct, text) in enumerate(zip(columns.correct, columns.correct_texts))
+            if (row, correct) in valid_answers and text != answer_texts[(row, correct)]
+        },
+        'duplicate_options': duplicates,
+        'empty_article': {row: '' for row, text in enumerate(columns.articles) if not text.strip()},
+        'whitespace': {**text_issues(partial(matching_rows, WHITESPACE_RE), columns),
+                       **text_issues(padded_rows, columns)},
+        'markup': text_issues(partial(matching_rows, MARKUP_RE), columns),
+        'encoding': text_issues(partial(matching_rows, ENCODING_RE), columns),
+    }
+
+
+class ValidationReport:
+    """Result of validating a bank, with a JSON form for tools"""
+    def __init__(self, columns, issues, elapsed=0.0):
+        self.columns = columns
+        self.issues = issues
+        self.elapsed = elapsed
+
+    def counts(self):
+        return {name: len(rows) for name, rows in self.issues.items()}
+
+    def error_rows(self):
+        return set(row for name in ERRORS for row in self.issues[name])
+
+    @property
+    def ok(self):
+        return not self.error_rows()
+
+    def to_dict(self, limit=None):
+        columns = self.columns
+        issues = {}
+        for name, rows in self.issues.items():
+            items = sorted(rows.items())[:limit]
+            issues[name] = [{'id': columns.question_id(row), 'theme_id': columns.themes[row],
+                             'question_number': columns.numbers[row], 'detail': detail}
+                            for row, detail in items]
+        return {
+            'version': 1,
+            'total': len(columns),
+            'ok': self.ok,
+            'errors': list(ERRORS),
+            'warnings': list(WARNINGS),
+            'counts': self.counts(),
+            'issues': issues,
+        }
+
+    def summary(self):
+        counts = self.counts()
+        errors = ', '.join(f"{name} {counts[name]}" for name in ERRORS if counts[name]) or 'none'
+        warnings = ', '.join(f"{name} {counts[name]}" for name in WARNINGS if counts[name]) or 'none'
+        return (f"Validated {len(self.columns)} questions in {self.elapsed * 1000:.0f} ms: "
+                f"{len(self.error_rows())} with errors ({errors}); warnings: {warnings}")
+
+    def write(self, path, limit=None):
+        write_json_atomic(path, self.to_dict(limit))
+
+
+def validate(questions):
+    """Validate a bank (any iterable of records) in one batch"""
+    started = time.perf_counter()
+    columns = BankColumns.from_records(questions)
+    issues = check(columns)
+    return ValidationReport(columns, issues, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check a question bank for missing answers and bad data')
+    parser.add_argument('json_file', nargs='?', default='all_questions.json')
+    parser.add_argument('--report', default='validation_report.json', help='where to write the JSON report')
+    parser.add_argument('--limit', type=int, help='list at most this many records per check')
+    args = parser.parse_args()
+
+    report = validate(iter_questions(args.json_file))
+    report.write(args.report, args.limit)
+    print(report.summary())
+    print(f"Report written to {args.report}")
+    raise SystemExit(0 if report.ok else 1)
+
+
+if __name__ == "__main__":
+    main()